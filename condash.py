@@ -0,0 +1,14 @@
+"""
+condash - headless command-line entry point for the Construction Dashboard
+Example: python condash.py report "data/projects/*" --format jsonl --output reports.jsonl
+"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'src'))
+
+from cli import main
+
+if __name__ == "__main__":
+    sys.exit(main())
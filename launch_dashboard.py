@@ -3,19 +3,17 @@ Simple launcher for the Construction Dashboard
 This script handles common setup issues and launches the dashboard
 """
 
+import argparse
+import importlib.util
 import subprocess
 import sys
 import os
-import time
-import streamlit   
+
+PROJECTS_DIR_ENV = 'CONDASH_PROJECTS_DIR'
 
 def check_streamlit():
-    """Check if streamlit is installed"""
-    try:
-        import streamlit
-        return True
-    except ImportError:
-        return False
+    """Check if streamlit is installed without importing it"""
+    return importlib.util.find_spec("streamlit") is not None
 
 def install_requirements():
     """Install required packages"""
@@ -58,16 +56,36 @@ def generate_data():
         print("❌ Failed to generate data")
         return False
 
-def launch_dashboard():
-    """Launch the Streamlit dashboard"""
+def prewarm_dashboard(target):
+    """Precompute the dashboard's first paint so the first visitor does not wait for it"""
+    print("Precomputing the dashboard's first paint...")
+    try:
+        subprocess.check_call([sys.executable, "condash.py", "prewarm", target])
+        return True
+    except subprocess.CalledProcessError:
+        print("⚠️ Precompute failed; the dashboard will build its first paint on demand")
+        return False
+
+def launch_dashboard(projects_dir=None, port=8501):
+    """Launch the Streamlit dashboard
+    
+    With `projects_dir`, one server process serves every project directory in it
+    (selected with ?project=<name>) instead of the single data/ directory.
+    """
+    env = dict(os.environ)
+    if projects_dir:
+        env[PROJECTS_DIR_ENV] = os.path.abspath(projects_dir)
+    
     print("\n🏗️ Launching Construction Dashboard...")
+    if projects_dir:
+        print(f"Serving every project in {projects_dir} (open a project with ?project=<name>)")
     print("This will open your web browser automatically.")
-    print("If it doesn't, go to: http://localhost:8501")
+    print(f"If it doesn't, go to: http://localhost:{port}")
     print("\nPress Ctrl+C to stop the dashboard")
     print("=" * 50)
     
     try:
-        subprocess.run([sys.executable, "-m", "streamlit", "run", "src/dashboard.py"])
+        subprocess.run([sys.executable, "-m", "streamlit", "run", "src/dashboard.py", "--server.port", str(port)], env=env)
     except KeyboardInterrupt:
         print("\n👋 Dashboard stopped by user")
     except subprocess.CalledProcessError as e:
@@ -75,6 +93,11 @@ def launch_dashboard():
 
 def main():
     """Main launcher function"""
+    parser = argparse.ArgumentParser(description='Launch the construction dashboard')
+    parser.add_argument('--projects-dir', default=None, help='Serve every project directory in this directory from one process')
+    parser.add_argument('--port', type=int, default=8501, help='Port to serve on')
+    args = parser.parse_args()
+    
     print("🏗️ Construction Dashboard Launcher")
     print("=" * 40)
     
@@ -85,6 +108,14 @@ def main():
             print("Please install packages manually: pip install -r requirements.txt")
             return
     
+    if args.projects_dir:
+        if not os.path.isdir(args.projects_dir):
+            print(f"❌ Projects directory not found: {args.projects_dir}")
+            return
+        prewarm_dashboard(args.projects_dir)
+        launch_dashboard(args.projects_dir, args.port)
+        return
+    
     # Check if data files exist
     data_exists, missing_files = check_data_files()
     if not data_exists:
@@ -96,7 +127,8 @@ def main():
         print("✅ Data files found")
     
     # Launch dashboard
-    launch_dashboard()
+    prewarm_dashboard("data")
+    launch_dashboard(port=args.port)
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
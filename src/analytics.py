@@ -1,19 +1,55 @@
 import pandas as pd
 import numpy as np
-from scipy import stats
 import warnings
+from evm import DEFAULT_BUDGET_AT_COMPLETION, calculate_evm_series, compute_evm_arrays
+from anomaly import scan_project_anomalies
+from forecasting import forecast_completion
+from risk_scanner import RISK_RULES, active_risks, attribute_labor_efficiency, latest_pass_rate, risk_events, scan_recent_risks, scan_risk_history
+from tracing import count_rows, traced
 warnings.filterwarnings('ignore')
 
+# Trailing time windows, so weekly, daily and per-shift data are read the same way
+PROGRESS_TREND_WINDOW = pd.Timedelta(weeks=4)
+CPI_STABILITY_WINDOW = pd.Timedelta(weeks=5)
+
+# Crews named in the labor efficiency risk message
+ATTRIBUTED_CREWS = 3
+
+def _table_rows(analytics, *args, **kwargs):
+    """Rows across the five KPI tables an analytics method works on"""
+    return count_rows(analytics.schedule_df, analytics.cost_df, analytics.productivity_df, analytics.safety_df, analytics.quality_df)
+
+def recent_rows(df, window):
+    """Rows dated within `window` of a table's latest date (four weekly rows for four weeks)"""
+    if len(df) == 0:
+        return df
+    dates = pd.to_datetime(df['Date'])
+    return df[dates > dates.iloc[-1] - window]
+
+def _rows_as_of(df, as_of):
+    """Rows of a table dated on or before `as_of` (the whole table when as_of is None)"""
+    if as_of is None or df is None or 'Date' not in df.columns:
+        return df
+    return df[pd.to_datetime(df['Date']) <= as_of]
+
 class ConstructionAnalytics:
     """Advanced analytics for construction project data"""
     
-    def __init__(self, schedule_df, cost_df, productivity_df, safety_df, quality_df):
-        self.schedule_df = schedule_df
-        self.cost_df = cost_df
-        self.productivity_df = productivity_df
-        self.safety_df = safety_df
-        self.quality_df = quality_df
+    def __init__(self, schedule_df, cost_df, productivity_df, safety_df, quality_df, as_of=None, crew_productivity_df=None):
+        """`as_of` limits every table to rows dated on or before that date
+        
+        `crew_productivity_df` (weekly hours and quantities per crew and cost
+        code, see timesheets.py) lets labor efficiency risks name the crews behind them.
+        """
+        self.as_of = pd.Timestamp(as_of) if as_of is not None else None
+        self.schedule_df = _rows_as_of(schedule_df, self.as_of)
+        self.cost_df = _rows_as_of(cost_df, self.as_of)
+        self.productivity_df = _rows_as_of(productivity_df, self.as_of)
+        self.safety_df = _rows_as_of(safety_df, self.as_of)
+        self.quality_df = _rows_as_of(quality_df, self.as_of)
+        self.crew_productivity_df = _rows_as_of(crew_productivity_df, self.as_of)
     
+    @traced('analytics.calculate_project_health_score', rows=_table_rows)
     def calculate_project_health_score(self):
         """Calculate overall project health score (0-100)"""
         
@@ -24,7 +60,6 @@ class ConstructionAnalytics:
         latest_schedule = self.schedule_df.iloc[-1]
         latest_cost = self.cost_df.iloc[-1]
         latest_safety = self.safety_df.iloc[-1]
-        latest_quality = self.quality_df.iloc[-1]
         
         # Schedule health (25% weight)
         spi_score = min(100, latest_schedule['SPI'] * 100)
@@ -41,44 +76,57 @@ class ConstructionAnalytics:
         safety_health = (safety_score + trir_score) / 2 * 0.25
         
         # Quality health (25% weight)
-        pass_rate = latest_quality['Inspection_Pass_Rate_Pct']
+        pass_rate = latest_pass_rate(self.quality_df)
         quality_health = pass_rate * 0.25
         
         total_health = schedule_health + cost_health + safety_health + quality_health
         return round(total_health, 1)
     
+    @traced('analytics.predict_completion_date', rows=_table_rows)
     def predict_completion_date(self):
         """Predict project completion date based on current performance"""
         
         if len(self.schedule_df) < 3:
             return None
         
-        # Calculate trend in progress rate
-        recent_data = self.schedule_df.tail(4)  # Last 4 weeks
-        progress_rates = recent_data['Actual_Progress_Pct'].diff().dropna()
+        # Calculate trend in progress rate over the last 4 weeks
+        recent_data = recent_rows(self.schedule_df, PROGRESS_TREND_WINDOW)
+        recent_dates = pd.to_datetime(recent_data['Date'])
+        elapsed_days = (recent_dates.iloc[-1] - recent_dates.iloc[0]) / pd.Timedelta(days=1)
+        progress_made = recent_data['Actual_Progress_Pct'].iloc[-1] - recent_data['Actual_Progress_Pct'].iloc[0]
         
-        if len(progress_rates) == 0 or progress_rates.mean() <= 0:
-            return "Cannot predict - insufficient progress"
+        if elapsed_days <= 0 or progress_made <= 0:
+            # Progress has stalled recently; fall back to the S-curve fit of the whole history
+            forecast = self.forecast_completion()
+            if pd.isna(forecast['Forecast_Completion']):
+                return "Cannot predict - insufficient progress"
+            return forecast['Forecast_Completion'].strftime('%Y-%m-%d')
         
         current_progress = self.schedule_df.iloc[-1]['Actual_Progress_Pct']
         remaining_progress = 100 - current_progress
         
-        avg_weekly_progress = progress_rates.mean()
-        weeks_remaining = remaining_progress / avg_weekly_progress
+        avg_daily_progress = progress_made / elapsed_days
+        days_remaining = remaining_progress / avg_daily_progress
         
-        last_date = self.schedule_df.iloc[-1]['Date']
-        predicted_date = last_date + pd.Timedelta(weeks=weeks_remaining)
+        last_date = pd.Timestamp(self.schedule_df.iloc[-1]['Date'])
+        predicted_date = last_date + pd.Timedelta(days=days_remaining)
         
         return predicted_date.strftime('%Y-%m-%d')
     
+    @traced('analytics.forecast_completion', rows=_table_rows)
+    def forecast_completion(self):
+        """Forecast completion from the progress curve, with a 90% confidence band"""
+        return forecast_completion(self.schedule_df)
+    
     def calculate_cost_forecast_confidence(self):
         """Calculate confidence level in cost forecast"""
         
-        if len(self.cost_df) < 5:
+        recent_cost = recent_rows(self.cost_df, CPI_STABILITY_WINDOW)
+        if len(recent_cost) < 5:
             return "Insufficient data"
         
-        # Analyze CPI stability
-        recent_cpi = self.cost_df.tail(5)['CPI']
+        # Analyze CPI stability over the last 5 weeks
+        recent_cpi = recent_cost['CPI']
         cpi_std = recent_cpi.std()
         
         if cpi_std < 0.05:
@@ -88,48 +136,57 @@ class ConstructionAnalytics:
         else:
             return "Low Confidence"
     
+    @traced('analytics.identify_risk_trends', rows=_table_rows)
     def identify_risk_trends(self):
         """Identify concerning trends in project metrics"""
         
-        risks = []
-        
         if len(self.schedule_df) < 3:
             return ["Insufficient data for trend analysis"]
         
-        # Schedule risks
-        recent_spi = self.schedule_df.tail(3)['SPI']
-        if recent_spi.mean() < 0.95 and (recent_spi.iloc[-1] < recent_spi.iloc[0]):
-            risks.append("Schedule Performance Index trending downward")
+        # Evaluate the rolling-window risk rules at the latest period only
+        history = scan_recent_risks(
+            self.schedule_df, self.cost_df, self.productivity_df, self.safety_df, self.quality_df, periods=1
+        )
+        risks = active_risks(history)
         
-        # Cost risks  
-        recent_cpi = self.cost_df.tail(3)['CPI']
-        if recent_cpi.mean() < 0.95 and (recent_cpi.iloc[-1] < recent_cpi.iloc[0]):
-            risks.append("Cost Performance Index trending downward")
+        labor_risk = RISK_RULES['labor_efficiency'][1]
+        if labor_risk in risks and self.crew_productivity_df is not None:
+            crews = self.attribute_labor_efficiency().head(ATTRIBUTED_CREWS)
+            if len(crews):
+                named = ", ".join(f"{row.Crew} +{row.Excess_Hours:,.0f} h on {row.Code}" for row in crews.itertuples())
+                risks[risks.index(labor_risk)] = f"{labor_risk} ({named})"
         
-        # Safety risks
-        recent_incidents = self.safety_df.tail(4)['Near_Miss_Count']
-        if recent_incidents.mean() > 3:
-            risks.append("Higher than average near-miss incidents")
+        if not risks:
+            risks.append("No significant risk trends detected")
         
-        # Quality risks
-        recent_pass_rate = self.quality_df.tail(3)['Inspection_Pass_Rate_Pct']
-        if recent_pass_rate.mean() < 80:
-            risks.append("Inspection pass rate below 80%")
+        return risks
+    
+    def attribute_labor_efficiency(self):
+        """Crews whose latest week took more hours than their recent hours-per-unit rate predicts; None without crew data"""
         
-        recent_rework = self.quality_df.tail(3)['Rework_Cost']
-        if recent_rework.mean() > 10000:
-            risks.append("High rework costs detected")
+        if self.crew_productivity_df is None:
+            return None
+        as_of = pd.Timestamp(self.productivity_df['Date'].iloc[-1]) if len(self.productivity_df) else None
+        return attribute_labor_efficiency(self.crew_productivity_df, as_of=as_of)
+    
+    @traced('analytics.calculate_risk_history', rows=_table_rows)
+    def calculate_risk_history(self):
+        """Evaluate every risk rule at every reporting period"""
         
-        # Productivity risks
-        recent_efficiency = self.productivity_df.tail(3)['Labor_Hours_Per_Unit']
-        if len(recent_efficiency) > 1 and recent_efficiency.iloc[-1] > recent_efficiency.mean() * 1.2:
-            risks.append("Labor efficiency declining")
+        return scan_risk_history(self.schedule_df, self.cost_df, self.productivity_df, self.safety_df, self.quality_df)
+    
+    def identify_risk_events(self):
+        """Identify the onset and resolution of every risk over the project history"""
         
-        if not risks:
-            risks.append("No significant risk trends detected")
+        return risk_events(self.calculate_risk_history())
+    
+    @traced('analytics.detect_kpi_anomalies', rows=_table_rows)
+    def detect_kpi_anomalies(self):
+        """Detect cost spikes, safety and quality spikes and productivity drops"""
         
-        return risks
+        return scan_project_anomalies(self.cost_df, self.productivity_df, self.safety_df, self.quality_df)
     
+    @traced('analytics.calculate_earned_value_metrics', rows=_table_rows)
     def calculate_earned_value_metrics(self):
         """Calculate comprehensive earned value management metrics"""
         
@@ -144,34 +201,42 @@ class ConstructionAnalytics:
         ac = latest_cost['Cumulative_Spent']   # Actual Cost
         
         # Calculate EVM metrics
-        cv = ev - ac  # Cost Variance
-        sv = ev - pv  # Schedule Variance
-        
-        spi = ev / pv if pv > 0 else 1.0
-        cpi = ev / ac if ac > 0 else 1.0
-        
-        # Performance metrics
-        tcpi = (5000000 - ev) / (5000000 - ac) if ac < 5000000 else float('inf')  # To-Complete Performance Index
-        eac = ac + (5000000 - ev) / cpi if cpi > 0 else 5000000  # Estimate at Completion
-        etc = eac - ac  # Estimate to Complete
-        vac = 5000000 - eac  # Variance at Completion
+        metrics = compute_evm_arrays(pv, ev, ac, DEFAULT_BUDGET_AT_COMPLETION)
+        tcpi = metrics['TCPI']  # To-Complete Performance Index, masked when not applicable
         
         return {
             'Planned_Value': round(pv, 2),
             'Earned_Value': round(ev, 2),
             'Actual_Cost': round(ac, 2),
-            'Cost_Variance': round(cv, 2),
-            'Schedule_Variance': round(sv, 2),
-            'SPI': round(spi, 3),
-            'CPI': round(cpi, 3),
-            'TCPI': round(tcpi, 3) if tcpi != float('inf') else 'N/A',
-            'EAC': round(eac, 2),
-            'ETC': round(etc, 2),
-            'VAC': round(vac, 2)
+            'Cost_Variance': round(float(metrics['Cost_Variance']), 2),
+            'Schedule_Variance': round(float(metrics['Schedule_Variance']), 2),
+            'SPI': round(float(metrics['SPI']), 3),
+            'CPI': round(float(metrics['CPI']), 3),
+            'TCPI': round(float(tcpi), 3) if not np.ma.is_masked(tcpi) else 'N/A',
+            'EAC': round(float(metrics['EAC']), 2),
+            'ETC': round(float(metrics['ETC']), 2),
+            'VAC': round(float(metrics['VAC']), 2)
         }
     
-    def calculate_productivity_benchmarks(self):
-        """Calculate productivity benchmarks and comparisons"""
+    @traced('analytics.calculate_earned_value_series', rows=_table_rows)
+    def calculate_earned_value_series(self, rolling_window=None, smoothing_span=None):
+        """Calculate every earned value metric for every reporting period"""
+        
+        if len(self.schedule_df) == 0 or len(self.cost_df) == 0:
+            return pd.DataFrame()
+        
+        return calculate_evm_series(
+            self.schedule_df, self.cost_df, DEFAULT_BUDGET_AT_COMPLETION,
+            rolling_window=rolling_window, smoothing_span=smoothing_span
+        )
+    
+    @traced('analytics.calculate_productivity_benchmarks', rows=_table_rows)
+    def calculate_productivity_benchmarks(self, benchmarks=None, segment='ALL'):
+        """Calculate productivity benchmarks and comparisons
+        
+        With a BenchmarkService, the latest week is also ranked against the
+        portfolio percentiles of `segment`.
+        """
         
         if len(self.productivity_df) == 0:
             return {}
@@ -179,16 +244,14 @@ class ConstructionAnalytics:
         current = self.productivity_df.iloc[-1]
         
         # Historical averages
-        avg_labor_efficiency = self.productivity_df['Labor_Hours_Per_Unit'].mean()
-        avg_equipment_util = self.productivity_df['Equipment_Utilization_Pct'].mean()
-        avg_waste = self.productivity_df['Material_Waste_Pct'].mean()
+        avg_labor_efficiency, avg_equipment_util, avg_waste = self._historical_productivity_means()
         
         # Performance vs averages
         labor_vs_avg = ((current['Labor_Hours_Per_Unit'] - avg_labor_efficiency) / avg_labor_efficiency) * 100
         equip_vs_avg = ((current['Equipment_Utilization_Pct'] - avg_equipment_util) / avg_equipment_util) * 100
         waste_vs_avg = ((current['Material_Waste_Pct'] - avg_waste) / avg_waste) * 100
         
-        return {
+        result = {
             'Current_Labor_Hours_Per_Unit': round(current['Labor_Hours_Per_Unit'], 2),
             'Average_Labor_Hours_Per_Unit': round(avg_labor_efficiency, 2),
             'Labor_Efficiency_vs_Average': f"{labor_vs_avg:+.1f}%",
@@ -199,7 +262,41 @@ class ConstructionAnalytics:
             'Average_Material_Waste': f"{avg_waste:.1f}%",
             'Waste_vs_Average': f"{waste_vs_avg:+.1f}%"
         }
+        
+        if benchmarks is not None:
+            # Performance percentile: higher is better for every metric
+            for metric, comparison in benchmarks.benchmark_project(self.productivity_df, segment).items():
+                result[f'{metric}_Portfolio_Percentile'] = comparison['Performance_Percentile']
+                result[f'{metric}_Portfolio_Median'] = round(comparison['Median'], 2)
+        
+        return result
+    
+    def _historical_productivity_means(self):
+        """Return historical means of labor efficiency, equipment utilization and waste"""
+        
+        return (
+            self.productivity_df['Labor_Hours_Per_Unit'].mean(),
+            self.productivity_df['Equipment_Utilization_Pct'].mean(),
+            self.productivity_df['Material_Waste_Pct'].mean()
+        )
+    
+    def calculate_safety_totals(self):
+        """Calculate project-to-date incident count, labor hours and TRIR"""
+        
+        if len(self.safety_df) == 0 or len(self.productivity_df) == 0:
+            return {}
+        
+        total_incidents = int(self.safety_df['Incident_Occurred'].sum())
+        total_hours = float(self.productivity_df['Labor_Hours'].sum())
+        trir = (total_incidents * 200000) / total_hours if total_hours > 0 else 0
+        
+        return {
+            'Total_Incidents': total_incidents,
+            'Total_Labor_Hours': round(total_hours, 0),
+            'TRIR': round(trir, 2)
+        }
     
+    @traced('analytics.generate_executive_summary', rows=_table_rows)
     def generate_executive_summary(self):
         """Generate executive summary of project status"""
         
@@ -232,10 +329,12 @@ class ConstructionAnalytics:
         
         return summary
 
-def generate_analytics_report(schedule_df, cost_df, productivity_df, safety_df, quality_df):
-    """Generate comprehensive analytics report"""
+@traced('analytics.report')
+def generate_analytics_report(schedule_df, cost_df, productivity_df, safety_df, quality_df, as_of=None, crew_productivity_df=None):
+    """Generate comprehensive analytics report (as of a past date when `as_of` is given)"""
     
-    analytics = ConstructionAnalytics(schedule_df, cost_df, productivity_df, safety_df, quality_df)
+    analytics = ConstructionAnalytics(schedule_df, cost_df, productivity_df, safety_df, quality_df, as_of=as_of,
+                                      crew_productivity_df=crew_productivity_df)
     
     report = {
         'executive_summary': analytics.generate_executive_summary(),
@@ -0,0 +1,473 @@
+"""
+Anomaly detection for KPI streams
+EWMA control charts, CUSUM and robust (median/MAD) z-scores, each available as a
+vectorized batch function for backfills and as an online detector for live feeds
+"""
+
+import bisect
+import math
+from collections import deque
+import numpy as np
+import pandas as pd
+
+# KPI column -> (table, direction of concern): 'up' flags spikes, 'down' flags drops
+ANOMALY_COLUMNS = {
+    'Weekly_Actual': ('cost', 'up'),
+    'Rework_Cost': ('quality', 'up'),
+    'Near_Miss_Count': ('safety', 'up'),
+    'Labor_Hours_Per_Unit': ('productivity', 'up'),
+    'Equipment_Utilization_Pct': ('productivity', 'down')
+}
+
+DEFAULT_EWMA_SPAN = 8
+DEFAULT_EWMA_LIMIT = 3.0        # control limit in standard deviations
+DEFAULT_CUSUM_SLACK = 0.5       # k, in standard deviations
+DEFAULT_CUSUM_THRESHOLD = 5.0   # h, in standard deviations
+DEFAULT_BASELINE_PERIODS = 8    # periods used to estimate the in-control mean and sigma
+DEFAULT_ROBUST_WINDOW = 12
+DEFAULT_ROBUST_LIMIT = 3.5
+
+# Scales the MAD to a standard deviation for normally distributed data
+MAD_SCALE = 1.4826
+
+# Batch functions work on 2-D arrays: periods along axis 0, one series per column.
+# Missing (NaN) periods are skipped, as the online detectors skip them
+
+def _as_matrix(values):
+    matrix = np.asarray(values, dtype=float)
+    return matrix[:, None] if matrix.ndim == 1 else matrix
+
+def _observed(matrix):
+    """Running count of non-missing observations in each column"""
+    return np.cumsum(~np.isnan(matrix), axis=0)
+
+def _in_warmup(matrix, warmup):
+    """Rows up to and including each column's `warmup`-th observation"""
+    return _observed(matrix) <= warmup
+
+def _baseline(matrix, periods):
+    """Per-column mean and standard deviation of the first `periods` observations"""
+
+    head = np.where(_in_warmup(matrix, periods), matrix, np.nan)
+    counts = np.sum(~np.isnan(head), axis=0)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        mean = np.nansum(head, axis=0) / counts
+        variance = np.nansum((head - mean) ** 2, axis=0) / (counts - 1)
+    std = np.sqrt(variance)
+    std[(counts < 2) | ~(std > 0)] = np.nan
+    return mean, std
+
+def ewma_matrix(matrix, span=DEFAULT_EWMA_SPAN, limit=DEFAULT_EWMA_LIMIT, warmup=DEFAULT_BASELINE_PERIODS):
+    """EWMA statistic, baseline target and control-limit half-width for every column"""
+
+    matrix = _as_matrix(matrix)
+    mean, std = _baseline(matrix, warmup)
+
+    lam = 2.0 / (span + 1)
+    ewma = pd.DataFrame(matrix).ewm(alpha=lam, adjust=False, ignore_na=True).mean().to_numpy()
+
+    # Time-varying control limits of the EWMA statistic, advancing with observations only
+    t = _observed(matrix)
+    width = limit * std * np.sqrt(lam / (2 - lam) * (1 - (1 - lam) ** (2 * t)))
+
+    return ewma, mean, width
+
+def cusum_matrix(matrix, slack=DEFAULT_CUSUM_SLACK, warmup=DEFAULT_BASELINE_PERIODS):
+    """Upper and lower tabular CUSUM statistics for every column
+
+    Uses the closed form S_t = C_t - min(0, min_{s<=t} C_s) of the recursion
+    S_t = max(0, S_{t-1} + z_t - k), so each series is a single cumsum.
+    Accumulation starts after the `warmup` observations used for the
+    baseline, and missing periods leave the sums unchanged.
+    """
+
+    matrix = _as_matrix(matrix)
+    mean, std = _baseline(matrix, warmup)
+    with np.errstate(invalid='ignore'):
+        z = (matrix - mean) / std
+    warming = _in_warmup(matrix, warmup)
+    active = ~warming & ~np.isnan(z)
+
+    high_walk = np.cumsum(np.where(active, z - slack, 0.0), axis=0)
+    low_walk = np.cumsum(np.where(active, -z - slack, 0.0), axis=0)
+    high = high_walk - np.minimum(0, np.minimum.accumulate(high_walk, axis=0))
+    low = low_walk - np.minimum(0, np.minimum.accumulate(low_walk, axis=0))
+    high[warming] = 0
+    low[warming] = 0
+    return high, low
+
+def robust_z_matrix(matrix, window=DEFAULT_ROBUST_WINDOW):
+    """Robust z-score of every point against the median/MAD of the `window` observations before it"""
+
+    matrix = _as_matrix(matrix)
+    n = len(matrix)
+    median = np.full(matrix.shape, np.nan)
+    mad = np.full(matrix.shape, np.nan)
+
+    if n > window:
+        # Observations are packed to the top of each column so windows skip missing periods
+        order = np.argsort(np.isnan(matrix), axis=0, kind='stable')
+        packed = np.take_along_axis(matrix, order, axis=0)
+        # windows[i] holds observations i .. i+window-1 and scores observation i+window
+        windows = np.lib.stride_tricks.sliding_window_view(packed[:-1], window, axis=0)
+        window_median = np.median(windows, axis=-1)
+        packed_median = np.full(matrix.shape, np.nan)
+        packed_mad = np.full(matrix.shape, np.nan)
+        packed_median[window:] = window_median
+        packed_mad[window:] = np.median(np.abs(windows - window_median[..., None]), axis=-1)
+        np.put_along_axis(median, order, packed_median, axis=0)
+        np.put_along_axis(mad, order, packed_mad, axis=0)
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        robust_z = (matrix - median) / np.where(mad > 0, mad * MAD_SCALE, np.nan)
+    return robust_z, median, mad
+
+def _directional(statistic, direction):
+    if direction == 'up':
+        return statistic > 0
+    if direction == 'down':
+        return statistic < 0
+    return np.ones(statistic.shape, dtype=bool)
+
+def detector_flags(matrix, direction=None):
+    """Run the three detectors over every column and return their boolean flag matrices
+
+    Returns a dict with 'EWMA', 'CUSUM', 'Robust' and 'Anomaly' (at least two
+    detectors agree). With `direction` 'up' or 'down' only deviations in
+    that direction are flagged.
+    """
+
+    matrix = _as_matrix(matrix)
+    missing = np.isnan(matrix)
+
+    ewma, target, width = ewma_matrix(matrix)
+    deviation = ewma - target
+    with np.errstate(invalid='ignore'):
+        ewma_flags = (np.abs(deviation) > width) & _directional(deviation, direction)
+    ewma_flags[_in_warmup(matrix, DEFAULT_BASELINE_PERIODS)] = False
+
+    high, low = cusum_matrix(matrix)
+    if direction == 'up':
+        cusum_flags = high > DEFAULT_CUSUM_THRESHOLD
+    elif direction == 'down':
+        cusum_flags = low > DEFAULT_CUSUM_THRESHOLD
+    else:
+        cusum_flags = (high > DEFAULT_CUSUM_THRESHOLD) | (low > DEFAULT_CUSUM_THRESHOLD)
+
+    robust_z, _, _ = robust_z_matrix(matrix)
+    with np.errstate(invalid='ignore'):
+        robust_flags = (np.abs(robust_z) > DEFAULT_ROBUST_LIMIT) & _directional(robust_z, direction)
+
+    flags = {'EWMA': ewma_flags, 'CUSUM': cusum_flags, 'Robust': robust_flags}
+    for name in flags:
+        flags[name] = flags[name] & ~missing
+    flags['Anomaly'] = (flags['EWMA'].astype(int) + flags['CUSUM'] + flags['Robust']) >= 2
+    return flags
+
+def ewma_chart(values, span=DEFAULT_EWMA_SPAN, limit=DEFAULT_EWMA_LIMIT, warmup=DEFAULT_BASELINE_PERIODS):
+    """EWMA control chart over a 1-D series
+
+    Returns a DataFrame with the EWMA statistic, its Target, the upper/lower
+    control limits and a boolean Anomaly column.
+    """
+
+    ewma, target, width = ewma_matrix(values, span, limit, warmup)
+    ewma, width = ewma[:, 0], width[:, 0]
+    with np.errstate(invalid='ignore'):
+        anomaly = np.abs(ewma - target[0]) > width
+    anomaly[_in_warmup(_as_matrix(values), warmup)[:, 0]] = False
+
+    return pd.DataFrame(
+        {'EWMA': ewma, 'Target': target[0], 'UCL': target[0] + width, 'LCL': target[0] - width, 'Anomaly': anomaly},
+        index=getattr(values, 'index', None)
+    )
+
+def cusum(values, slack=DEFAULT_CUSUM_SLACK, threshold=DEFAULT_CUSUM_THRESHOLD, warmup=DEFAULT_BASELINE_PERIODS):
+    """Two-sided tabular CUSUM over a 1-D series, in standard-deviation units
+
+    Returns a DataFrame with CUSUM_High, CUSUM_Low and a boolean Anomaly column.
+    """
+
+    high, low = cusum_matrix(values, slack, warmup)
+    high, low = high[:, 0], low[:, 0]
+    anomaly = (high > threshold) | (low > threshold)
+
+    return pd.DataFrame({'CUSUM_High': high, 'CUSUM_Low': low, 'Anomaly': anomaly}, index=getattr(values, 'index', None))
+
+def robust_zscores(values, window=DEFAULT_ROBUST_WINDOW, limit=DEFAULT_ROBUST_LIMIT):
+    """Robust z-scores of each point against the trailing window's median and MAD
+
+    The window excludes the current point, so a spike cannot mask itself.
+    Returns a DataFrame with Median, MAD, Robust_Z and a boolean Anomaly column.
+    """
+
+    robust_z, median, mad = robust_z_matrix(values, window)
+    robust_z = robust_z[:, 0]
+    with np.errstate(invalid='ignore'):
+        anomaly = np.abs(robust_z) > limit
+
+    return pd.DataFrame(
+        {'Median': median[:, 0], 'MAD': mad[:, 0], 'Robust_Z': robust_z, 'Anomaly': anomaly},
+        index=getattr(values, 'index', None)
+    )
+
+def detect_anomalies(df, columns=None):
+    """Run all three detectors over KPI columns of one table
+
+    Returns a DataFrame aligned with `df` holding, per column, boolean
+    `<column>_EWMA`, `<column>_CUSUM` and `<column>_Robust` flags plus a
+    combined `<column>_Anomaly` flag that is set when at least two detectors agree.
+    """
+
+    columns = columns or [c for c in ANOMALY_COLUMNS if c in df.columns]
+    result = pd.DataFrame(index=df.index)
+    if 'Date' in df.columns:
+        result['Date'] = df['Date']
+
+    for column in columns:
+        direction = ANOMALY_COLUMNS.get(column, (None, None))[1]
+        flags = detector_flags(df[column].to_numpy(dtype=float), direction)
+        for name, values in flags.items():
+            result[f'{column}_{name}'] = values[:, 0]
+
+    return result
+
+def scan_portfolio_anomalies(projects, latest_only=False):
+    """Detect anomalies in every monitored KPI across many projects
+
+    `projects` maps project id to a (cost, productivity, safety, quality)
+    tuple of tables. Each KPI is evaluated for all projects at once as a
+    periods x projects matrix. With `latest_only`, only anomalies in each
+    project's latest period are returned. Returns a DataFrame with Project,
+    Date, KPI, Value and Detectors columns.
+    """
+
+    columns = ['Project', 'Date', 'KPI', 'Value', 'Detectors']
+    table_positions = {'cost': 0, 'productivity': 1, 'safety': 2, 'quality': 3}
+    project_ids = list(projects)
+    rows = []
+
+    for kpi, (table, direction) in ANOMALY_COLUMNS.items():
+        frames = [projects[project_id][table_positions[table]] for project_id in project_ids]
+        lengths = np.array([len(df) if kpi in df.columns else 0 for df in frames])
+        if not lengths.any():
+            continue
+
+        matrix = np.full((lengths.max(), len(frames)), np.nan)
+        for j, df in enumerate(frames):
+            if lengths[j]:
+                matrix[:lengths[j], j] = df[kpi].to_numpy(dtype=float)
+
+        flags = detector_flags(matrix, direction)
+        anomaly = flags['Anomaly']
+        if latest_only:
+            latest = np.zeros_like(anomaly)
+            has_rows = lengths > 0
+            latest[lengths[has_rows] - 1, np.flatnonzero(has_rows)] = True
+            anomaly = anomaly & latest
+
+        for i, j in zip(*np.nonzero(anomaly)):
+            df = frames[j]
+            detectors = [name for name in ('EWMA', 'CUSUM', 'Robust') if flags[name][i, j]]
+            rows.append({
+                'Project': project_ids[j],
+                'Date': df['Date'].iloc[i] if 'Date' in df.columns else i,
+                'KPI': kpi,
+                'Value': matrix[i, j],
+                'Detectors': ', '.join(detectors)
+            })
+
+    return pd.DataFrame(rows, columns=columns)
+
+def latest_anomaly_alerts(projects):
+    """Anomalies of each project's latest period as short alert strings
+
+    `projects` is as for scan_portfolio_anomalies. Returns a dict of project
+    id to a list like ['Weekly_Actual spike (EWMA, CUSUM)']; projects without
+    anomalies are left out.
+    """
+
+    alerts = {}
+    anomalies = scan_portfolio_anomalies(projects, latest_only=True)
+    for row in anomalies.itertuples(index=False):
+        change = 'drop' if ANOMALY_COLUMNS[row.KPI][1] == 'down' else 'spike'
+        alerts.setdefault(row.Project, []).append(f"{row.KPI} {change} ({row.Detectors})")
+    return alerts
+
+def scan_project_anomalies(cost_df, productivity_df, safety_df, quality_df):
+    """Detect anomalies in every monitored KPI of one project"""
+    anomalies = scan_portfolio_anomalies({None: (cost_df, productivity_df, safety_df, quality_df)})
+    return anomalies.drop(columns='Project')
+
+class _RunningBaseline:
+    """Welford mean/standard deviation over the first `periods` observations"""
+
+    def __init__(self, periods):
+        self.periods = periods
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.std = None
+
+    def add(self, value):
+        """Fold a warm-up observation in; returns False once the baseline is complete"""
+
+        if self.count >= self.periods:
+            return False
+        self.count += 1
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (value - self.mean)
+        if self.count == self.periods and self.count > 1:
+            self.std = math.sqrt(self.m2 / (self.count - 1)) or None
+        return True
+
+class EWMADetector:
+    """Online EWMA control chart, O(1) per update"""
+
+    def __init__(self, span=DEFAULT_EWMA_SPAN, limit=DEFAULT_EWMA_LIMIT, warmup=DEFAULT_BASELINE_PERIODS, direction=None):
+        self.lam = 2.0 / (span + 1)
+        self.limit = limit
+        self.direction = direction
+        self.baseline = _RunningBaseline(warmup)
+        self.count = 0
+        self.ewma = None
+
+    def update(self, value):
+        """Add an observation; returns True if the EWMA is outside the control limits
+
+        A missing (NaN) observation is skipped, as in the batch functions.
+        """
+
+        if math.isnan(value):
+            return False
+        self.count += 1
+        self.ewma = value if self.ewma is None else self.lam * value + (1 - self.lam) * self.ewma
+        if self.baseline.add(value) or self.baseline.std is None:
+            return False
+
+        deviation = self.ewma - self.baseline.mean
+        width = self.limit * self.baseline.std * math.sqrt(self.lam / (2 - self.lam) * (1 - (1 - self.lam) ** (2 * self.count)))
+        return abs(deviation) > width and _directional(np.array(deviation), self.direction).item()
+
+class CUSUMDetector:
+    """Online two-sided CUSUM, O(1) per update"""
+
+    def __init__(self, slack=DEFAULT_CUSUM_SLACK, threshold=DEFAULT_CUSUM_THRESHOLD, warmup=DEFAULT_BASELINE_PERIODS, direction=None):
+        self.slack = slack
+        self.threshold = threshold
+        self.direction = direction
+        self.baseline = _RunningBaseline(warmup)
+        self.high = 0.0
+        self.low = 0.0
+
+    def update(self, value):
+        """Add an observation; returns True if the monitored cumulative sum exceeds the threshold
+
+        A missing (NaN) observation is skipped, as in the batch functions.
+        """
+
+        if math.isnan(value):
+            return False
+        if self.baseline.add(value) or self.baseline.std is None:
+            return False
+
+        z = (value - self.baseline.mean) / self.baseline.std
+        self.high = max(0.0, self.high + z - self.slack)
+        self.low = max(0.0, self.low - z - self.slack)
+        if self.direction == 'up':
+            return self.high > self.threshold
+        if self.direction == 'down':
+            return self.low > self.threshold
+        return self.high > self.threshold or self.low > self.threshold
+
+    def reset(self):
+        """Restart accumulation after an alarm has been handled"""
+        self.high = 0.0
+        self.low = 0.0
+
+class RobustZDetector:
+    """Online robust z-score against the median/MAD of a trailing window
+
+    Keeps the window in a sorted list: the median is read off its middle and
+    the MAD merges the deviations outward from the median, so nothing is
+    re-sorted. Each update costs O(window) (the list insert and removal and
+    the half-window merge) regardless of how long the stream has been running.
+    """
+
+    def __init__(self, window=DEFAULT_ROBUST_WINDOW, limit=DEFAULT_ROBUST_LIMIT, direction=None):
+        self.window = window
+        self.limit = limit
+        self.direction = direction
+        self.values = deque()
+        self.sorted_values = []
+
+    @staticmethod
+    def _median(sorted_values):
+        n = len(sorted_values)
+        middle = n // 2
+        return sorted_values[middle] if n % 2 else (sorted_values[middle - 1] + sorted_values[middle]) / 2
+
+    @staticmethod
+    def _mad(sorted_values, median):
+        """Median absolute deviation from the sorted values, taking the smallest deviations first"""
+
+        n = len(sorted_values)
+        right = bisect.bisect_left(sorted_values, median)
+        left = right - 1
+        deviations = []
+        while len(deviations) <= n // 2:
+            if right < n and (left < 0 or sorted_values[right] - median <= median - sorted_values[left]):
+                deviations.append(sorted_values[right] - median)
+                right += 1
+            else:
+                deviations.append(median - sorted_values[left])
+                left -= 1
+        return deviations[n // 2] if n % 2 else (deviations[n // 2 - 1] + deviations[n // 2]) / 2
+
+    def score(self, value):
+        """Robust z-score of a value against the current window (NaN until the window is full)"""
+
+        if len(self.values) < self.window:
+            return float('nan')
+        median = self._median(self.sorted_values)
+        mad = self._mad(self.sorted_values, median)
+        if mad == 0:
+            return float('nan')
+        return (value - median) / (mad * MAD_SCALE)
+
+    def update(self, value):
+        """Score an observation, then add it to the window; returns True if it is an outlier
+
+        A missing (NaN) observation is skipped and never enters the window.
+        """
+
+        if math.isnan(value):
+            return False
+        z = self.score(value)
+
+        self.values.append(value)
+        bisect.insort(self.sorted_values, value)
+        if len(self.values) > self.window:
+            oldest = self.values.popleft()
+            del self.sorted_values[bisect.bisect_left(self.sorted_values, oldest)]
+
+        if math.isnan(z):
+            return False
+        return abs(z) > self.limit and _directional(np.array(z), self.direction).item()
+
+class KPIStreamMonitor:
+    """Online monitor running all three detectors on one KPI stream"""
+
+    def __init__(self, direction=None):
+        self.detectors = {
+            'EWMA': EWMADetector(direction=direction),
+            'CUSUM': CUSUMDetector(direction=direction),
+            'Robust': RobustZDetector(direction=direction)
+        }
+
+    def update(self, value):
+        """Add an observation; returns the names of the detectors that fired, or []"""
+
+        fired = [name for name, detector in self.detectors.items() if detector.update(value)]
+        return fired if len(fired) >= 2 else []
@@ -0,0 +1,156 @@
+"""
+Batch analytics reports for many projects
+Runs generate_analytics_report across project directories in a worker pool and
+writes one record per project as JSON lines or Parquet
+"""
+
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import pandas as pd
+from analytics import generate_analytics_report
+from anomaly import latest_anomaly_alerts
+from project_store import discover_projects, load_project_tables, project_groups, split_by_project
+
+REPORT_SECTIONS = ['executive_summary', 'earned_value_metrics', 'productivity_benchmarks', 'risk_analysis']
+
+# Report sections plus the KPI anomalies of the latest period, scanned for all of a worker's projects at once
+RECORD_SECTIONS = REPORT_SECTIONS + ['anomalies']
+
+def _report_projects(args):
+    """Worker: build report records for the projects of one work item (a directory, or a group of its Project_IDs)"""
+
+    project_dir, project_ids, project_filter = args
+    timings = {'load': 0.0, 'analytics': 0.0}
+
+    start = time.process_time()
+    # A Project_ID group reads only its own rows
+    tables = load_project_tables(project_dir, project_ids)
+    timings['load'] += time.process_time() - start
+
+    records = []
+    anomaly_tables = {}
+    start = time.process_time()
+    for project_id, project_tables in split_by_project(project_dir, tables, project_filter, project_ids):
+        if len(project_tables[0]) == 0:
+            continue
+        report = generate_analytics_report(*project_tables)
+        record = {'project': project_id, 'source': project_dir}
+        record.update({section: report[section] for section in REPORT_SECTIONS})
+        records.append(record)
+        anomaly_tables[project_id] = project_tables[1:]
+    alerts = latest_anomaly_alerts(anomaly_tables)
+    for record in records:
+        record['anomalies'] = alerts.get(record['project'], [])
+    timings['analytics'] += time.process_time() - start
+
+    return records, timings
+
+def _json_default(value):
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, pd.Timestamp):
+        return value.strftime('%Y-%m-%d')
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+def write_jsonl(records, output):
+    """Write report records as JSON lines to a path, or stdout for '-'"""
+
+    stream = sys.stdout if output == '-' else open(output, 'w', encoding='utf-8')
+    try:
+        for record in records:
+            stream.write(json.dumps(record, default=_json_default, ensure_ascii=False) + '\n')
+    finally:
+        if stream is not sys.stdout:
+            stream.close()
+
+def records_to_frame(records):
+    """Flatten report records into one row per project"""
+
+    rows = []
+    for record in records:
+        row = {'project': record['project'], 'source': record['source']}
+        for section in RECORD_SECTIONS:
+            value = record[section]
+            if isinstance(value, dict):
+                for key, item in value.items():
+                    row[f'{section}.{key}'] = '; '.join(item) if isinstance(item, list) else item
+            else:
+                row[section] = '; '.join(value) if isinstance(value, list) else value
+        rows.append(row)
+
+    df = pd.DataFrame(rows)
+    # Report values mix numbers and display strings ('N/A', '+3.1%'), which Parquet needs typed
+    for column in df.columns:
+        if df[column].dtype == object:
+            df[column] = df[column].map(lambda v: None if v is None else str(v))
+    return df
+
+def write_parquet(records, output):
+    """Write report records as a flat Parquet table"""
+    if output == '-':
+        raise ValueError("Parquet output needs a file path, not stdout")
+    records_to_frame(records).to_parquet(output, index=False)
+
+def run_batch_report(inputs, project_filter=None, output='-', output_format='jsonl', workers=None, log=sys.stderr):
+    """Generate analytics reports for every project found under `inputs`
+
+    Returns the number of project records written. Per-stage timings are
+    printed to `log`; load and analytics times are CPU times summed over
+    workers.
+    """
+
+    stage_times = {}
+    total_start = time.perf_counter()
+
+    workers = workers or os.cpu_count() or 1
+
+    start = time.perf_counter()
+    project_dirs = discover_projects(inputs)
+    # Directories holding many projects by Project_ID are split so every worker gets a share
+    items = project_groups(project_dirs, project_filter, workers)
+    stage_times['discover'] = time.perf_counter() - start
+
+    if not project_dirs:
+        print("❌ No project data found for the given inputs", file=log)
+        return 0
+
+    workers = max(1, min(workers, len(items)))
+    records = []
+    worker_times = {'load': 0.0, 'analytics': 0.0}
+
+    start = time.perf_counter()
+    jobs = [(project_dir, project_ids, project_filter) for project_dir, project_ids in items]
+    if workers == 1:
+        results = map(_report_projects, jobs)
+        for project_records, timings in results:
+            records.extend(project_records)
+            for stage, seconds in timings.items():
+                worker_times[stage] += seconds
+    else:
+        chunksize = max(1, len(jobs) // (workers * 4))
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            for project_records, timings in pool.map(_report_projects, jobs, chunksize=chunksize):
+                records.extend(project_records)
+                for stage, seconds in timings.items():
+                    worker_times[stage] += seconds
+    stage_times['compute (wall)'] = time.perf_counter() - start
+    stage_times['load (cpu)'] = worker_times['load']
+    stage_times['analytics (cpu)'] = worker_times['analytics']
+
+    start = time.perf_counter()
+    if output_format == 'parquet':
+        write_parquet(records, output)
+    else:
+        write_jsonl(records, output)
+    stage_times['write'] = time.perf_counter() - start
+    stage_times['total'] = time.perf_counter() - total_start
+
+    print(f"✅ {len(records)} project reports from {len(project_dirs)} directories ({workers} workers)", file=log)
+    for stage, seconds in stage_times.items():
+        print(f"   {stage:<16} {seconds:8.3f}s", file=log)
+
+    return len(records)
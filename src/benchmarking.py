@@ -0,0 +1,329 @@
+"""
+Cross-project productivity benchmarking
+Keeps mergeable KLL quantile sketches of the productivity metrics per segment
+(all projects, and each trade when the data has one), updated incrementally as
+weeks arrive, and answers percentile-rank queries without re-sorting history
+"""
+
+import bisect
+import json
+import math
+import os
+import random
+import numpy as np
+import pandas as pd
+
+# Metric -> direction in which a value is better
+BENCHMARK_METRICS = {
+    'Labor_Hours_Per_Unit': 'lower',
+    'Equipment_Utilization_Pct': 'higher',
+    'Material_Waste_Pct': 'lower'
+}
+
+ALL_SEGMENT = 'ALL'
+SEGMENT_COLUMN = 'Trade'
+
+# KLL accuracy parameter: rank error is roughly 1.7 / k
+DEFAULT_K = 200
+_CAPACITY_DECAY = 2 / 3
+
+class KLLSketch:
+    """Mergeable KLL quantile sketch of a stream of numbers
+
+    Level h holds items that each stand for 2**h inserted values. Queries use a
+    sorted view of all levels that is rebuilt lazily after updates, so ranks and
+    quantiles are a binary search.
+    """
+
+    def __init__(self, k=DEFAULT_K, seed=None):
+        self.k = k
+        self.n = 0
+        self.levels = [[]]
+        self.min = math.inf
+        self.max = -math.inf
+        self._random = random.Random(seed)
+        self._view = None
+
+    def _capacity(self, level):
+        depth = len(self.levels) - level - 1
+        return max(2, int(math.ceil(self.k * _CAPACITY_DECAY ** depth)))
+
+    def _compress(self):
+        while sum(len(items) for items in self.levels) > sum(self._capacity(h) for h in range(len(self.levels))):
+            for level, items in enumerate(self.levels):
+                if len(items) >= self._capacity(level):
+                    break
+            if level + 1 == len(self.levels):
+                self.levels.append([])
+
+            items.sort()
+            # An odd item out stays behind so weights are preserved exactly
+            keep = [items.pop()] if len(items) % 2 else []
+            offset = self._random.randint(0, 1)
+            self.levels[level + 1].extend(items[offset::2])
+            self.levels[level] = keep
+
+    def update(self, value):
+        """Add one value"""
+        value = float(value)
+        self.levels[0].append(value)
+        self.n += 1
+        self.min = min(self.min, value)
+        self.max = max(self.max, value)
+        self._view = None
+        if len(self.levels[0]) >= self._capacity(0):
+            self._compress()
+
+    def update_many(self, values):
+        """Add an array of values (NaNs are skipped)"""
+
+        values = np.asarray(values, dtype=float)
+        values = values[~np.isnan(values)]
+        if len(values) == 0:
+            return
+        self.levels[0].extend(values.tolist())
+        self.n += len(values)
+        self.min = min(self.min, float(values.min()))
+        self.max = max(self.max, float(values.max()))
+        self._view = None
+        self._compress()
+
+    def merge(self, other):
+        """Fold another sketch into this one"""
+
+        while len(self.levels) < len(other.levels):
+            self.levels.append([])
+        for level, items in enumerate(other.levels):
+            self.levels[level].extend(items)
+        self.n += other.n
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        self._view = None
+        self._compress()
+        return self
+
+    def _sorted_view(self):
+        if self._view is None:
+            pairs = sorted((value, 1 << level) for level, items in enumerate(self.levels) for value in items)
+            values = [value for value, _ in pairs]
+            cumulative = np.cumsum([weight for _, weight in pairs]).tolist()
+            self._view = (values, cumulative, cumulative[-1] if cumulative else 0)
+        return self._view
+
+    def rank(self, value):
+        """Estimated fraction of values <= `value`"""
+
+        values, cumulative, total = self._sorted_view()
+        if total == 0:
+            return math.nan
+        position = bisect.bisect_right(values, value)
+        return cumulative[position - 1] / total if position else 0.0
+
+    def quantile(self, q):
+        """Estimated value at quantile `q` (0-1)"""
+
+        values, cumulative, total = self._sorted_view()
+        if total == 0:
+            return math.nan
+        if q <= 0:
+            return self.min
+        if q >= 1:
+            return self.max
+        position = bisect.bisect_left(cumulative, q * total)
+        return values[min(position, len(values) - 1)]
+
+    def to_dict(self):
+        return {'k': self.k, 'n': self.n, 'min': self.min, 'max': self.max, 'levels': self.levels}
+
+    @classmethod
+    def from_dict(cls, data):
+        sketch = cls(k=data['k'])
+        sketch.n = data['n']
+        sketch.min = data['min']
+        sketch.max = data['max']
+        sketch.levels = [list(items) for items in data['levels']]
+        return sketch
+
+class BenchmarkService:
+    """Percentile benchmarks of productivity metrics across projects and trades
+
+    Weeks are ingested per project; only rows newer than the project's last
+    ingested Date are added, so the service can be fed the full table every
+    week.
+    """
+
+    def __init__(self, k=DEFAULT_K):
+        self.k = k
+        self.sketches = {}
+        self.watermarks = {}
+
+    def _sketch(self, metric, segment):
+        key = (metric, segment)
+        if key not in self.sketches:
+            self.sketches[key] = KLLSketch(self.k)
+        return self.sketches[key]
+
+    def ingest(self, project_id, productivity_df, segment=None):
+        """Add the project's productivity rows that arrived since the last ingest
+
+        Rows are segmented by their Trade column when present, otherwise by
+        `segment` (if given); every row also counts towards the ALL segment.
+        Returns the number of new rows.
+        """
+
+        rows = productivity_df
+        watermark = self.watermarks.get(project_id)
+        if watermark is not None:
+            rows = rows[pd.to_datetime(rows['Date']) > watermark]
+        if len(rows) == 0:
+            return 0
+
+        for metric in BENCHMARK_METRICS:
+            if metric not in rows.columns:
+                continue
+            self._sketch(metric, ALL_SEGMENT).update_many(rows[metric].to_numpy())
+            if SEGMENT_COLUMN in rows.columns:
+                for trade, trade_rows in rows.groupby(SEGMENT_COLUMN, sort=False):
+                    self._sketch(metric, str(trade)).update_many(trade_rows[metric].to_numpy())
+            elif segment is not None:
+                self._sketch(metric, str(segment)).update_many(rows[metric].to_numpy())
+
+        self.watermarks[project_id] = pd.to_datetime(rows['Date']).max()
+        return len(rows)
+
+    def merge(self, other):
+        """Fold another service (e.g. built by a worker process) into this one"""
+
+        for key, sketch in other.sketches.items():
+            if key in self.sketches:
+                self.sketches[key].merge(sketch)
+            else:
+                self.sketches[key] = KLLSketch.from_dict(sketch.to_dict())
+        for project_id, watermark in other.watermarks.items():
+            current = self.watermarks.get(project_id)
+            self.watermarks[project_id] = watermark if current is None else max(current, watermark)
+        return self
+
+    def segments(self, metric=None):
+        return sorted({segment for key_metric, segment in self.sketches if metric in (None, key_metric)})
+
+    def percentile_rank(self, metric, value, segment=ALL_SEGMENT):
+        """Percentage (0-100) of benchmark weeks with a value <= `value`"""
+        sketch = self.sketches.get((metric, segment))
+        return sketch.rank(value) * 100 if sketch is not None else math.nan
+
+    def percentile(self, metric, pct, segment=ALL_SEGMENT):
+        """Benchmark value at percentile `pct` (0-100)"""
+        sketch = self.sketches.get((metric, segment))
+        return sketch.quantile(pct / 100) if sketch is not None else math.nan
+
+    def compare(self, metric, value, segment=ALL_SEGMENT):
+        """Percentile rank of a value plus the benchmark quartiles
+
+        'Performance_Percentile' is oriented so that higher is always better
+        (for lower-is-better metrics it is 100 minus the rank).
+        """
+
+        rank = self.percentile_rank(metric, value, segment)
+        performance = 100 - rank if BENCHMARK_METRICS[metric] == 'lower' else rank
+        return {
+            'Value': value,
+            'Percentile_Rank': round(rank, 1),
+            'Performance_Percentile': round(performance, 1),
+            'P25': self.percentile(metric, 25, segment),
+            'Median': self.percentile(metric, 50, segment),
+            'P75': self.percentile(metric, 75, segment)
+        }
+
+    def benchmark_project(self, productivity_df, segment=ALL_SEGMENT):
+        """Compare a project's latest productivity week with the benchmark segment"""
+
+        if len(productivity_df) == 0:
+            return {}
+        current = productivity_df.iloc[-1]
+        return {
+            metric: self.compare(metric, float(current[metric]), segment)
+            for metric in BENCHMARK_METRICS
+            if metric in productivity_df.columns and (metric, segment) in self.sketches
+        }
+
+    def save(self, path):
+        """Store the sketches and ingest watermarks as JSON"""
+
+        data = {
+            'k': self.k,
+            'sketches': [
+                {'metric': metric, 'segment': segment, 'sketch': sketch.to_dict()}
+                for (metric, segment), sketch in self.sketches.items()
+            ],
+            'watermarks': {project_id: watermark.strftime('%Y-%m-%d') for project_id, watermark in self.watermarks.items()}
+        }
+        with open(path, 'w', encoding='utf-8') as stream:
+            json.dump(data, stream)
+
+    @classmethod
+    def load(cls, path):
+        with open(path, encoding='utf-8') as stream:
+            data = json.load(stream)
+        service = cls(k=data['k'])
+        for entry in data['sketches']:
+            service.sketches[(entry['metric'], entry['segment'])] = KLLSketch.from_dict(entry['sketch'])
+        service.watermarks = {project_id: pd.Timestamp(watermark) for project_id, watermark in data['watermarks'].items()}
+        return service
+
+def build_benchmarks(projects, k=DEFAULT_K):
+    """Build a service from a mapping of project id to productivity table"""
+
+    service = BenchmarkService(k)
+    for project_id, productivity_df in projects.items():
+        service.ingest(project_id, productivity_df)
+    return service
+
+def build_project_benchmarks(patterns, k=DEFAULT_K):
+    """Build a service from project directories or glob patterns (see project_store)"""
+
+    from project_store import discover_projects, load_project_tables, split_by_project
+
+    service = BenchmarkService(k)
+    for project_dir in discover_projects(patterns):
+        tables = load_project_tables(project_dir)
+        for project_id, project_tables in split_by_project(project_dir, tables):
+            service.ingest(project_id, project_tables[2])
+    return service
+
+def benchmark_portfolio(patterns, store=None, project_filter=None, k=DEFAULT_K):
+    """Add every project's new productivity weeks to the benchmarks and rank each project's latest week
+
+    With `store` (a JSON file) the service is loaded from it when it exists and
+    saved back, so each run only adds weeks newer than the last. Every project
+    found counts towards the benchmarks; the ranking holds the projects
+    matching `project_filter`. Returns (service, ranking), where the ranking
+    has one row per project with each metric's latest value and performance
+    percentile (higher is better).
+    """
+
+    from chunked_analytics import resolve_table_path
+    from project_store import discover_projects, matches_filter, read_table, split_by_project
+
+    service = BenchmarkService.load(store) if store and os.path.exists(store) else BenchmarkService(k)
+    ranked = []
+    for project_dir in discover_projects(patterns):
+        try:
+            productivity_df = read_table(resolve_table_path(project_dir, 'productivity'))
+        except FileNotFoundError:
+            continue
+        for project_id, (project_productivity,) in split_by_project(project_dir, (productivity_df,)):
+            service.ingest(project_id, project_productivity)
+            if matches_filter(project_id, project_filter):
+                ranked.append((project_id, project_productivity))
+    if store:
+        service.save(store)
+
+    rows = []
+    for project_id, productivity_df in ranked:
+        row = {'Project': project_id}
+        for metric, comparison in service.benchmark_project(productivity_df).items():
+            row[metric] = comparison['Value']
+            row[f'{metric}_Percentile'] = comparison['Performance_Percentile']
+        rows.append(row)
+    return service, pd.DataFrame(rows)
@@ -0,0 +1,269 @@
+"""
+Out-of-core analytics for construction project data
+Streams each KPI table from CSV or Parquet in chunks so long histories never
+have to be fully loaded into memory
+"""
+
+import io
+import os
+import pandas as pd
+from analytics import CPI_STABILITY_WINDOW, PROGRESS_TREND_WINDOW, ConstructionAnalytics
+from forecasting import forecast_completion
+from risk_scanner import RISK_WINDOWS
+from tracing import traced
+
+# Table name -> file stem inside the data directory
+TABLE_FILES = {
+    'schedule': 'schedule_data',
+    'cost': 'cost_data',
+    'productivity': 'productivity_data',
+    'safety': 'safety_data',
+    'quality': 'quality_data'
+}
+
+# Columns folded into the streaming aggregates, per table
+AGGREGATE_COLUMNS = {
+    'cost': ['Weekly_Budget', 'Weekly_Actual'],
+    'productivity': ['Labor_Hours', 'Labor_Hours_Per_Unit', 'Equipment_Utilization_Pct', 'Material_Waste_Pct'],
+    'safety': ['Incident_Occurred', 'Near_Miss_Count']
+}
+
+DEFAULT_CHUNKSIZE = 100000
+
+# Files read as JSON lines (one record per line) instead of CSV
+JSON_LINES_SUFFIXES = ('.json', '.jsonl', '.ndjson', '.json.gz', '.jsonl.gz', '.ndjson.gz')
+
+# Longest trailing window used by ConstructionAnalytics and its risk rules; tails
+# always hold at least DEFAULT_TAIL_ROWS rows
+DEFAULT_TAIL_WINDOW = max(PROGRESS_TREND_WINDOW, CPI_STABILITY_WINDOW, *RISK_WINDOWS.values())
+DEFAULT_TAIL_ROWS = 5
+
+_TAIL_BLOCK_SIZE = 64 * 1024
+
+def resolve_table_path(data_dir, table):
+    """Return the on-disk path of a KPI table, preferring Parquet over CSV"""
+
+    stem = os.path.join(data_dir, TABLE_FILES[table])
+    for extension in ('.parquet', '.csv'):
+        if os.path.exists(stem + extension):
+            return stem + extension
+    raise FileNotFoundError(f"No CSV or Parquet file found for '{table}' in {data_dir}")
+
+def _import_parquet():
+    try:
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise ImportError("Reading Parquet tables requires pyarrow: pip install pyarrow")
+    return pq
+
+def iter_table_chunks(path, columns=None, chunksize=DEFAULT_CHUNKSIZE, dtype=None):
+    """Yield a table as a sequence of DataFrames of at most `chunksize` rows
+
+    `dtype` maps CSV columns to types, e.g. to keep codes with leading zeros as text.
+    """
+
+    if path.endswith('.parquet'):
+        pq = _import_parquet()
+        parquet_file = pq.ParquetFile(path)
+        for batch in parquet_file.iter_batches(batch_size=chunksize, columns=columns):
+            yield batch.to_pandas()
+    elif path.endswith(JSON_LINES_SUFFIXES):
+        with pd.read_json(path, lines=True, chunksize=chunksize, dtype=dtype or False) as reader:
+            for chunk in reader:
+                yield chunk[[column for column in columns if column in chunk.columns]] if columns is not None else chunk
+    else:
+        usecols = (lambda name: name in columns) if columns is not None else None
+        for chunk in pd.read_csv(path, usecols=usecols, chunksize=chunksize, dtype=dtype):
+            yield chunk
+
+def read_csv_tail(path, n):
+    """Read the header and last `n` rows of a CSV by scanning backwards from the end of the file"""
+
+    with open(path, 'rb') as f:
+        header = f.readline()
+        data_start = f.tell()
+        f.seek(0, os.SEEK_END)
+        position = f.tell()
+
+        tail = b''
+        # One extra newline is needed to be sure the first kept line is complete
+        while position > data_start and tail.count(b'\n') <= n:
+            step = min(_TAIL_BLOCK_SIZE, position - data_start)
+            position -= step
+            f.seek(position)
+            tail = f.read(step) + tail
+
+    lines = tail.rstrip(b'\r\n').split(b'\n')
+    if position > data_start:
+        lines = lines[1:]  # drop the partial first line
+    lines = [line for line in lines[-n:] if line.strip()] if n > 0 else []
+
+    return pd.read_csv(io.BytesIO(header + b'\n'.join(lines)))
+
+def read_parquet_tail(path, n):
+    """Read the last `n` rows of a Parquet file using only its trailing row groups"""
+
+    pq = _import_parquet()
+    parquet_file = pq.ParquetFile(path)
+
+    frames = []
+    rows = 0
+    for group in range(parquet_file.num_row_groups - 1, -1, -1):
+        if rows >= n:
+            break
+        frame = parquet_file.read_row_group(group).to_pandas()
+        frames.insert(0, frame)
+        rows += len(frame)
+
+    if not frames:
+        return parquet_file.schema_arrow.empty_table().to_pandas()
+    return pd.concat(frames, ignore_index=True).tail(n).reset_index(drop=True)
+
+def read_table_tail(path, n):
+    """Read the last `n` rows of a CSV or Parquet table"""
+
+    if path.endswith('.parquet'):
+        tail_df = read_parquet_tail(path, n)
+    else:
+        tail_df = read_csv_tail(path, n)
+
+    if 'Date' in tail_df.columns:
+        tail_df['Date'] = pd.to_datetime(tail_df['Date'])
+    return tail_df
+
+def read_table_window(path, window=DEFAULT_TAIL_WINDOW, n=DEFAULT_TAIL_ROWS):
+    """Read the trailing rows of a table covering `window` before its latest Date (at least `n` rows)
+
+    Daily or per-shift tables need more rows than weekly ones for the same
+    window; the tail read grows until it reaches far enough back.
+    """
+
+    while True:
+        tail_df = read_table_tail(path, n)
+        if len(tail_df) < n or 'Date' not in tail_df.columns:
+            return tail_df
+        if tail_df['Date'].iloc[0] <= tail_df['Date'].iloc[-1] - window:
+            return tail_df
+        n *= 4
+
+class KPIAggregates:
+    """Mergeable running sums and counts for the whole-history KPI values"""
+
+    def __init__(self):
+        self.sums = {}
+        self.counts = {}
+        self.rows = {}
+
+    def update(self, table, chunk):
+        """Fold one chunk of a table into the running totals"""
+
+        self.rows[table] = self.rows.get(table, 0) + len(chunk)
+        for column in AGGREGATE_COLUMNS.get(table, []):
+            if column not in chunk.columns:
+                continue
+            values = chunk[column]
+            if values.dtype == object:
+                values = values.astype(str).str.lower().map({'true': 1, 'false': 0, 'yes': 1, 'no': 0})
+            key = (table, column)
+            self.sums[key] = self.sums.get(key, 0.0) + float(values.sum())
+            self.counts[key] = self.counts.get(key, 0) + int(values.count())
+
+    def merge(self, other):
+        """Combine totals from another aggregate, e.g. one computed by a different worker"""
+
+        for key, value in other.sums.items():
+            self.sums[key] = self.sums.get(key, 0.0) + value
+        for key, value in other.counts.items():
+            self.counts[key] = self.counts.get(key, 0) + value
+        for table, value in other.rows.items():
+            self.rows[table] = self.rows.get(table, 0) + value
+        return self
+
+    def total(self, table, column):
+        return self.sums.get((table, column), 0.0)
+
+    def mean(self, table, column):
+        count = self.counts.get((table, column), 0)
+        return self.sums[(table, column)] / count if count else float('nan')
+
+def stream_aggregates(data_dir='data', chunksize=DEFAULT_CHUNKSIZE):
+    """Compute KPIAggregates over every table in a single chunked pass"""
+
+    aggregates = KPIAggregates()
+    for table, columns in AGGREGATE_COLUMNS.items():
+        path = resolve_table_path(data_dir, table)
+        for chunk in iter_table_chunks(path, columns=columns, chunksize=chunksize):
+            aggregates.update(table, chunk)
+    return aggregates
+
+class ChunkedConstructionAnalytics(ConstructionAnalytics):
+    """Construction analytics with bounded memory over tables too large to load"""
+
+    def __init__(self, data_dir='data', chunksize=DEFAULT_CHUNKSIZE, tail_rows=DEFAULT_TAIL_ROWS, tail_window=DEFAULT_TAIL_WINDOW):
+        self.data_dir = data_dir
+        self.chunksize = chunksize
+        self.aggregates = stream_aggregates(data_dir, chunksize)
+
+        # Tail-window metrics only ever look at the most recent rows
+        tails = {table: read_table_window(resolve_table_path(data_dir, table), tail_window, tail_rows) for table in TABLE_FILES}
+
+        super().__init__(tails['schedule'], tails['cost'], tails['productivity'], tails['safety'], tails['quality'])
+
+    @traced('analytics.forecast_completion')
+    def forecast_completion(self):
+        """Forecast completion from the whole progress curve, streaming only its Date and progress columns"""
+
+        columns = ['Date', 'Actual_Progress_Pct']
+        path = resolve_table_path(self.data_dir, 'schedule')
+        chunks = list(iter_table_chunks(path, columns=columns, chunksize=self.chunksize))
+        curve = pd.concat(chunks, ignore_index=True) if chunks else pd.DataFrame(columns=columns)
+        curve['Date'] = pd.to_datetime(curve['Date'])
+        return forecast_completion(curve)
+
+    def _historical_productivity_means(self):
+        return (
+            self.aggregates.mean('productivity', 'Labor_Hours_Per_Unit'),
+            self.aggregates.mean('productivity', 'Equipment_Utilization_Pct'),
+            self.aggregates.mean('productivity', 'Material_Waste_Pct')
+        )
+
+    def calculate_safety_totals(self):
+        """Calculate project-to-date incident count, labor hours and TRIR from the streamed totals"""
+
+        if self.aggregates.rows.get('safety', 0) == 0 or self.aggregates.rows.get('productivity', 0) == 0:
+            return {}
+
+        total_incidents = int(self.aggregates.total('safety', 'Incident_Occurred'))
+        total_hours = self.aggregates.total('productivity', 'Labor_Hours')
+        trir = (total_incidents * 200000) / total_hours if total_hours > 0 else 0
+
+        return {
+            'Total_Incidents': total_incidents,
+            'Total_Labor_Hours': round(total_hours, 0),
+            'TRIR': round(trir, 2)
+        }
+
+    def calculate_cost_totals(self):
+        """Calculate project-to-date budget and spend from the streamed weekly amounts"""
+
+        return {
+            'Total_Budget_To_Date': round(self.aggregates.total('cost', 'Weekly_Budget'), 2),
+            'Total_Spent_To_Date': round(self.aggregates.total('cost', 'Weekly_Actual'), 2),
+            'Weeks_Reported': self.aggregates.rows.get('cost', 0)
+        }
+
+def generate_chunked_analytics_report(data_dir='data', chunksize=DEFAULT_CHUNKSIZE):
+    """Generate the analytics report without loading complete tables into memory"""
+
+    analytics = ChunkedConstructionAnalytics(data_dir, chunksize)
+
+    report = {
+        'executive_summary': analytics.generate_executive_summary(),
+        'earned_value_metrics': analytics.calculate_earned_value_metrics(),
+        'productivity_benchmarks': analytics.calculate_productivity_benchmarks(),
+        'risk_analysis': analytics.identify_risk_trends(),
+        'safety_totals': analytics.calculate_safety_totals(),
+        'cost_totals': analytics.calculate_cost_totals()
+    }
+
+    return report
@@ -0,0 +1,211 @@
+"""
+Command-line interface for headless construction analytics
+Each subcommand imports its dependencies only when it runs, so the CLI starts fast
+and never needs Streamlit
+"""
+
+import argparse
+import sys
+
+def _run_report(args):
+    # Checked before any project is read, as Parquet cannot be written to stdout
+    if args.format == 'parquet' and args.output == '-':
+        print("❌ Parquet output needs a file path: add --output reports.parquet", file=sys.stderr)
+        return 2
+    from batch_report import run_batch_report
+    count = run_batch_report(
+        args.inputs,
+        project_filter=args.project,
+        output=args.output,
+        output_format=args.format,
+        workers=args.workers
+    )
+    return 0 if count else 1
+
+def _run_export(args):
+    import os
+    from excel_generator import create_excel_template, create_sample_data_excel
+    from excel_charts import create_excel_with_charts, create_pivot_analysis
+
+    os.makedirs(args.output_dir, exist_ok=True)
+    create_excel_template(os.path.join(args.output_dir, "Construction_Project_Dashboard_Template.xlsx"), weeks=args.weeks)
+    create_sample_data_excel(args.data_dir, os.path.join(args.output_dir, "Construction_Project_Sample_Data.xlsx"))
+    create_excel_with_charts(args.data_dir, os.path.join(args.output_dir, "Construction_Dashboard_Charts.xlsx"))
+    create_pivot_analysis(args.data_dir, os.path.join(args.output_dir, "Construction_Pivot_Analysis.xlsx"))
+    return 0
+
+def _run_portfolio(args):
+    from portfolio import write_portfolio_summary
+    summary = write_portfolio_summary(args.projects_dir, workers=args.workers)
+    return 0 if len(summary) else 1
+
+def _run_import(args):
+    from excel_importer import import_workbooks
+    results = import_workbooks(args.workbooks, args.store, project=args.project, workers=args.workers, prewarm=not args.no_prewarm)
+    return 0 if results and not any(result['errors'] for result in results) else 1
+
+def _run_templates(args):
+    from excel_templates import create_project_templates, read_project_settings
+    paths = create_project_templates(read_project_settings(args.settings), args.output_dir, weeks=args.weeks)
+    return 0 if paths else 1
+
+def _run_benchmark(args):
+    from benchmarking import benchmark_portfolio
+    _, ranking = benchmark_portfolio(args.inputs, store=args.store, project_filter=args.project)
+    if len(ranking) == 0:
+        print("❌ No project productivity data found for the given inputs", file=sys.stderr)
+        return 1
+    if args.output == '-':
+        print(ranking.to_string(index=False))
+    else:
+        ranking.to_csv(args.output, index=False)
+        print(f"✅ Ranked {len(ranking)} projects against the portfolio benchmarks in {args.output}", file=sys.stderr)
+    return 0
+
+def _run_render(args):
+    from static_reports import render_reports
+    count = render_reports(args.inputs, args.output_dir, args.format or ['pdf'], project_filter=args.project, workers=args.workers)
+    return 0 if count else 1
+
+def _run_prewarm(args):
+    from prewarm import prewarm
+    paths = prewarm(args.inputs, workers=args.workers)
+    return 0 if paths else 1
+
+def _run_snapshot(args):
+    from snapshots import list_snapshots, snapshot_dir, take_snapshot
+    store_dir = args.store or snapshot_dir(args.data_dir)
+    if args.list:
+        history = list_snapshots(store_dir)
+        print(history.to_string(index=False) if len(history) else f"No snapshots in {store_dir}")
+        return 0
+    take_snapshot(args.data_dir, store_dir, as_of=args.as_of)
+    return 0
+
+def _run_ingest(ingest, *args, **kwargs):
+    try:
+        ingest(*args, **kwargs)
+    except FileNotFoundError as e:
+        print(f"❌ {e}", file=sys.stderr)
+        return 1
+    return 0
+
+def _run_transactions(args):
+    from transactions import ingest_transactions
+    return _run_ingest(ingest_transactions, args.files, args.data_dir, chunksize=args.chunksize, workers=args.workers,
+                       prewarm=not args.no_prewarm)
+
+def _run_telematics(args):
+    from telematics import ingest_telematics
+    return _run_ingest(ingest_telematics, args.files, args.data_dir, chunksize=args.chunksize, workers=args.workers,
+                       tz=args.timezone, scheduled_hours_per_day=args.scheduled_hours, prewarm=not args.no_prewarm)
+
+def _run_timesheets(args):
+    from timesheets import ingest_timesheets
+    return _run_ingest(ingest_timesheets, args.files, args.quantities or [], args.data_dir, chunksize=args.chunksize,
+                       workers=args.workers, prewarm=not args.no_prewarm)
+
+def build_parser():
+    """Build the condash argument parser"""
+
+    parser = argparse.ArgumentParser(prog='condash', description='Construction project analytics')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    report = subparsers.add_parser('report', help='Generate analytics reports for one or more projects')
+    report.add_argument('inputs', nargs='+', help='Project directories or glob patterns (e.g. "data/projects/*")')
+    report.add_argument('-p', '--project', action='append', help='Only report projects matching this pattern (repeatable)')
+    report.add_argument('-f', '--format', choices=['jsonl', 'parquet'], default='jsonl', help='Output format')
+    report.add_argument('-o', '--output', default='-', help='Output file (default: stdout, JSON lines only; required for parquet)')
+    report.add_argument('-w', '--workers', type=int, default=None, help='Worker processes (default: CPU count)')
+    report.set_defaults(handler=_run_report)
+
+    render = subparsers.add_parser('render', help='Render executive summary pages to PDF/PNG')
+    render.add_argument('inputs', nargs='+', help='Project directories or glob patterns (e.g. "data/projects/*")')
+    render.add_argument('-o', '--output-dir', default='reports', help='Directory to write the reports to')
+    render.add_argument('-f', '--format', choices=['pdf', 'png'], action='append', help='Output format (repeatable, default: pdf)')
+    render.add_argument('-p', '--project', action='append', help='Only render projects matching this pattern (repeatable)')
+    render.add_argument('-w', '--workers', type=int, default=None, help='Worker processes (default: CPU count)')
+    render.set_defaults(handler=_run_render)
+
+    benchmark = subparsers.add_parser('benchmark', help="Rank projects' latest productivity week against portfolio percentiles")
+    benchmark.add_argument('inputs', nargs='+', help='Project directories or glob patterns (e.g. "data/projects/*")')
+    benchmark.add_argument('-s', '--store', default=None, help='Benchmark file to load and update incrementally (e.g. benchmarks.json)')
+    benchmark.add_argument('-p', '--project', action='append', help='Only rank projects matching this pattern (repeatable)')
+    benchmark.add_argument('-o', '--output', default='-', help='CSV file for the ranking (default: table on stdout)')
+    benchmark.set_defaults(handler=_run_benchmark)
+
+    export = subparsers.add_parser('export', help='Write the Excel template, sample data and chart workbooks')
+    export.add_argument('--data-dir', default='data', help='Directory holding the CSV data files')
+    export.add_argument('--output-dir', default='.', help='Directory to write the workbooks to')
+    export.add_argument('--weeks', type=int, default=52, help='Weekly rows in each tracking sheet of the template')
+    export.set_defaults(handler=_run_export)
+
+    portfolio = subparsers.add_parser('portfolio', help='Precompute the portfolio summary table used by the dashboard')
+    portfolio.add_argument('projects_dir', nargs='?', default='data/projects', help='Directory of project directories')
+    portfolio.add_argument('-w', '--workers', type=int, default=None, help='Worker processes (default: CPU count)')
+    portfolio.set_defaults(handler=_run_portfolio)
+
+    templates = subparsers.add_parser('templates', help='Write one Excel template per project from a settings CSV')
+    templates.add_argument('settings', help='CSV with one row per project and Project Overview labels as columns (e.g. "Project Name", "Contract Value", "Project Start Date")')
+    templates.add_argument('--output-dir', default='templates', help='Directory to write the workbooks to')
+    templates.add_argument('--weeks', type=int, default=52, help='Weekly rows in each tracking sheet')
+    templates.set_defaults(handler=_run_templates)
+
+    importer = subparsers.add_parser('import', help='Import filled-in Excel tracking templates into the project store')
+    importer.add_argument('workbooks', nargs='+', help='Filled-in template workbooks (.xlsx)')
+    importer.add_argument('-s', '--store', default='data/projects', help='Project store directory, or a single project directory')
+    importer.add_argument('-p', '--project', default=None, help='Project id for every workbook (default: Project Name on the Project Overview sheet)')
+    importer.add_argument('-w', '--workers', type=int, default=None, help='Worker processes (default: CPU count)')
+    importer.add_argument('--no-prewarm', action='store_true', help="Do not rebuild the dashboard's first paint of updated projects")
+    importer.set_defaults(handler=_run_import)
+
+    prewarm = subparsers.add_parser('prewarm', help="Precompute the dashboard's first paint (KPIs, figures, analytics report)")
+    prewarm.add_argument('inputs', nargs='*', default=['data'], help='Data or project directories, or glob patterns (default: data)')
+    prewarm.add_argument('-w', '--workers', type=int, default=None, help='Worker processes (default: CPU count)')
+    prewarm.set_defaults(handler=_run_prewarm)
+
+    snapshot = subparsers.add_parser('snapshot', help='Record a versioned snapshot of the KPI tables, or list snapshots')
+    snapshot.add_argument('data_dir', nargs='?', default='data', help='Directory holding the CSV data files')
+    snapshot.add_argument('--as-of', default=None, help='Date the snapshot describes (default: latest schedule date)')
+    snapshot.add_argument('-s', '--store', default=None, help='Snapshot store directory (default: DATA_DIR/snapshots)')
+    snapshot.add_argument('--list', action='store_true', help='List the stored snapshots instead of taking one')
+    snapshot.set_defaults(handler=_run_snapshot)
+
+    transactions = subparsers.add_parser('transactions', help='Aggregate raw cost transactions into the weekly cost tables')
+    transactions.add_argument('files', nargs='+', help='Transaction files (CSV or Parquet with Date, Code, Amount columns)')
+    transactions.add_argument('-d', '--data-dir', default='data', help='Project data directory to update')
+    transactions.add_argument('--chunksize', type=int, default=100000, help='Transactions read per chunk')
+    transactions.add_argument('-w', '--workers', type=int, default=None, help='Worker processes (default: CPU count)')
+    transactions.add_argument('--no-prewarm', action='store_true', help="Do not rebuild the dashboard's first paint")
+    transactions.set_defaults(handler=_run_transactions)
+
+    telematics = subparsers.add_parser('telematics', help='Aggregate equipment telematics pings into hourly utilization')
+    telematics.add_argument('files', nargs='+', help='Ping logs (CSV, JSON lines or Parquet with Machine, Timestamp, Engine_On, Idle columns)')
+    telematics.add_argument('-d', '--data-dir', default='data', help='Project data directory to update')
+    telematics.add_argument('--chunksize', type=int, default=1000000, help='Pings read per chunk')
+    telematics.add_argument('--timezone', default=None, help='Site time zone for hourly and daily buckets, e.g. America/Chicago (default: UTC)')
+    telematics.add_argument('--scheduled-hours', type=float, default=10, help='Hours a machine is expected to work on each day it reports')
+    telematics.add_argument('-w', '--workers', type=int, default=None, help='Worker processes (default: CPU count)')
+    telematics.add_argument('--no-prewarm', action='store_true', help="Do not rebuild the dashboard's first paint")
+    telematics.set_defaults(handler=_run_telematics)
+
+    timesheets = subparsers.add_parser('timesheets', help='Aggregate daily timesheets and installed quantities into crew productivity')
+    timesheets.add_argument('files', nargs='+', help='Timesheet files (CSV, JSON lines or Parquet with Date, Crew, Code, Hours columns)')
+    timesheets.add_argument('-q', '--quantities', nargs='+', help='Installed quantity files (Date, Crew, Code, Quantity columns)')
+    timesheets.add_argument('-d', '--data-dir', default='data', help='Project data directory to update')
+    timesheets.add_argument('--chunksize', type=int, default=1000000, help='Rows read per chunk')
+    timesheets.add_argument('-w', '--workers', type=int, default=None, help='Worker processes (default: CPU count)')
+    timesheets.add_argument('--no-prewarm', action='store_true', help="Do not rebuild the dashboard's first paint")
+    timesheets.set_defaults(handler=_run_timesheets)
+
+    return parser
+
+def main(argv=None):
+    """Parse arguments and run the selected subcommand"""
+    args = build_parser().parse_args(argv)
+    from tracing import serve_from_env
+    serve_from_env()
+    return args.handler(args)
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,208 @@
+"""
+Cost code hierarchy with constant-time subtree rollups
+Cost codes (categories, CSI divisions, line items) are stored as arrays of parent
+pointers and laid out in Euler-tour (preorder) order, so every subtree is one
+contiguous slice. Prefix sums over that order give any subtree's budget, actual,
+committed cost or weekly actuals with two lookups, with no groupby per query
+"""
+
+import os
+import numpy as np
+import pandas as pd
+
+COST_CODES_FILE = 'cost_codes.csv'
+COST_CODE_ACTUALS_FILE = 'cost_code_actuals.csv'
+
+# Amounts rolled up over subtrees; Variance is derived as Budget - Actual
+MEASURES = ['Budget', 'Committed', 'Actual']
+
+ROOT = None
+
+class CostHierarchy:
+    """Rollups over a cost code tree
+
+    `codes` is a DataFrame with Code, Parent (empty for top-level codes),
+    Description and the MEASURES as each code's own amounts (usually only
+    leaves carry amounts). `weekly_actuals` optionally holds Date, Code,
+    Actual rows.
+    """
+
+    def __init__(self, codes, weekly_actuals=None):
+        codes = codes.reset_index(drop=True)
+        self.codes = codes['Code'].astype(str).to_numpy()
+        self.descriptions = codes['Description'].astype(str).to_numpy() if 'Description' in codes else self.codes
+        self.index = {code: i for i, code in enumerate(self.codes)}
+        if len(self.index) != len(self.codes):
+            raise ValueError("Duplicate cost codes")
+
+        parents = codes['Parent'].fillna('').astype(str).to_numpy()
+        unknown = sorted({parent for parent in parents if parent and parent not in self.index})
+        if unknown:
+            raise ValueError(f"Unknown parent cost codes: {', '.join(unknown[:5])}")
+        self.parent = np.array([self.index[parent] if parent else -1 for parent in parents], dtype=np.int64)
+
+        self._build_tour()
+        self.amounts = {
+            measure: codes[measure].fillna(0).to_numpy(dtype=float) if measure in codes else np.zeros(len(self.codes))
+            for measure in MEASURES
+        }
+        # prefix[m][k] = sum of the own amounts of the first k codes in tour order
+        self.prefix = {measure: np.concatenate(([0.0], np.cumsum(values[self.order]))) for measure, values in self.amounts.items()}
+
+        self.weeks = None
+        self.weekly_prefix = None
+        if weekly_actuals is not None and len(weekly_actuals):
+            self._build_weekly(weekly_actuals)
+
+    def _build_tour(self):
+        """Preorder positions: the subtree of node i is order[tin[i]:tout[i]]"""
+
+        count = len(self.parent)
+        # Children in CSR layout, in input order
+        child_order = np.argsort(self.parent, kind='stable')
+        child_parents = self.parent[child_order]
+        first_child = np.searchsorted(child_parents, np.arange(-1, count), side='left')
+        last_child = np.searchsorted(child_parents, np.arange(-1, count), side='right')
+
+        self.tin = np.full(count, -1, dtype=np.int64)
+        self.tout = np.zeros(count, dtype=np.int64)
+        self.depth = np.zeros(count, dtype=np.int64)
+        # Children of node i are child_order[first_child[i + 1]:last_child[i + 1]]; slot 0 holds the top level
+        self.child_order = child_order
+        self.first_child = first_child
+        self.last_child = last_child
+        order = []
+
+        # Iterative DFS; a node is closed when it is popped the second time
+        stack = [(int(child), False) for child in child_order[first_child[0]:last_child[0]][::-1]]
+        while stack:
+            node, closing = stack.pop()
+            if closing:
+                self.tout[node] = len(order)
+                continue
+            self.tin[node] = len(order)
+            order.append(node)
+            stack.append((node, True))
+            children = child_order[first_child[node + 1]:last_child[node + 1]]
+            self.depth[children] = self.depth[node] + 1
+            stack.extend((int(child), False) for child in children[::-1])
+
+        if len(order) != count:
+            raise ValueError("Cost codes contain a parent cycle")
+        self.order = np.array(order, dtype=np.int64)
+
+    def _build_weekly(self, weekly_actuals):
+        dates = pd.to_datetime(weekly_actuals['Date'])
+        self.weeks = pd.DatetimeIndex(np.sort(dates.unique()))
+        rows = self.weeks.get_indexer(dates)
+        nodes = pd.Index(self.codes).get_indexer(weekly_actuals['Code'].astype(str))
+        if (nodes < 0).any():
+            raise ValueError(f"Weekly actuals for unknown cost codes: {', '.join(weekly_actuals['Code'][nodes < 0].astype(str).unique()[:5])}")
+        positions = self.tin[nodes]
+        matrix = np.zeros((len(self.weeks), len(self.codes)))
+        np.add.at(matrix, (rows, positions), weekly_actuals['Actual'].to_numpy(dtype=float))
+        self.weekly_prefix = np.concatenate((np.zeros((len(self.weeks), 1)), np.cumsum(matrix, axis=1)), axis=1)
+
+    @classmethod
+    def from_data_dir(cls, data_dir='data'):
+        """Hierarchy from cost_codes.csv (and cost_code_actuals.csv when present); None without cost codes"""
+
+        path = os.path.join(data_dir, COST_CODES_FILE)
+        if not os.path.exists(path):
+            return None
+        codes = pd.read_csv(path, dtype={'Code': str, 'Parent': str})
+        actuals_path = os.path.join(data_dir, COST_CODE_ACTUALS_FILE)
+        weekly = pd.read_csv(actuals_path, dtype={'Code': str}) if os.path.exists(actuals_path) else None
+        return cls(codes, weekly)
+
+    def __len__(self):
+        return len(self.codes)
+
+    def __contains__(self, code):
+        return code in self.index
+
+    def _nodes(self, codes):
+        return np.array([self.index[code] for code in codes], dtype=np.int64)
+
+    def total(self, code=ROOT, measure='Actual'):
+        """Rolled-up amount of a code's subtree (the whole project for ROOT)"""
+
+        if measure == 'Variance':
+            return self.total(code, 'Budget') - self.total(code, 'Actual')
+        prefix = self.prefix[measure]
+        if code is ROOT:
+            return float(prefix[-1])
+        node = self.index[code]
+        return float(prefix[self.tout[node]] - prefix[self.tin[node]])
+
+    def children(self, code=ROOT):
+        """Direct child codes, in input order"""
+        slot = 0 if code is ROOT else self.index[code] + 1
+        return list(self.codes[self.child_order[self.first_child[slot]:self.last_child[slot]]])
+
+    def path(self, code):
+        """Codes from the top level down to `code`"""
+
+        path = []
+        node = self.index[code]
+        while node != -1:
+            path.append(self.codes[node])
+            node = self.parent[node]
+        return path[::-1]
+
+    def label(self, code):
+        return f"{code} {self.descriptions[self.index[code]]}"
+
+    def rollup(self, codes):
+        """Subtree totals of the given codes as a DataFrame (Code, Description, Level, measures, Variance, Has_Children)"""
+
+        nodes = self._nodes(codes)
+        frame = pd.DataFrame({
+            'Code': self.codes[nodes],
+            'Description': self.descriptions[nodes],
+            'Level': self.depth[nodes] + 1
+        })
+        for measure, prefix in self.prefix.items():
+            frame[measure] = prefix[self.tout[nodes]] - prefix[self.tin[nodes]]
+        frame['Variance'] = frame['Budget'] - frame['Actual']
+        frame['Has_Children'] = self.tout[nodes] - self.tin[nodes] > 1
+        return frame
+
+    def drilldown(self, code=ROOT):
+        """Rollups of a code's children (the top-level codes for ROOT)"""
+        return self.rollup(self.children(code))
+
+    def weekly_actuals(self, code=ROOT):
+        """Weekly actual cost of a code's subtree as a Series indexed by Date"""
+
+        if self.weekly_prefix is None:
+            return pd.Series(dtype=float, name='Actual')
+        if code is ROOT:
+            values = self.weekly_prefix[:, -1]
+        else:
+            node = self.index[code]
+            values = self.weekly_prefix[:, self.tout[node]] - self.weekly_prefix[:, self.tin[node]]
+        return pd.Series(values, index=self.weeks, name='Actual')
+
+    def pivot_table(self, max_level=None):
+        """Every code (down to `max_level`) with its subtree totals and its ancestors' descriptions
+
+        Rows are in tree order with Level_1, Level_2, ... columns, ready for
+        pivot tables in Excel.
+        """
+
+        nodes = self.order if max_level is None else self.order[self.depth[self.order] < max_level]
+        frame = self.rollup(self.codes[nodes])
+        levels = int(self.depth[nodes].max()) + 1 if len(nodes) else 0
+
+        # Ancestor at each level, walked up with the parent array for all rows at once
+        ancestors = np.full((levels, len(nodes)), -1, dtype=np.int64)
+        current = nodes.copy()
+        for _ in range(levels):
+            valid = current != -1
+            ancestors[self.depth[current[valid]], np.flatnonzero(valid)] = current[valid]
+            current = np.where(valid, self.parent[np.where(valid, current, 0)], -1)
+        for level in range(levels):
+            column = ancestors[level]
+            frame.insert(level, f'Level_{level + 1}', np.where(column >= 0, self.descriptions[np.maximum(column, 0)], ''))
+        return frame
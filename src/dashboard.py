@@ -2,10 +2,32 @@ import streamlit as st
 import pandas as pd
 import plotly.express as px
 import plotly.graph_objects as go
-from plotly.subplots import make_subplots
 import numpy as np
-from datetime import datetime, timedelta
+from datetime import date, datetime, timedelta
 import os
+from analytics import ConstructionAnalytics
+from anomaly import latest_anomaly_alerts
+from evm import TREND_WINDOW, calculate_evm_series
+import figures
+from risk_scanner import attribute_labor_efficiency, risk_events, scan_risk_history
+import tracing
+from tracing import traced
+from profiling import PROFILE_PARAM, RerunProfiler, hot_functions, requested_engine
+from rollups import RESOLUTION_LABELS, build_all_rollups, tables_for_range
+from cost_hierarchy import COST_CODE_ACTUALS_FILE, COST_CODES_FILE, CostHierarchy
+import portfolio
+import prewarm
+from project_cache import ProjectCache
+import snapshots
+import telematics
+import timesheets
+
+AS_OF_PARAM = 'as_of'
+PROJECT_PARAM = 'project'
+
+# Session state of the cost code drill-down: path of codes drilled into, and the picker
+COST_PATH_KEY = 'cost_drill_path'
+COST_CHOICE_KEY = 'cost_drill_choice'
 
 # Set page configuration
 st.set_page_config(
@@ -55,15 +77,18 @@ st.markdown("""
 """, unsafe_allow_html=True)
 
 @st.cache_data
-def load_data():
-    """Load all construction project data"""
+@traced('dashboard.load_data')
+def load_data(as_of=None, data_dir="data"):
+    """Load all construction project data (from the snapshot in effect at `as_of` when given)"""
     try:
         # Check if data files exist, if not generate them
-        data_dir = "data"
         if not os.path.exists(data_dir):
             st.error("Data directory not found. Please run data_generator.py first.")
             return None, None, None, None, None, None, None
         
+        if as_of is not None:
+            return snapshots.load_snapshot(snapshots.snapshot_dir(data_dir), as_of)
+        
         schedule_df = pd.read_csv(f"{data_dir}/schedule_data.csv")
         cost_df = pd.read_csv(f"{data_dir}/cost_data.csv")
         productivity_df = pd.read_csv(f"{data_dir}/productivity_data.csv")
@@ -82,208 +107,227 @@ def load_data():
         st.error(f"Error loading data: {str(e)}")
         return None, None, None, None, None, None, None
 
+@st.cache_data(ttl=60)
+def load_snapshot_dates(data_dir="data"):
+    """As-of dates (with their time of day for per-shift data) that have a stored snapshot, newest first"""
+    history = snapshots.list_snapshots(snapshots.snapshot_dir(data_dir))
+    return sorted(set(history['As_Of']), reverse=True)
+
+@st.cache_resource
+def project_cache(projects_dir):
+    """Project data cache shared by every session of this server process"""
+    return ProjectCache(projects_dir)
+
+def multi_project_mode():
+    """Serve the projects under CONDASH_PROJECTS_DIR instead of the single data directory"""
+    return portfolio.PROJECTS_DIR_ENV in os.environ
+
+def select_project(cache):
+    """Sidebar project picker; the `project` query parameter selects and records the project"""
+    
+    projects = list(cache.project_dirs())
+    if not projects:
+        return None
+    requested = st.query_params.get(PROJECT_PARAM)
+    index = projects.index(requested) if requested in projects else 0
+    project = st.sidebar.selectbox("Project", projects, index=index)
+    if requested != project:
+        st.query_params[PROJECT_PARAM] = project
+    return project
+
+def select_as_of(data_dir="data"):
+    """Sidebar "Data As Of" picker, shown when snapshots exist; None means the latest data
+    
+    The `as_of` query parameter (YYYY-MM-DD, or YYYY-MM-DD HH:MM:SS for a
+    shift) preselects a snapshot, so past views can be linked.
+    """
+    
+    dates = load_snapshot_dates(data_dir)
+    if not dates:
+        return None
+    options = ["Latest"] + [snapshots.format_as_of(as_of) for as_of in dates]
+    requested = st.query_params.get(AS_OF_PARAM) if hasattr(st, 'query_params') else None
+    index = options.index(requested) if requested in options else 0
+    choice = st.sidebar.selectbox("Data As Of", options, index=index)
+    return None if choice == "Latest" else choice
+
+def kpi_rollups(schedule_df, cost_df, productivity_df, safety_df, quality_df, *other_tables):
+    """Rollups of the KPI tables at every resolution coarser than their own"""
+    return build_all_rollups({
+        'schedule': schedule_df,
+        'cost': cost_df,
+        'productivity': productivity_df,
+        'safety': safety_df,
+        'quality': quality_df
+    })
+
+@st.cache_data
+@traced('dashboard.load_rollups')
+def load_rollups(schedule_df, cost_df, productivity_df, safety_df, quality_df):
+    """Build monthly and quarterly rollups of the KPI tables"""
+    return kpi_rollups(schedule_df, cost_df, productivity_df, safety_df, quality_df)
+
+@traced('chart.kpi_cards')
 def create_kpi_cards(schedule_df, cost_df, safety_df, quality_df):
     """Create KPI summary cards"""
+    render_kpi_cards(figures.kpi_cards(schedule_df, cost_df, safety_df, quality_df))
+
+def render_kpi_cards(cards):
+    """Render KPI card columns built by figures.kpi_cards"""
     
-    if len(schedule_df) == 0:
+    if cards is None:
         return
-        
-    # Get latest data
-    latest_schedule = schedule_df.iloc[-1]
-    latest_cost = cost_df.iloc[-1]
-    latest_safety = safety_df.iloc[-1]
-    latest_quality = quality_df.iloc[-1]
     
-    col1, col2, col3, col4 = st.columns(4)
-    
-    with col1:
-        spi_status = "status-good" if latest_schedule['SPI'] >= 1.0 else "status-danger"
-        st.markdown(f"""
+    for column, column_cards in zip(st.columns(4), cards):
+        with column:
+            for label, value, status in column_cards:
+                st.markdown(f"""
         <div class="metric-card">
-            <div class="metric-label">Schedule Performance Index (SPI)</div>
-            <div class="metric-value {spi_status}">{latest_schedule['SPI']:.3f}</div>
-        </div>
-        """, unsafe_allow_html=True)
-        
-        days_status = "status-good" if latest_schedule['Days_Variance'] >= 0 else "status-danger"
-        st.markdown(f"""
-        <div class="metric-card">
-            <div class="metric-label">Days Ahead/Behind Schedule</div>
-            <div class="metric-value {days_status}">{latest_schedule['Days_Variance']:+.1f}</div>
+            <div class="metric-label">{label}</div>
+            <div class="metric-value {status}">{value}</div>
         </div>
         """, unsafe_allow_html=True)
+
+@st.cache_data
+@traced('dashboard.executive_summary')
+def load_executive_summary(schedule_df, cost_df, productivity_df, safety_df, quality_df, crew_productivity_df=None):
+    """Executive summary of the analytics report for the loaded tables"""
+    analytics = ConstructionAnalytics(schedule_df, cost_df, productivity_df, safety_df, quality_df,
+                                      crew_productivity_df=crew_productivity_df)
+    return analytics.generate_executive_summary()
+
+def render_executive_summary(summary):
+    """Render the status, health, forecasts and top risks of an executive summary"""
     
+    st.subheader("📋 Executive Summary")
+    col1, col2, col3, col4 = st.columns(4)
+    col1.metric("Project Status", summary['Project_Status'])
+    col2.metric("Health Score", summary['Overall_Health_Score'])
+    col3.metric("Predicted Completion", summary['Predicted_Completion'])
+    col4.metric("Estimated Final Cost", summary['Estimated_Final_Cost'])
+    st.markdown("**Primary risks:** " + "; ".join(summary['Primary_Risks']))
+
+@st.cache_data
+@traced('dashboard.anomaly_alerts')
+def load_anomaly_alerts(cost_df, productivity_df, safety_df, quality_df):
+    """KPI anomalies of the latest period of the loaded tables"""
+    return latest_anomaly_alerts({None: (cost_df, productivity_df, safety_df, quality_df)}).get(None, [])
+
+def render_anomaly_alerts(alerts):
+    """Warn about KPI anomalies in the latest period, when there are any"""
+    if alerts:
+        st.warning("**KPI anomalies in the latest period:** " + "; ".join(alerts))
+
+def render_figure_pair(left, right):
+    """Render two figures side by side"""
+    col1, col2 = st.columns(2)
+    with col1:
+        st.plotly_chart(left, use_container_width=True)
     with col2:
-        cpi_status = "status-good" if latest_cost['CPI'] >= 1.0 else "status-danger"
-        st.markdown(f"""
-        <div class="metric-card">
-            <div class="metric-label">Cost Performance Index (CPI)</div>
-            <div class="metric-value {cpi_status}">{latest_cost['CPI']:.3f}</div>
-        </div>
-        """, unsafe_allow_html=True)
-        
-        variance_status = "status-good" if latest_cost['Cost_Variance'] >= 0 else "status-danger"
-        st.markdown(f"""
-        <div class="metric-card">
-            <div class="metric-label">Cost Variance</div>
-            <div class="metric-value {variance_status}">${latest_cost['Cost_Variance']:,.0f}</div>
-        </div>
-        """, unsafe_allow_html=True)
+        st.plotly_chart(right, use_container_width=True)
+
+@traced('chart.risk_history')
+def create_risk_history_strip(schedule_df, cost_df, productivity_df, safety_df, quality_df, start_date, end_date):
+    """Create risk history strip showing when each risk rule was active"""
+    
+    # Scan the full history so rolling windows see the weeks before the selected range
+    history = scan_risk_history(schedule_df, cost_df, productivity_df, safety_df, quality_df)
+    history = history[(history.index.date >= start_date) & (history.index.date <= end_date)]
+    if len(history) == 0:
+        return
     
-    with col3:
-        safety_status = "status-good" if latest_safety['Days_Since_Last_Incident'] > 30 else "status-warning"
-        st.markdown(f"""
-        <div class="metric-card">
-            <div class="metric-label">Days Since Last Incident</div>
-            <div class="metric-value {safety_status}">{latest_safety['Days_Since_Last_Incident']}</div>
-        </div>
-        """, unsafe_allow_html=True)
-        
-        trir_status = "status-good" if latest_safety['TRIR'] <= 2.0 else "status-danger"
-        st.markdown(f"""
-        <div class="metric-card">
-            <div class="metric-label">Total Recordable Incident Rate</div>
-            <div class="metric-value {trir_status}">{latest_safety['TRIR']:.2f}</div>
-        </div>
-        """, unsafe_allow_html=True)
+    events = risk_events(history)
+    render_risk_history(figures.risk_history_figure(history), figures.risk_event_rows(events) if len(events) else None)
+
+def render_risk_history(fig, event_rows):
+    """Render the risk heatmap and, when there are any, its onset/resolution table"""
     
-    with col4:
-        pass_rate_status = "status-good" if latest_quality['Inspection_Pass_Rate_Pct'] >= 85 else "status-warning"
-        st.markdown(f"""
-        <div class="metric-card">
-            <div class="metric-label">Inspection Pass Rate</div>
-            <div class="metric-value {pass_rate_status}">{latest_quality['Inspection_Pass_Rate_Pct']:.1f}%</div>
-        </div>
-        """, unsafe_allow_html=True)
-        
-        st.markdown(f"""
-        <div class="metric-card">
-            <div class="metric-label">Open Punch List Items</div>
-            <div class="metric-value">{latest_quality['Punch_List_Items']}</div>
-        </div>
-        """, unsafe_allow_html=True)
+    st.subheader("⚠️ Risk History")
+    st.plotly_chart(fig, use_container_width=True)
+    
+    if event_rows is not None and len(event_rows):
+        with st.expander("Risk onset and resolution timeline"):
+            st.dataframe(event_rows, use_container_width=True, hide_index=True)
 
+@traced('chart.schedule')
 def create_schedule_charts(schedule_df):
     """Create schedule performance charts"""
     
     st.subheader("📅 Schedule Performance")
-    
-    col1, col2 = st.columns(2)
-    
-    with col1:
-        # Progress tracking chart
-        fig = go.Figure()
-        fig.add_trace(go.Scatter(
-            x=schedule_df['Date'],
-            y=schedule_df['Planned_Progress_Pct'],
-            mode='lines',
-            name='Planned Progress',
-            line=dict(color='blue', width=3)
-        ))
-        fig.add_trace(go.Scatter(
-            x=schedule_df['Date'],
-            y=schedule_df['Actual_Progress_Pct'],
-            mode='lines',
-            name='Actual Progress',
-            line=dict(color='red', width=3)
-        ))
-        
-        fig.update_layout(
-            title="Planned vs Actual Progress",
-            xaxis_title="Date",
-            yaxis_title="Progress (%)",
-            hovermode='x unified'
-        )
-        st.plotly_chart(fig, use_container_width=True)
-    
-    with col2:
-        # SPI trend chart
-        fig = go.Figure()
-        fig.add_trace(go.Scatter(
-            x=schedule_df['Date'],
-            y=schedule_df['SPI'],
-            mode='lines+markers',
-            name='SPI',
-            line=dict(color='green', width=3)
-        ))
-        fig.add_hline(y=1.0, line_dash="dash", line_color="black", 
-                      annotation_text="Target SPI = 1.0")
-        
-        fig.update_layout(
-            title="Schedule Performance Index (SPI) Trend",
-            xaxis_title="Date",
-            yaxis_title="SPI",
-            hovermode='x unified'
-        )
-        st.plotly_chart(fig, use_container_width=True)
+    render_figure_pair(*figures.schedule_figures(schedule_df))
 
-def create_cost_charts(cost_df, cost_breakdown_df):
+@traced('chart.cost')
+def create_cost_charts(schedule_df, cost_df, cost_breakdown_df, hierarchy=None):
     """Create cost performance charts"""
     
     st.subheader("💰 Cost Performance")
+    render_figure_pair(*figures.cost_figures(cost_df))
     
-    col1, col2 = st.columns(2)
+    # Earned value trend computed for every week
+    create_evm_trend_charts(schedule_df, cost_df)
     
+    # Cost breakdown by category, drillable into cost codes when the project has them
+    if hierarchy is not None:
+        path = [code for code in st.session_state.get(COST_PATH_KEY, []) if code in hierarchy]
+        render_cost_drilldown(*figures.cost_drilldown(hierarchy, path), depth=len(path))
+        return
+    if cost_breakdown_df is None:
+        return
+    st.subheader("Cost Variance by Category")
+    st.plotly_chart(figures.cost_breakdown_figure(cost_breakdown_df), use_container_width=True)
+
+@st.cache_resource(max_entries=32)
+def load_cost_hierarchy(data_dir, modified):
+    """Cost code hierarchy of a data directory, built once per file version and shared by all sessions"""
+    return CostHierarchy.from_data_dir(data_dir)
+
+def cost_hierarchy_for(data_dir):
+    """Cost code hierarchy of a data directory, or None when it has no cost_codes.csv"""
+    paths = [os.path.join(data_dir, name) for name in (COST_CODES_FILE, COST_CODE_ACTUALS_FILE)]
+    if not os.path.exists(paths[0]):
+        return None
+    return load_cost_hierarchy(data_dir, max(os.path.getmtime(path) for path in paths if os.path.exists(path)))
+
+def _drill_into():
+    choice = st.session_state.get(COST_CHOICE_KEY)
+    if choice:
+        st.session_state[COST_PATH_KEY] = st.session_state.get(COST_PATH_KEY, []) + [choice]
+    st.session_state[COST_CHOICE_KEY] = ""
+
+def _drill_up():
+    st.session_state[COST_PATH_KEY] = st.session_state.get(COST_PATH_KEY, [])[:-1]
+
+def render_cost_drilldown(fig, breadcrumb, drill_options, depth):
+    """Cost variance chart with controls to drill into a cost code or back up a level"""
+    
+    st.subheader("Cost Variance by Category")
+    st.caption(breadcrumb)
+    st.plotly_chart(fig, use_container_width=True)
+    col1, col2 = st.columns([4, 1])
     with col1:
-        # Budget vs Actual spending
-        fig = go.Figure()
-        fig.add_trace(go.Scatter(
-            x=cost_df['Date'],
-            y=cost_df['Cumulative_Budget'],
-            mode='lines',
-            name='Budget',
-            line=dict(color='blue', width=3)
-        ))
-        fig.add_trace(go.Scatter(
-            x=cost_df['Date'],
-            y=cost_df['Cumulative_Spent'],
-            mode='lines',
-            name='Actual Spent',
-            line=dict(color='red', width=3)
-        ))
-        
-        fig.update_layout(
-            title="Budget vs Actual Spending",
-            xaxis_title="Date",
-            yaxis_title="Cost ($)",
-            hovermode='x unified'
+        st.selectbox(
+            "Drill into",
+            [""] + list(drill_options),
+            format_func=lambda code: drill_options.get(code, "Select a cost code..."),
+            key=COST_CHOICE_KEY,
+            on_change=_drill_into,
+            disabled=not drill_options
         )
-        st.plotly_chart(fig, use_container_width=True)
-    
     with col2:
-        # CPI trend
-        fig = go.Figure()
-        fig.add_trace(go.Scatter(
-            x=cost_df['Date'],
-            y=cost_df['CPI'],
-            mode='lines+markers',
-            name='CPI',
-            line=dict(color='purple', width=3)
-        ))
-        fig.add_hline(y=1.0, line_dash="dash", line_color="black", 
-                      annotation_text="Target CPI = 1.0")
-        
-        fig.update_layout(
-            title="Cost Performance Index (CPI) Trend",
-            xaxis_title="Date",
-            yaxis_title="CPI",
-            hovermode='x unified'
-        )
-        st.plotly_chart(fig, use_container_width=True)
+        st.button("⬆ Up", key="cost_drill_up", on_click=_drill_up, disabled=depth == 0)
+
+@traced('chart.evm_trend')
+def create_evm_trend_charts(schedule_df, cost_df):
+    """Create earned value trend charts from the per-week EVM series"""
     
-    # Cost breakdown by category
-    st.subheader("Cost Variance by Category")
-    fig = px.bar(
-        cost_breakdown_df,
-        x='Category',
-        y=['Budget', 'Actual'],
-        title="Budget vs Actual by Category",
-        barmode='group',
-        color_discrete_map={'Budget': 'lightblue', 'Actual': 'darkblue'}
-    )
-    fig.update_layout(xaxis_tickangle=-45)
-    st.plotly_chart(fig, use_container_width=True)
+    evm_df = calculate_evm_series(schedule_df, cost_df, rolling_window=TREND_WINDOW)
+    if len(evm_df) == 0:
+        return
+    
+    st.subheader("Earned Value Trend")
+    render_figure_pair(*figures.evm_figures(evm_df))
 
+@traced('chart.productivity')
 def create_productivity_charts(productivity_df):
     """Create productivity metrics charts"""
     
@@ -333,7 +377,56 @@ def create_productivity_charts(productivity_df):
                       annotation_text="Target: <5%")
         st.plotly_chart(fig, use_container_width=True)
 
-def create_safety_charts(safety_df):
+@st.cache_data(max_entries=8)
+def load_telematics_series(path, modified):
+    """Hourly telematics series, read once per file version"""
+    return telematics.read_series(path)
+
+@traced('chart.telematics')
+def create_telematics_charts(series, start_date, end_date):
+    """Fleet and per-machine utilization from the hourly telematics series"""
+    
+    st.subheader("🚜 Equipment Telematics")
+    
+    in_range = series[(series['Hour'] >= pd.Timestamp(start_date)) & (series['Hour'] < pd.Timestamp(end_date) + pd.Timedelta(days=1))]
+    if len(in_range) == 0:
+        st.info("No telematics pings in the selected date range.")
+        return
+    
+    col1, col2 = st.columns(2)
+    with col1:
+        st.plotly_chart(figures.fleet_utilization_figure(telematics.fleet_utilization(in_range)), use_container_width=True)
+    with col2:
+        st.plotly_chart(figures.machine_utilization_figure(telematics.machine_utilization(in_range)), use_container_width=True)
+
+@st.cache_data(max_entries=8)
+def load_crew_productivity(path, modified):
+    """Weekly crew productivity table, read once per file version"""
+    return timesheets.read_crew_productivity(path)
+
+@traced('chart.crew_productivity')
+def create_crew_productivity_charts(crew_df, start_date, end_date):
+    """Hours per unit by crew for one activity, and the crews over their recent rate"""
+    
+    st.subheader("👷 Crew Productivity")
+    
+    in_range = crew_df[(crew_df['Date'] >= pd.Timestamp(start_date)) & (crew_df['Date'] <= pd.Timestamp(end_date))]
+    if len(in_range) == 0:
+        st.info("No timesheets in the selected date range.")
+        return
+    
+    # Activities with the most hours first
+    activities = in_range.groupby('Code', observed=True)['Labor_Hours'].sum().sort_values(ascending=False).index
+    code = st.selectbox("Activity", list(activities), key='crew_activity')
+    st.plotly_chart(figures.crew_productivity_figure(in_range[in_range['Code'] == code], code), use_container_width=True)
+    
+    overruns = attribute_labor_efficiency(in_range)
+    if len(overruns):
+        st.caption(f"Crews over their recent hours-per-unit rate in the week ending {in_range['Date'].max():%Y-%m-%d}")
+        st.dataframe(overruns, use_container_width=True, hide_index=True)
+
+@traced('chart.safety')
+def create_safety_charts(safety_df, resolution='weekly'):
     """Create safety metrics charts"""
     
     st.subheader("🛡️ Safety Metrics")
@@ -374,13 +467,14 @@ def create_safety_charts(safety_df):
         safety_df,
         x='Date',
         y='Near_Miss_Count',
-        title='Weekly Near Miss Reports',
+        title=f'{RESOLUTION_LABELS[resolution]} Near Miss Reports',
         color='Near_Miss_Count',
         color_continuous_scale='Reds'
     )
     st.plotly_chart(fig, use_container_width=True)
 
-def create_quality_charts(quality_df):
+@traced('chart.quality')
+def create_quality_charts(quality_df, resolution='weekly'):
     """Create quality metrics charts"""
     
     st.subheader("✅ Quality Metrics")
@@ -407,7 +501,7 @@ def create_quality_charts(quality_df):
             quality_df,
             x='Date',
             y='Punch_List_Items',
-            title='Weekly Punch List Items',
+            title=f'{RESOLUTION_LABELS[resolution]} Punch List Items',
             markers=True,
             color_discrete_sequence=['orange']
         )
@@ -419,16 +513,20 @@ def create_quality_charts(quality_df):
         quality_df,
         x='Date',
         y='Rework_Cost',
-        title='Weekly Rework Costs ($)',
+        title=f'{RESOLUTION_LABELS[resolution]} Rework Costs ($)',
         color='Rework_Cost',
         color_continuous_scale='Reds'
     )
     st.plotly_chart(fig, use_container_width=True)
 
+@traced('chart.critical_path')
 def create_critical_path_view(critical_path_df):
     """Create critical path tasks view"""
     
     st.subheader("🎯 Critical Path Tasks")
+    if critical_path_df is None:
+        st.info("This project has no critical_path_tasks.csv.")
+        return
     
     # Status color mapping
     status_colors = {
@@ -479,88 +577,395 @@ def create_critical_path_view(critical_path_df):
     styled_df = styled_df.style.applymap(color_status, subset=['Status'])
     st.dataframe(styled_df, use_container_width=True)
 
-def main():
-    """Main dashboard function"""
+@st.cache_data(ttl=300, show_spinner="Building portfolio summary...")
+@traced('dashboard.load_portfolio')
+def load_portfolio(projects_dir):
+    """Load the precomputed portfolio summary (rebuilt when project data changed)"""
+    return portfolio.load_portfolio_summary(projects_dir)
+
+@st.cache_data(max_entries=32)
+@traced('dashboard.load_portfolio_project')
+def load_portfolio_project(source, project_id):
+    """Load the full tables of one portfolio project on demand"""
+    return portfolio.load_project_detail(source, project_id)
+
+@traced('chart.portfolio')
+def create_portfolio_view(projects_dir):
+    """Portfolio grid with server-side filtering, sorting and paging, plus a lazy project detail view"""
     
-    # Header
-    st.markdown('<h1 class="main-header">🏗️ Construction Project Dashboard</h1>', unsafe_allow_html=True)
+    st.subheader("🗂️ Project Portfolio")
     
-    # Sidebar
-    st.sidebar.title("Navigation")
+    summary = load_portfolio(projects_dir)
+    if len(summary) == 0:
+        st.info(f"No projects found in `{projects_dir}`. Put one directory of KPI tables per project there "
+                "(or set CONDASH_PROJECTS_DIR) and run `python condash.py portfolio` to precompute the summary.")
+        return
     
-    # Load data
-    data = load_data()
-    if data[0] is None:
-        st.error("Unable to load data. Please check that all data files exist in the 'data' directory.")
-        st.info("To generate sample data, run: `python src/data_generator.py`")
+    # Portfolio headline numbers
+    col1, col2, col3, col4 = st.columns(4)
+    status_counts = summary['Status'].value_counts()
+    col1.metric("Projects", f"{len(summary):,}")
+    col2.metric("On Track", f"{status_counts.get('On Track', 0):,}")
+    col3.metric("At Risk", f"{status_counts.get('At Risk', 0):,}")
+    col4.metric("Critical", f"{status_counts.get('Critical', 0):,}")
+    
+    # Filters and sorting are applied here; only the visible page goes to the browser
+    col1, col2, col3, col4 = st.columns([3, 3, 2, 1])
+    with col1:
+        search = st.text_input("Filter projects", placeholder="Name or pattern, e.g. TOWER-*")
+    with col2:
+        statuses = st.multiselect("Status", [status for _, status in portfolio.STATUS_BANDS] + ['No Data'])
+    with col3:
+        sortable = [column for column in portfolio.SUMMARY_COLUMNS if column not in portfolio.TEXT_COLUMNS]
+        sort_by = st.selectbox("Sort by", sortable, index=sortable.index('Health_Score'))
+    with col4:
+        ascending = st.checkbox("Ascending", value=True)
+        new_risks_only = st.checkbox("With new risks", value=False)
+        anomalies_only = st.checkbox("With anomalies", value=False)
+    
+    matching = portfolio.filter_portfolio(summary, search, statuses, anomalies_only, new_risks_only)
+    pages = portfolio.page_count(matching)
+    page = st.number_input(f"Page (of {pages})", min_value=1, max_value=pages, value=1, step=1)
+    page_df = portfolio.sort_page(matching, sort_by, ascending, page)
+    
+    st.caption(f"Showing {len(page_df)} of {len(matching):,} matching projects")
+    event = st.dataframe(
+        page_df.drop(columns=['Source']),
+        use_container_width=True,
+        hide_index=True,
+        on_select="rerun",
+        selection_mode="single-row",
+        key="portfolio_grid"
+    )
+    
+    selected_rows = event.selection.rows if event is not None else []
+    if not selected_rows:
+        st.caption("Select a row to open the project.")
         return
     
-    schedule_df, cost_df, productivity_df, safety_df, quality_df, critical_path_df, cost_breakdown_df = data
+    project = page_df.iloc[selected_rows[0]]
+    tables = load_portfolio_project(project['Source'], project['Project'])
+    if tables is None:
+        st.error(f"Could not load project {project['Project']}")
+        return
     
-    # Sidebar filters
-    st.sidebar.subheader("Date Range Filter")
-    min_date = schedule_df['Date'].min().date()
-    max_date = schedule_df['Date'].max().date()
+    schedule_df, cost_df, productivity_df, safety_df, quality_df = tables
+    st.markdown("---")
+    st.subheader(f"📁 {project['Project']}")
+    create_kpi_cards(schedule_df, cost_df, safety_df, quality_df)
+    col1, col2 = st.columns(2)
+    with col1:
+        create_schedule_charts(schedule_df)
+    with col2:
+        create_evm_trend_charts(schedule_df, cost_df)
+
+def create_performance_view():
+    """Show the latest tracing spans (only offered while tracing is enabled)"""
     
-    start_date = st.sidebar.date_input("Start Date", min_date, min_value=min_date, max_value=max_date)
-    end_date = st.sidebar.date_input("End Date", max_date, min_value=min_date, max_value=max_date)
+    st.subheader("⏱️ Performance")
+    
+    spans = tracing.latest_spans(200)
+    if not spans:
+        st.info("No spans recorded yet. Interact with other sections to collect timings.")
+        return
+    
+    spans_df = pd.DataFrame(spans)
+    spans_df['Start'] = pd.to_datetime(spans_df['start'], unit='s')
+    
+    summary = spans_df.groupby('name').agg(
+        Calls=('wall_ms', 'size'),
+        Mean_Wall_ms=('wall_ms', 'mean'),
+        Max_Wall_ms=('wall_ms', 'max'),
+        Mean_CPU_ms=('cpu_ms', 'mean'),
+        Rows=('rows', 'max')
+    ).sort_values('Mean_Wall_ms', ascending=False).reset_index()
+    
+    fig = px.bar(
+        summary,
+        x='Mean_Wall_ms',
+        y='name',
+        orientation='h',
+        title='Mean Wall Time by Span (ms)',
+        color='Mean_CPU_ms',
+        color_continuous_scale='Blues'
+    )
+    fig.update_layout(yaxis={'categoryorder': 'total ascending'}, yaxis_title=None)
+    st.plotly_chart(fig, use_container_width=True)
+    
+    st.subheader("Latest Spans")
+    columns = ['Start', 'name', 'parent', 'wall_ms', 'cpu_ms', 'rows', 'peak_memory_bytes', 'error']
+    st.dataframe(spans_df[columns].iloc[::-1], use_container_width=True)
+
+def create_profiling_panel(profiler, paths, section):
+    """Offer the profile of this rerun for download and list hot functions"""
+    
+    st.sidebar.markdown("---")
+    st.sidebar.subheader("🔬 Profiling")
+    st.sidebar.caption(f"This rerun was profiled with {profiler.engine}.")
+    
+    with open(paths['speedscope'], 'rb') as stream:
+        st.sidebar.download_button(
+            "Download speedscope profile",
+            stream.read(),
+            file_name=os.path.basename(paths['speedscope']),
+            mime="application/json"
+        )
+    with open(paths['folded'], 'rb') as stream:
+        st.sidebar.download_button(
+            "Download flamegraph stacks",
+            stream.read(),
+            file_name=os.path.basename(paths['folded']),
+            mime="text/plain"
+        )
+    
+    with st.sidebar.expander(f"Hot functions ({section})"):
+        hot = hot_functions(profiler.profile_dir, section=section, limit=15)
+        st.dataframe(hot, use_container_width=True, hide_index=True)
+
+@st.cache_resource(max_entries=64)
+def read_first_paint(path, modified):
+    """Parsed first-paint artifact, read once per file version and shared by all sessions"""
+    artifact = prewarm.read_first_paint(path)
+    # The specs were validated when built at ingest; validating them again is most of the render time
+    artifact['figures'] = {name: go.Figure(spec, _validate=False) for name, spec in artifact['figures'].items()}
+    return artifact
+
+def load_first_paint(data_dir):
+    """Precomputed first paint of a data directory, or None when missing or stale"""
+    path = prewarm.artifact_path(data_dir)
+    if not os.path.exists(path):
+        return None
+    artifact = read_first_paint(path, os.path.getmtime(path))
+    return artifact if prewarm.is_current(artifact, data_dir) else None
+
+@traced('chart.first_paint')
+def render_first_paint(artifact):
+    """Render the default Overview from its precomputed artifact"""
+    
+    charts = artifact['figures']
+    render_kpi_cards(artifact['kpi_cards'])
+    render_executive_summary(artifact['analytics_report']['executive_summary'])
+    render_anomaly_alerts(artifact['anomalies'])
+    if 'risk_history' in charts:
+        render_risk_history(charts['risk_history'], pd.DataFrame(artifact['risk_events']))
+    
+    col1, col2 = st.columns(2)
+    with col1:
+        st.subheader("📅 Schedule Performance")
+        render_figure_pair(charts['progress'], charts['spi'])
+    with col2:
+        st.subheader("💰 Cost Performance")
+        render_figure_pair(charts['spending'], charts['cpi'])
+        if 'evm_indices' in charts:
+            st.subheader("Earned Value Trend")
+            render_figure_pair(charts['evm_indices'], charts['eac'])
+        if 'cost_drill' in artifact:
+            render_cost_drilldown(charts['cost_breakdown'], artifact['cost_drill']['breadcrumb'], artifact['cost_drill']['options'], depth=0)
+        elif 'cost_breakdown' in charts:
+            st.subheader("Cost Variance by Category")
+            st.plotly_chart(charts['cost_breakdown'], use_container_width=True)
+
+def load_view_data(project, as_of, data_dir):
+    """(cache entry or None, tables) for the selected project and date; (None, None) after showing an error"""
+    
+    entry = None
+    if project and as_of is None:
+        entry = project_cache(portfolio.projects_dir()).get(project)
+        data = entry.tables
+    else:
+        data = load_data(as_of, data_dir)
+    if data[0] is None:
+        st.error(f"Unable to load data. Please check that all data files exist in the '{data_dir}' directory.")
+        st.info("To generate sample data, run: `python src/data_generator.py`")
+        return None, None
+    return entry, data
+
+def render_section(section, data, entry, start_date, end_date, resolution_choice, resolution_caption, hierarchy=None, telematics_path=None,
+                   crew_productivity_path=None):
+    """Render one dashboard section from the loaded tables; returns the latest progress shown"""
+    
+    schedule_df, cost_df, productivity_df, safety_df, quality_df, critical_path_df, cost_breakdown_df = data
     
     # Filter data based on date range
     mask = (schedule_df['Date'].dt.date >= start_date) & (schedule_df['Date'].dt.date <= end_date)
     filtered_schedule = schedule_df.loc[mask]
     filtered_cost = cost_df.loc[mask]
-    filtered_productivity = productivity_df.loc[mask]
     filtered_safety = safety_df.loc[mask]
     filtered_quality = quality_df.loc[mask]
     
-    # Dashboard sections
-    section = st.sidebar.selectbox(
-        "Choose Section",
-        ["Overview", "Schedule Performance", "Cost Performance", "Productivity", "Safety", "Quality", "Critical Path"]
+    raw_tables = {
+        'schedule': schedule_df,
+        'cost': cost_df,
+        'productivity': productivity_df,
+        'safety': safety_df,
+        'quality': quality_df
+    }
+    if entry is not None:
+        # Rollups are built once per project version for all sessions
+        rollups = entry.derive('rollups', kpi_rollups)
+    else:
+        rollups = load_rollups(schedule_df, cost_df, productivity_df, safety_df, quality_df)
+    resolution, chart_tables = tables_for_range(
+        raw_tables,
+        rollups,
+        start_date,
+        end_date,
+        resolution=None if resolution_choice == "Auto" else resolution_choice.lower()
     )
+    resolution_caption.caption(f"Charts show {RESOLUTION_LABELS[resolution].lower()} data ({len(chart_tables['schedule'])} points)")
+    chart_schedule = chart_tables['schedule']
+    chart_cost = chart_tables['cost']
     
     if section == "Overview":
         create_kpi_cards(filtered_schedule, filtered_cost, filtered_safety, filtered_quality)
+        crew_df = load_crew_productivity(crew_productivity_path, os.path.getmtime(crew_productivity_path)) if crew_productivity_path else None
+        render_executive_summary(load_executive_summary(schedule_df, cost_df, productivity_df, safety_df, quality_df, crew_df))
+        render_anomaly_alerts(load_anomaly_alerts(cost_df, productivity_df, safety_df, quality_df))
+        create_risk_history_strip(schedule_df, cost_df, productivity_df, safety_df, quality_df, start_date, end_date)
         
         col1, col2 = st.columns(2)
         with col1:
-            create_schedule_charts(filtered_schedule)
+            create_schedule_charts(chart_schedule)
         with col2:
-            create_cost_charts(filtered_cost, cost_breakdown_df)
+            create_cost_charts(chart_schedule, chart_cost, cost_breakdown_df, hierarchy)
             
     elif section == "Schedule Performance":
         create_kpi_cards(filtered_schedule, filtered_cost, filtered_safety, filtered_quality)
-        create_schedule_charts(filtered_schedule)
+        create_schedule_charts(chart_schedule)
         
     elif section == "Cost Performance":
-        create_cost_charts(filtered_cost, cost_breakdown_df)
+        create_cost_charts(chart_schedule, chart_cost, cost_breakdown_df, hierarchy)
         
     elif section == "Productivity":
-        create_productivity_charts(filtered_productivity)
+        create_productivity_charts(chart_tables['productivity'])
+        if telematics_path is not None:
+            series = load_telematics_series(telematics_path, os.path.getmtime(telematics_path))
+            create_telematics_charts(series, start_date, end_date)
+        if crew_productivity_path is not None:
+            crew_df = load_crew_productivity(crew_productivity_path, os.path.getmtime(crew_productivity_path))
+            create_crew_productivity_charts(crew_df, start_date, end_date)
         
     elif section == "Safety":
-        create_safety_charts(filtered_safety)
+        create_safety_charts(chart_tables['safety'], resolution)
         
     elif section == "Quality":
-        create_quality_charts(filtered_quality)
+        create_quality_charts(chart_tables['quality'], resolution)
         
     elif section == "Critical Path":
         create_critical_path_view(critical_path_df)
+        
+    elif section == "Portfolio":
+        create_portfolio_view(portfolio.projects_dir())
+        
+    elif section == "Performance":
+        create_performance_view()
+    
+    return filtered_schedule.iloc[-1]['Actual_Progress_Pct']
+
+def main():
+    """Main dashboard function; profiles the rerun when requested"""
+    
+    tracing.serve_from_env()
+    query_value = st.query_params.get(PROFILE_PARAM) if hasattr(st, 'query_params') else None
+    engine = requested_engine(query_value)
+    if engine is None:
+        render_dashboard()
+        return
+    
+    profiler = RerunProfiler(engine).start()
+    try:
+        view = render_dashboard()
+    finally:
+        profiler.stop()
+    
+    if view is not None:
+        section, start_date, end_date = view
+        paths = profiler.save(section, start_date, end_date)
+        create_profiling_panel(profiler, paths, section)
+
+def render_dashboard():
+    """Render one dashboard rerun; returns the (section, start, end) view shown"""
+    
+    # Header
+    st.markdown('<h1 class="main-header">🏗️ Construction Project Dashboard</h1>', unsafe_allow_html=True)
+    
+    # Sidebar
+    st.sidebar.title("Navigation")
+    
+    # Load data: one project of CONDASH_PROJECTS_DIR from the shared cache, or the data directory
+    project = None
+    if multi_project_mode():
+        cache = project_cache(portfolio.projects_dir())
+        project = select_project(cache)
+        if project is None:
+            st.error(f"No projects found in '{portfolio.projects_dir()}'.")
+            return
+    data_dir = cache.project_dirs()[project] if project else "data"
+    as_of = select_as_of(data_dir)
+    
+    # First paint of the default view comes from the artifact precomputed at ingest
+    artifact = load_first_paint(data_dir) if as_of is None else None
+    
+    entry = None
+    data = None
+    if artifact is None:
+        entry, data = load_view_data(project, as_of, data_dir)
+        if data is None:
+            return
+        min_date = data[0]['Date'].min().date()
+        max_date = data[0]['Date'].max().date()
+    else:
+        min_date = date.fromisoformat(artifact['start_date'])
+        max_date = date.fromisoformat(artifact['end_date'])
+    
+    # Sidebar filters
+    st.sidebar.subheader("Date Range Filter")
+    start_date = st.sidebar.date_input("Start Date", min_date, min_value=min_date, max_value=max_date)
+    end_date = st.sidebar.date_input("End Date", max_date, min_value=min_date, max_value=max_date)
+    
+    # Charts plot the finest resolution that fits their point budget for the range
+    resolution_choice = st.sidebar.selectbox("Chart Resolution", ["Auto", "Daily", "Weekly", "Monthly", "Quarterly"])
+    resolution_caption = st.sidebar.empty()
+    
+    # Dashboard sections
+    sections = ["Overview", "Schedule Performance", "Cost Performance", "Productivity", "Safety", "Quality", "Critical Path", "Portfolio"]
+    if tracing.is_enabled():
+        sections.append("Performance")
+    section = st.sidebar.selectbox("Choose Section", sections)
+    
+    default_view = (section == "Overview" and resolution_choice == "Auto" and (start_date, end_date) == (min_date, max_date)
+                    and not st.session_state.get(COST_PATH_KEY))
+    if artifact is not None and default_view:
+        resolution_caption.caption(artifact['resolution_caption'])
+        render_first_paint(artifact)
+        progress_pct = artifact['progress_pct']
+    else:
+        if data is None:
+            entry, data = load_view_data(project, as_of, data_dir)
+            if data is None:
+                return
+        telematics_path = telematics.series_path(data_dir)
+        crew_path = timesheets.crew_productivity_path(data_dir)
+        progress_pct = render_section(section, data, entry, start_date, end_date, resolution_choice, resolution_caption,
+                                      cost_hierarchy_for(data_dir), telematics_path if os.path.exists(telematics_path) else None,
+                                      crew_path if os.path.exists(crew_path) else None)
     
     # Project info in sidebar
     st.sidebar.markdown("---")
     st.sidebar.subheader("Project Information")
     st.sidebar.info(f"""
-    **Project:** Commercial Building Construction
+    **Project:** {project or "Commercial Building Construction"}
     
     **Timeline:** Jan 2024 - Dec 2024
     
     **Budget:** $5,000,000
     
-    **Current Status:** {filtered_schedule.iloc[-1]['Actual_Progress_Pct']:.1f}% Complete
+    **Current Status:** {progress_pct:.1f}% Complete
     
     **Last Updated:** {datetime.now().strftime('%Y-%m-%d %H:%M')}
     """)
+    
+    return section, start_date, end_date
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
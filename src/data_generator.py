@@ -3,9 +3,13 @@ import numpy as np
 from datetime import datetime, timedelta
 import random
 
-def generate_construction_data():
+def generate_construction_data(freq='W'):
     """
     Generate realistic construction project data for dashboard demonstration
+    
+    `freq` is the reporting frequency as a pandas offset: 'W' (weekly), 'D'
+    (daily) or '8h' (per shift). Flows such as costs, hours, near misses and
+    inspections are scaled to the length of a reporting period.
     """
     
     # Set random seed for reproducible data
@@ -17,8 +21,14 @@ def generate_construction_data():
     project_end = datetime(2024, 12, 20)
     current_date = datetime(2024, 10, 20)
     
-    # Generate weekly data points
-    weeks = pd.date_range(start=project_start, end=current_date, freq='W')
+    # Generate one data point per reporting period
+    weeks = pd.date_range(start=project_start, end=current_date, freq=freq)
+    project_days = (project_end - project_start).days
+    
+    # Period length as a fraction of a week; flows scale with it and their noise with its square root
+    period = weeks[1] - weeks[0] if len(weeks) > 1 else pd.Timedelta(weeks=1)
+    scale = period / pd.Timedelta(weeks=1)
+    spread = np.sqrt(scale)
     
     # Task categories for a commercial building construction project
     task_categories = [
@@ -39,6 +49,8 @@ def generate_construction_data():
     cumulative_actual = 0
     cumulative_budget = 0
     cumulative_spent = 0
+    total_incidents = 0
+    recorded_hours = 0
     
     for i, week in enumerate(weeks):
         # Schedule Performance Metrics
@@ -56,11 +68,13 @@ def generate_construction_data():
         spi = earned_value / planned_value if planned_value > 0 else 1.0
         
         # Days ahead/behind (simplified calculation)
-        days_variance = (actual_progress - planned_progress) * 350 / 100  # 350 total days
+        days_variance = (actual_progress - planned_progress) * project_days / 100
+        
+        week_number = (week - weeks[0]).days // 7 + 1
         
         schedule_data.append({
             'Date': week,
-            'Week': i + 1,
+            'Week': week_number,
             'Planned_Progress_Pct': round(planned_progress, 2),
             'Actual_Progress_Pct': round(actual_progress, 2),
             'Planned_Value': round(planned_value, 2),
@@ -70,7 +84,7 @@ def generate_construction_data():
         })
         
         # Cost Performance Metrics
-        weekly_budget = 150000 + np.random.normal(0, 20000)  # ~$150k per week
+        weekly_budget = 150000 * scale + np.random.normal(0, 20000 * spread)  # ~$150k per week
         weekly_actual = weekly_budget * np.random.normal(1.05, 0.15)  # Typically over budget
         
         cumulative_budget += weekly_budget
@@ -84,7 +98,7 @@ def generate_construction_data():
         
         cost_data.append({
             'Date': week,
-            'Week': i + 1,
+            'Week': week_number,
             'Weekly_Budget': round(weekly_budget, 2),
             'Weekly_Actual': round(weekly_actual, 2),
             'Cumulative_Budget': round(cumulative_budget, 2),
@@ -95,8 +109,8 @@ def generate_construction_data():
         })
         
         # Productivity Metrics
-        labor_hours = np.random.normal(2000, 300)  # Weekly labor hours
-        work_units = np.random.normal(50, 10)  # Units of work completed
+        labor_hours = np.random.normal(2000 * scale, 300 * spread)  # ~2,000 labor hours per week
+        work_units = np.random.normal(50 * scale, 10 * spread)  # Units of work completed
         labor_hours_per_unit = labor_hours / work_units if work_units > 0 else 40
         
         equipment_utilization = np.random.normal(75, 15)  # Equipment utilization %
@@ -104,7 +118,7 @@ def generate_construction_data():
         
         productivity_data.append({
             'Date': week,
-            'Week': i + 1,
+            'Week': week_number,
             'Labor_Hours': round(labor_hours, 0),
             'Work_Units': round(work_units, 1),
             'Labor_Hours_Per_Unit': round(labor_hours_per_unit, 2),
@@ -114,26 +128,25 @@ def generate_construction_data():
         
         # Safety Metrics
         # Simulate incident occurrences (rare events)
-        incident_occurred = np.random.random() < 0.05  # 5% chance per week
-        near_miss_count = np.random.poisson(2)  # Average 2 near-misses per week
+        incident_occurred = np.random.random() < 0.05 * scale  # 5% chance per week
+        near_miss_count = np.random.poisson(2 * scale)  # Average 2 near-misses per week
         
         # Calculate days since last incident (cumulative)
         if i == 0:
-            days_since_incident = 45  # Start with 45 days
-        else:
-            if incident_occurred:
-                days_since_incident = 0
-            else:
-                days_since_incident = safety_data[-1]['Days_Since_Last_Incident'] + 7
-        
-        # TRIR calculation (incidents per 200,000 hours worked)
-        total_incidents = sum([1 for s in safety_data if s['Incident_Occurred']] + [1 if incident_occurred else 0])
-        total_hours = sum([p['Labor_Hours'] for p in productivity_data]) + labor_hours
+            last_incident = week - pd.Timedelta(days=45)  # Start with 45 days
+        elif incident_occurred:
+            last_incident = week
+        days_since_incident = (week - last_incident).days
+        
+        # TRIR calculation (incidents per 200,000 hours worked), from running totals
+        total_incidents += 1 if incident_occurred else 0
+        recorded_hours += round(labor_hours, 0)
+        total_hours = recorded_hours
         trir = (total_incidents * 200000) / total_hours if total_hours > 0 else 0
         
         safety_data.append({
             'Date': week,
-            'Week': i + 1,
+            'Week': week_number,
             'Incident_Occurred': incident_occurred,
             'Near_Miss_Count': near_miss_count,
             'Days_Since_Last_Incident': days_since_incident,
@@ -141,19 +154,21 @@ def generate_construction_data():
         })
         
         # Quality Metrics
-        inspections_conducted = np.random.poisson(8)  # Average 8 inspections per week
+        inspections_conducted = np.random.poisson(8 * scale)  # Average 8 inspections per week
         inspections_passed = np.random.binomial(inspections_conducted, 0.85)  # 85% pass rate
-        punch_list_items = np.random.poisson(15)  # Average 15 punch list items per week
-        rework_cost = np.random.normal(8000, 3000)  # Average $8k rework per week
+        punch_list_items = np.random.poisson(15 * scale)  # Average 15 punch list items per week
+        # Average $8k rework per week (sd $3k); a gamma draw stays non-negative without
+        # clipping, which would raise the mean of short periods whose sd exceeds it
+        rework_cost = np.random.gamma((8000 / 3000) ** 2 * scale, 3000 ** 2 / 8000)
         
         quality_data.append({
             'Date': week,
-            'Week': i + 1,
+            'Week': week_number,
             'Inspections_Conducted': inspections_conducted,
             'Inspections_Passed': inspections_passed,
-            'Inspection_Pass_Rate_Pct': round((inspections_passed / inspections_conducted * 100) if inspections_conducted > 0 else 0, 1),
+            'Inspection_Pass_Rate_Pct': round(inspections_passed / inspections_conducted * 100, 1) if inspections_conducted > 0 else np.nan,
             'Punch_List_Items': punch_list_items,
-            'Rework_Cost': round(max(0, rework_cost), 2)
+            'Rework_Cost': round(rework_cost, 2)
         })
     
     # Convert to DataFrames
@@ -197,11 +212,224 @@ def generate_cost_breakdown():
     
     return pd.DataFrame(categories)
 
+# CSI MasterFormat sections under each cost breakdown category, with the share of the
+# project timeline (start, end as fractions) in which their work is done
+COST_SECTIONS = {
+    "Site Work": [
+        ("02 40 00", "Demolition and Structure Moving", 0.0, 0.15),
+        ("31 10 00", "Site Clearing", 0.0, 0.15),
+        ("31 20 00", "Earth Moving", 0.0, 0.25),
+        ("32 10 00", "Bases, Ballasts and Paving", 0.7, 1.0),
+        ("33 10 00", "Water Utilities", 0.05, 0.35)
+    ],
+    "Concrete": [
+        ("03 10 00", "Concrete Forming and Accessories", 0.1, 0.55),
+        ("03 20 00", "Concrete Reinforcing", 0.1, 0.55),
+        ("03 30 00", "Cast-in-Place Concrete", 0.15, 0.6),
+        ("03 40 00", "Precast Concrete", 0.3, 0.6)
+    ],
+    "Structural Steel": [
+        ("05 10 00", "Structural Metal Framing", 0.3, 0.55),
+        ("05 30 00", "Metal Decking", 0.35, 0.6),
+        ("05 50 00", "Metal Fabrications", 0.4, 0.8)
+    ],
+    "MEP Systems": [
+        ("21 10 00", "Water-Based Fire-Suppression Systems", 0.55, 0.95),
+        ("22 10 00", "Plumbing Piping", 0.5, 0.95),
+        ("23 30 00", "HVAC Air Distribution", 0.55, 0.95),
+        ("26 05 00", "Common Work Results for Electrical", 0.5, 1.0)
+    ],
+    "Envelope/Roofing": [
+        ("04 20 00", "Unit Masonry", 0.5, 0.8),
+        ("07 50 00", "Membrane Roofing", 0.55, 0.8),
+        ("08 40 00", "Entrances, Storefronts and Curtain Walls", 0.55, 0.85)
+    ],
+    "Interior Finishes": [
+        ("06 10 00", "Rough Carpentry", 0.6, 0.85),
+        ("09 20 00", "Plaster and Gypsum Board", 0.7, 0.95),
+        ("09 60 00", "Flooring", 0.8, 1.0),
+        ("09 90 00", "Painting and Coating", 0.85, 1.0)
+    ],
+    "Equipment": [
+        ("11 10 00", "Vehicle and Pedestrian Equipment", 0.75, 1.0),
+        ("14 20 00", "Elevators", 0.6, 1.0)
+    ]
+}
+
+COST_TYPES = ["Labor", "Material", "Equipment", "Subcontract"]
+
+def _split_amount(total, weights):
+    """Split a whole-dollar amount in proportion to weights, keeping the exact total"""
+    amounts = np.floor(total * weights / weights.sum())
+    amounts[-1] += total - amounts.sum()
+    return amounts
+
+def generate_cost_codes(cost_breakdown_df, weeks, codes_per_section=12, seed=7):
+    """Generate a cost code hierarchy (category > CSI section > line item) and weekly actuals per line item
+    
+    Line item budgets and actuals add up exactly to each category's Budget and
+    Actual in `cost_breakdown_df`; weekly actuals fall in each section's part
+    of the timeline. Returns (cost_codes_df, cost_code_actuals_df).
+    """
+    
+    rng = np.random.RandomState(seed)
+    weeks = pd.DatetimeIndex(weeks)
+    codes = []
+    actual_rows = []
+    
+    for category_index, category in enumerate(cost_breakdown_df.itertuples(index=False), start=1):
+        category_code = f"{category_index:02d}"
+        codes.append({"Code": category_code, "Parent": "", "Description": category.Category, "Level": 1,
+                      "Budget": 0, "Committed": 0, "Actual": 0})
+        sections = COST_SECTIONS[category.Category]
+        item_count = len(sections) * codes_per_section
+        
+        # Spread the category budget and actual over its line items
+        budget_weights = rng.dirichlet(np.full(item_count, 2.0))
+        item_budgets = _split_amount(category.Budget, budget_weights)
+        item_actuals = _split_amount(category.Actual, budget_weights * rng.lognormal(0, 0.1, item_count))
+        item_committed = item_actuals + np.round(item_budgets * rng.uniform(0, 0.12, item_count))
+        
+        for section_index, (section_code, section_name, start, end) in enumerate(sections):
+            codes.append({"Code": section_code, "Parent": category_code, "Description": section_name, "Level": 2,
+                          "Budget": 0, "Committed": 0, "Actual": 0})
+            active = np.flatnonzero((np.arange(len(weeks)) >= start * len(weeks)) & (np.arange(len(weeks)) <= end * len(weeks)))
+            if len(active) == 0:
+                active = np.array([len(weeks) - 1])
+            
+            for item in range(codes_per_section):
+                position = section_index * codes_per_section + item
+                item_code = f"{section_code}.{item + 1:03d}"
+                cost_type = COST_TYPES[item % len(COST_TYPES)]
+                codes.append({
+                    "Code": item_code,
+                    "Parent": section_code,
+                    "Description": f"{section_name} - {cost_type} {item // len(COST_TYPES) + 1}",
+                    "Level": 3,
+                    "Budget": item_budgets[position],
+                    "Committed": item_committed[position],
+                    "Actual": item_actuals[position]
+                })
+                weekly = _split_amount(item_actuals[position], rng.dirichlet(np.full(len(active), 3.0)))
+                actual_rows.extend(
+                    {"Date": weeks[week].strftime('%Y-%m-%d'), "Code": item_code, "Actual": amount}
+                    for week, amount in zip(active, weekly) if amount
+                )
+    
+    cost_codes_df = pd.DataFrame(codes)
+    for column in ["Budget", "Committed", "Actual"]:
+        cost_codes_df[column] = cost_codes_df[column].astype(np.int64)
+    cost_code_actuals_df = pd.DataFrame(actual_rows).sort_values(["Date", "Code"], kind="stable").reset_index(drop=True)
+    cost_code_actuals_df["Actual"] = cost_code_actuals_df["Actual"].astype(np.int64)
+    return cost_codes_df, cost_code_actuals_df
+
+TRANSACTION_SOURCES = ["AP", "Payroll", "Equipment"]
+
+def generate_transactions(cost_code_actuals_df, per_week=5, seed=11):
+    """Split weekly cost code actuals into raw transactions (Date, Code, Amount, Source)
+    
+    Each week's actual for a code becomes up to `per_week` AP, payroll and
+    equipment charges dated within that week (Monday to the Sunday label);
+    their amounts add up to the weekly actual to the cent.
+    """
+    
+    rng = np.random.RandomState(seed)
+    weeks = pd.to_datetime(cost_code_actuals_df["Date"]).to_numpy()
+    counts = rng.randint(1, per_week + 1, len(cost_code_actuals_df))
+    rows = np.repeat(np.arange(len(cost_code_actuals_df)), counts)
+    
+    # Random shares of each weekly amount, in cents, with the remainder on the last transaction
+    shares = rng.gamma(2.0, size=len(rows))
+    share_totals = np.bincount(rows, weights=shares)
+    cents = np.round(cost_code_actuals_df["Actual"].to_numpy(dtype=float) * 100).astype(np.int64)
+    amounts = np.floor(cents[rows] * shares / share_totals[rows]).astype(np.int64)
+    last = np.cumsum(counts) - 1
+    amounts[last] += cents - np.bincount(rows, weights=amounts).astype(np.int64)
+    
+    return pd.DataFrame({
+        "Date": weeks[rows] - rng.randint(0, 7, len(rows)).astype("timedelta64[D]"),
+        "Code": cost_code_actuals_df["Code"].to_numpy()[rows],
+        "Amount": amounts / 100,
+        "Source": np.array(TRANSACTION_SOURCES)[rng.randint(0, len(TRANSACTION_SOURCES), len(rows))]
+    })
+
+TELEMATICS_MACHINE_TYPES = ["EX", "LD", "CR", "DZ", "TH"]
+
+def generate_telematics(start, days=7, machines=20, interval_seconds=30, shift_start_hour=7, shift_hours=10, seed=13):
+    """Engine and idle pings (Machine, Timestamp, Engine_On, Idle) of a fleet during one shift a day
+    
+    Every machine pings each `interval_seconds` through the shift. Engine and
+    idle states are drawn per 5-minute block from per-machine rates, so
+    machines differ in utilization and idle ratio. Pings are ordered by time,
+    as a telematics export interleaves them.
+    """
+    
+    rng = np.random.RandomState(seed)
+    names = [f"{TELEMATICS_MACHINE_TYPES[i % len(TELEMATICS_MACHINE_TYPES)]}-{i + 1:03d}" for i in range(machines)]
+    engine_rate = rng.uniform(0.5, 0.95, machines)
+    idle_rate = rng.uniform(0.1, 0.4, machines)
+    
+    block_pings = 300 // interval_seconds
+    shift_pings = shift_hours * 3600 // interval_seconds
+    blocks_per_shift = -(-shift_pings // block_pings)
+    blocks = rng.random_sample((machines, days, blocks_per_shift))
+    engine = blocks < engine_rate[:, None, None]
+    idle = engine & (rng.random_sample(blocks.shape) < idle_rate[:, None, None])
+    engine = np.repeat(engine, block_pings, axis=2)[:, :, :shift_pings]
+    idle = np.repeat(idle, block_pings, axis=2)[:, :, :shift_pings]
+    
+    day_starts = pd.Timestamp(start).normalize() + pd.to_timedelta(np.arange(days), unit="D") + pd.Timedelta(hours=shift_start_hour)
+    offsets = pd.to_timedelta(np.arange(shift_pings) * interval_seconds, unit="s")
+    times = day_starts.to_numpy()[None, :, None] + offsets.to_numpy()[None, None, :]
+    times = np.broadcast_to(times, engine.shape)
+    
+    pings = pd.DataFrame({
+        "Machine": np.repeat(names, days * shift_pings),
+        "Timestamp": times.ravel(),
+        "Engine_On": engine.ravel().astype(np.int8),
+        "Idle": idle.ravel().astype(np.int8)
+    })
+    return pings.sort_values(["Timestamp", "Machine"], kind="stable").reset_index(drop=True)
+
+def generate_timesheets(weeks, cost_codes_df, crews=12, workers_per_crew=6, seed=17):
+    """Daily timesheets (Date, Worker, Crew, Code, Hours) and installed quantities (Date, Crew, Code, Quantity)
+    
+    Each crew works two labor line items of its trade each week, Monday to Friday,
+    and every worker logs 8 to 10 hours a day on one of them. Each line item
+    has its own hours-per-unit rate and each crew's efficiency drifts from
+    week to week, so crews differ in hours per unit on the same activity.
+    """
+    
+    rng = np.random.RandomState(seed)
+    parents = set(cost_codes_df["Parent"].dropna())
+    labor = ~cost_codes_df["Code"].isin(parents) & cost_codes_df["Description"].str.contains(" - Labor ")
+    line_items = cost_codes_df.loc[labor, "Code"].to_numpy()
+    unit_rates = pd.Series(rng.uniform(0.5, 4.0, len(line_items)), index=line_items)
+    trades = [rng.choice(line_items, 4, replace=False) for _ in range(crews)]
+    efficiency = np.exp(np.cumsum(rng.normal(0, 0.05, (len(weeks), crews)), axis=0))
+    
+    rows = []
+    for w, week in enumerate(pd.to_datetime(pd.Series(weeks))):
+        for crew in range(crews):
+            codes = rng.choice(trades[crew], 2, replace=False)
+            for day in range(5):
+                date = week - pd.Timedelta(days=6 - day)
+                for worker in range(workers_per_crew):
+                    rows.append((date, f"W{crew + 1:02d}{worker + 1:02d}", f"Crew {crew + 1:02d}",
+                                 codes[rng.randint(0, 2)], 8 + 0.5 * rng.randint(0, 5), efficiency[w, crew]))
+    
+    timesheets_df = pd.DataFrame(rows, columns=["Date", "Worker", "Crew", "Code", "Hours", "Efficiency"])
+    daily = timesheets_df.groupby(["Date", "Crew", "Code"], as_index=False).agg(Hours=("Hours", "sum"), Efficiency=("Efficiency", "first"))
+    rates = daily["Code"].map(unit_rates) * daily["Efficiency"] * rng.normal(1.0, 0.08, len(daily))
+    quantities_df = daily.assign(Quantity=(daily["Hours"] / rates).round(1))[["Date", "Crew", "Code", "Quantity"]]
+    return timesheets_df.drop(columns="Efficiency"), quantities_df
+
 if __name__ == "__main__":
     # Generate all datasets
     schedule_df, cost_df, productivity_df, safety_df, quality_df = generate_construction_data()
     critical_path_df = generate_critical_path_tasks()
     cost_breakdown_df = generate_cost_breakdown()
+    cost_codes_df, cost_code_actuals_df = generate_cost_codes(cost_breakdown_df, schedule_df['Date'])
     
     # Save to CSV files
     schedule_df.to_csv('data/schedule_data.csv', index=False)
@@ -211,6 +439,8 @@ if __name__ == "__main__":
     quality_df.to_csv('data/quality_data.csv', index=False)
     critical_path_df.to_csv('data/critical_path_tasks.csv', index=False)
     cost_breakdown_df.to_csv('data/cost_breakdown.csv', index=False)
+    cost_codes_df.to_csv('data/cost_codes.csv', index=False)
+    cost_code_actuals_df.to_csv('data/cost_code_actuals.csv', index=False)
     
     print("Construction project data generated successfully!")
     print(f"Schedule data: {len(schedule_df)} weeks")
@@ -219,4 +449,5 @@ if __name__ == "__main__":
     print(f"Safety data: {len(safety_df)} weeks")
     print(f"Quality data: {len(quality_df)} weeks")
     print(f"Critical path tasks: {len(critical_path_df)} tasks")
-    print(f"Cost breakdown: {len(cost_breakdown_df)} categories")
\ No newline at end of file
+    print(f"Cost breakdown: {len(cost_breakdown_df)} categories")
+    print(f"Cost codes: {len(cost_codes_df)} codes, {len(cost_code_actuals_df)} weekly actuals")
\ No newline at end of file
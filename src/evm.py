@@ -0,0 +1,105 @@
+"""
+Earned Value Management engine
+Computes every EVM metric for every reporting period in one vectorized pass
+"""
+
+import numpy as np
+import pandas as pd
+
+DEFAULT_BUDGET_AT_COMPLETION = 5000000  # $5M project
+
+# Metrics that get rolling and smoothed variants
+TREND_METRICS = ['SPI', 'CPI', 'TCPI', 'EAC']
+
+# Trailing window of the dashboard's "4-week avg" trend lines, whatever the data frequency
+TREND_WINDOW = pd.Timedelta(weeks=4)
+
+def _masked_divide(numerator, denominator, invalid):
+    """Divide element-wise, masking (and never evaluating) the invalid entries"""
+    numerator, denominator, invalid = np.broadcast_arrays(numerator, denominator, invalid)
+    quotient = np.divide(numerator, denominator, out=np.zeros(numerator.shape), where=~invalid)
+    return np.ma.masked_array(quotient, mask=invalid)
+
+def compute_evm_arrays(pv, ev, ac, bac=DEFAULT_BUDGET_AT_COMPLETION):
+    """Compute EVM metrics element-wise over arrays of any shape
+
+    `pv`, `ev` and `ac` may be 1-D (periods of one project) or 2-D
+    (projects x periods); `bac` is a scalar or broadcastable array. Divisions
+    by zero use the same fallbacks as the single-period calculation: SPI and
+    CPI default to 1.0, EAC to BAC, and TCPI is masked (not applicable) once
+    actual cost reaches BAC. Returns a dict of arrays; TCPI is a masked array.
+    """
+
+    pv = np.asarray(pv, dtype=float)
+    ev = np.asarray(ev, dtype=float)
+    ac = np.asarray(ac, dtype=float)
+    bac = np.broadcast_to(np.asarray(bac, dtype=float), np.broadcast(pv, ev, ac).shape)
+
+    # Cost Variance / Schedule Variance
+    cv = ev - ac
+    sv = ev - pv
+
+    spi = _masked_divide(ev, pv, pv <= 0).filled(1.0)
+    cpi = _masked_divide(ev, ac, ac <= 0).filled(1.0)
+
+    # To-Complete Performance Index is undefined once the budget is spent
+    tcpi = _masked_divide(bac - ev, bac - ac, ac >= bac)
+
+    # Estimate at Completion, Estimate to Complete, Variance at Completion
+    remaining_at_cpi = _masked_divide(bac - ev, cpi, cpi <= 0)
+    eac = np.where(remaining_at_cpi.mask, bac, ac + remaining_at_cpi.data)
+    etc = eac - ac
+    vac = bac - eac
+
+    return {
+        'Planned_Value': pv,
+        'Earned_Value': ev,
+        'Actual_Cost': ac,
+        'Cost_Variance': cv,
+        'Schedule_Variance': sv,
+        'SPI': spi,
+        'CPI': cpi,
+        'TCPI': tcpi,
+        'EAC': eac,
+        'ETC': etc,
+        'VAC': vac
+    }
+
+def calculate_evm_series(schedule_df, cost_df, bac=DEFAULT_BUDGET_AT_COMPLETION, rolling_window=None, smoothing_span=None):
+    """Return a per-period DataFrame of every EVM metric
+
+    Schedule and cost rows are matched on Date. With `rolling_window` (a
+    number of periods, or a time span such as TREND_WINDOW or '28D')
+    `<metric>_Rolling` columns hold trailing means, and with `smoothing_span`
+    `<metric>_Smoothed` columns hold exponentially weighted means of the
+    TREND_METRICS. TCPI is NaN where it is not applicable.
+    """
+
+    merged = pd.merge(
+        schedule_df[['Date', 'Week', 'Planned_Value', 'Earned_Value']],
+        cost_df[['Date', 'Cumulative_Spent']],
+        on='Date',
+        how='inner'
+    )
+
+    metrics = compute_evm_arrays(
+        merged['Planned_Value'].to_numpy(),
+        merged['Earned_Value'].to_numpy(),
+        merged['Cumulative_Spent'].to_numpy(),
+        bac
+    )
+
+    series = pd.DataFrame({'Date': merged['Date'], 'Week': merged['Week']})
+    for name, values in metrics.items():
+        series[name] = np.ma.filled(np.ma.asarray(values, dtype=float), np.nan)
+
+    if rolling_window:
+        by_date = series.set_index(pd.DatetimeIndex(series['Date']))
+        for name in TREND_METRICS:
+            series[f'{name}_Rolling'] = by_date[name].rolling(rolling_window, min_periods=1).mean().to_numpy()
+
+    if smoothing_span:
+        for name in TREND_METRICS:
+            series[f'{name}_Smoothed'] = series[name].ewm(span=smoothing_span, ignore_na=True).mean()
+
+    return series
@@ -4,22 +4,25 @@ Creates additional Excel files with charts and pivot tables
 """
 
 import pandas as pd
-import matplotlib.pyplot as plt
 from openpyxl import Workbook
 from openpyxl.chart import LineChart, BarChart, Reference
-from openpyxl.chart.axis import DateAxis
 from openpyxl.styles import PatternFill, Font, Alignment
 import os
+from cost_hierarchy import CostHierarchy
+from evm import calculate_evm_series
+from risk_scanner import latest_pass_rate
+from tracing import traced
 
-def create_excel_with_charts():
+@traced('excel.charts')
+def create_excel_with_charts(data_dir='data', chart_file="Construction_Dashboard_Charts.xlsx"):
     """Create Excel file with embedded charts and pivot analysis"""
     
     try:
         # Load data
-        schedule_df = pd.read_csv('data/schedule_data.csv')
-        cost_df = pd.read_csv('data/cost_data.csv')
-        safety_df = pd.read_csv('data/safety_data.csv')
-        quality_df = pd.read_csv('data/quality_data.csv')
+        schedule_df = pd.read_csv(os.path.join(data_dir, 'schedule_data.csv'))
+        cost_df = pd.read_csv(os.path.join(data_dir, 'cost_data.csv'))
+        safety_df = pd.read_csv(os.path.join(data_dir, 'safety_data.csv'))
+        quality_df = pd.read_csv(os.path.join(data_dir, 'quality_data.csv'))
         
         # Create workbook
         wb = Workbook()
@@ -31,10 +34,10 @@ def create_excel_with_charts():
         create_schedule_charts_sheet(wb, schedule_df)
         create_cost_charts_sheet(wb, cost_df)
         create_safety_charts_sheet(wb, safety_df)
+        create_evm_charts_sheet(wb, schedule_df, cost_df)
         create_executive_summary_sheet(wb, schedule_df, cost_df, safety_df, quality_df)
         
         # Save workbook
-        chart_file = "Construction_Dashboard_Charts.xlsx"
         wb.save(chart_file)
         
         print(f"✅ Excel charts file created: {chart_file}")
@@ -47,6 +50,7 @@ def create_excel_with_charts():
         print(f"❌ Error creating charts: {str(e)}")
         return None
 
+@traced('excel.schedule_sheet')
 def create_schedule_charts_sheet(wb, schedule_df):
     """Create schedule performance charts"""
     
@@ -91,6 +95,7 @@ def create_schedule_charts_sheet(wb, schedule_df):
     
     ws.add_chart(chart2, "F18")
 
+@traced('excel.cost_sheet')
 def create_cost_charts_sheet(wb, cost_df):
     """Create cost performance charts"""
     
@@ -137,6 +142,7 @@ def create_cost_charts_sheet(wb, cost_df):
     
     ws.add_chart(chart2, "G18")
 
+@traced('excel.safety_sheet')
 def create_safety_charts_sheet(wb, safety_df):
     """Create safety performance charts"""
     
@@ -168,6 +174,51 @@ def create_safety_charts_sheet(wb, safety_df):
     
     ws.add_chart(chart1, "F2")
 
+@traced('excel.evm_sheet')
+def create_evm_charts_sheet(wb, schedule_df, cost_df):
+    """Create earned value trend charts from the per-week EVM series"""
+    
+    ws = wb.create_sheet("EVM Analysis")
+    
+    schedule_df = schedule_df.assign(Date=pd.to_datetime(schedule_df['Date']))
+    cost_df = cost_df.assign(Date=pd.to_datetime(cost_df['Date']))
+    evm_df = calculate_evm_series(schedule_df, cost_df)
+    
+    columns = ['Week', 'SPI', 'CPI', 'TCPI', 'EAC', 'ETC', 'VAC']
+    ws.append(['Week', 'SPI', 'CPI', 'TCPI', 'Estimate at Completion', 'Estimate to Complete', 'Variance at Completion'])
+    for row in evm_df[columns].itertuples(index=False):
+        ws.append([None if pd.isna(value) else round(float(value), 3) for value in row])
+    
+    last_row = len(evm_df) + 1
+    cats = Reference(ws, min_col=1, min_row=2, max_row=last_row)
+    
+    # Performance indices chart
+    chart1 = LineChart()
+    chart1.title = "Performance Indices (SPI / CPI / TCPI)"
+    chart1.style = 12
+    chart1.y_axis.title = 'Index'
+    chart1.x_axis.title = 'Project Week'
+    
+    data = Reference(ws, min_col=2, min_row=1, max_col=4, max_row=last_row)
+    chart1.add_data(data, titles_from_data=True)
+    chart1.set_categories(cats)
+    
+    ws.add_chart(chart1, "I2")
+    
+    # Estimate at completion chart
+    chart2 = LineChart()
+    chart2.title = "Estimate at Completion (EAC)"
+    chart2.style = 13
+    chart2.y_axis.title = 'Cost ($)'
+    chart2.x_axis.title = 'Project Week'
+    
+    eac_data = Reference(ws, min_col=5, min_row=1, max_col=5, max_row=last_row)
+    chart2.add_data(eac_data, titles_from_data=True)
+    chart2.set_categories(cats)
+    
+    ws.add_chart(chart2, "I18")
+
+@traced('excel.summary_sheet')
 def create_executive_summary_sheet(wb, schedule_df, cost_df, safety_df, quality_df):
     """Create executive summary with key metrics"""
     
@@ -199,7 +250,7 @@ def create_executive_summary_sheet(wb, schedule_df, cost_df, safety_df, quality_
         ('Budget Remaining', f"${5000000 - latest_cost['Cumulative_Spent']:,.0f}"),
         ('Days Since Incident', f"{latest_safety['Days_Since_Last_Incident']}"),
         ('TRIR', f"{latest_safety['TRIR']:.2f}"),
-        ('Inspection Pass Rate', f"{latest_quality['Inspection_Pass_Rate_Pct']:.1f}%"),
+        ('Inspection Pass Rate', f"{latest_pass_rate(quality_df):.1f}%"),
         ('Open Punch Items', f"{latest_quality['Punch_List_Items']}")
     ]
     
@@ -241,16 +292,17 @@ def create_executive_summary_sheet(wb, schedule_df, cost_df, safety_df, quality_
         ws[f'A{row}'] = item
         ws[f'B{row}'] = value
 
-def create_pivot_analysis():
+@traced('excel.pivot')
+def create_pivot_analysis(data_dir='data', pivot_file='Construction_Pivot_Analysis.xlsx'):
     """Create Excel file with pivot table analysis"""
     
     try:
         # This would require xlwings or similar for full pivot functionality
         # For now, create a summary analysis file
         
-        cost_breakdown = pd.read_csv('data/cost_breakdown.csv')
+        cost_breakdown = pd.read_csv(os.path.join(data_dir, 'cost_breakdown.csv'))
         
-        with pd.ExcelWriter('Construction_Pivot_Analysis.xlsx', engine='openpyxl') as writer:
+        with pd.ExcelWriter(pivot_file, engine='openpyxl') as writer:
             cost_breakdown.to_excel(writer, sheet_name='Cost Analysis', index=False)
             
             # Add summary calculations
@@ -266,11 +318,18 @@ def create_pivot_analysis():
             
             summary_df = pd.DataFrame(summary_data)
             summary_df.to_excel(writer, sheet_name='Summary', index=False)
+            
+            # Every cost code with its rolled-up totals, one row per code for Excel pivots
+            hierarchy = CostHierarchy.from_data_dir(data_dir)
+            if hierarchy is not None:
+                hierarchy.pivot_table().drop(columns='Has_Children').to_excel(writer, sheet_name='Cost Code Rollup', index=False)
         
-        print("✅ Pivot analysis file created: Construction_Pivot_Analysis.xlsx")
+        print(f"✅ Pivot analysis file created: {pivot_file}")
+        return pivot_file
         
     except Exception as e:
         print(f"❌ Error creating pivot analysis: {str(e)}")
+        return None
 
 def main():
     """Generate Excel charts and analysis files"""
@@ -291,7 +350,8 @@ def main():
         
         print(f"\n🎯 Chart Features:")
         print("• Schedule performance line charts")
-        print("• Cost tracking with variance analysis")  
+        print("• Cost tracking with variance analysis")
+        print("• Earned value trends (SPI, CPI, TCPI, EAC)")
         print("• Safety trend monitoring")
         print("• Executive summary dashboard")
         print("• Formatted KPI indicators")
@@ -7,32 +7,125 @@ import pandas as pd
 import numpy as np
 from datetime import datetime, timedelta
 import os
+from tracing import traced
+from xlsx_stream import DEFAULT_CHUNKSIZE, csv_sheets, write_csv_workbook
 
-def create_excel_template():
+# Weekly rows in each tracking sheet of a blank template
+TEMPLATE_WEEKS = 52
+TEMPLATE_START = '2024-01-15'
+CONTRACT_VALUE = 5000000
+
+# Sample data workbook sheets: sheet name -> CSV file in the data directory
+SAMPLE_DATA_SHEETS = {
+    'Schedule Data': 'schedule_data.csv',
+    'Cost Data': 'cost_data.csv',
+    'Productivity Data': 'productivity_data.csv',
+    'Safety Data': 'safety_data.csv',
+    'Quality Data': 'quality_data.csv',
+    'Critical Path Tasks': 'critical_path_tasks.csv',
+    'Cost Breakdown': 'cost_breakdown.csv'
+}
+
+# Project Overview settings; the sheet is written one row down, so its header
+# is row 2 and the first setting (Project Name) is row 3
+OVERVIEW_FIELDS = [
+    'Project Name',
+    'Project Manager',
+    'Client/Owner',
+    'Contract Value',
+    'Project Start Date',
+    'Planned End Date',
+    'Current Date',
+    'Project Location',
+    'Contract Type',
+    'Project Phase'
+]
+OVERVIEW_FIRST_ROW = 3
+
+# Workbook-level names over bounded ranges: name -> (sheet, column header).
+# Tracking sheet ranges cover exactly the template's weekly rows, so summary
+# formulas never scan whole columns.
+NAMED_COLUMNS = {
+    'Schedule_Actual_Progress': ('Schedule Tracking', 'Actual_Progress_Pct'),
+    'Schedule_SPI': ('Schedule Tracking', 'SPI'),
+    'Schedule_Days_Variance': ('Schedule Tracking', 'Days_Variance'),
+    'Cost_Cumulative_Spent': ('Cost Tracking', 'Cumulative_Spent'),
+    'Cost_CPI': ('Cost Tracking', 'CPI'),
+    'Cost_Variance': ('Cost Tracking', 'Cost_Variance'),
+    'Productivity_Hours_Per_Unit': ('Productivity Metrics', 'Labor_Hours_Per_Unit'),
+    'Productivity_Equipment_Utilization': ('Productivity Metrics', 'Equipment_Utilization_Pct'),
+    'Safety_Days_Since_Incident': ('Safety Tracking', 'Days_Since_Last_Incident'),
+    'Safety_TRIR': ('Safety Tracking', 'TRIR'),
+    'Quality_Pass_Rate': ('Quality Metrics', 'Inspection_Pass_Rate_Pct'),
+    'Quality_Open_Punch_Items': ('Quality Metrics', 'Open_Punch_Items')
+}
+
+def overview_row(field):
+    """Sheet row of a Project Overview setting"""
+    return OVERVIEW_FIRST_ROW + OVERVIEW_FIELDS.index(field)
+
+def row_formulas(pattern, rows, first_row=2):
+    """One formula per data row, with {r} the row and {p} the previous row
+
+    Running totals add to the previous row (N() turns the header above the
+    first row into 0), so each row recalculates in constant time instead of
+    re-summing the column from the top.
+    """
+    return [pattern.format(r=row, p=row - 1) for row in range(first_row, first_row + rows)]
+
+def quote_sheet(sheet_name):
+    """Sheet name as used in a cell reference, e.g. 'Schedule Tracking'"""
+    return "'" + sheet_name.replace("'", "''") + "'"
+
+def define_named_ranges(workbook, weeks=TEMPLATE_WEEKS):
+    """Add the contract value and bounded tracking-column names to the workbook"""
+    from openpyxl.utils import get_column_letter
+    from openpyxl.workbook.defined_name import DefinedName
+
+    names = {
+        'ContractValue': f"{quote_sheet('Project Overview')}!$B${overview_row('Contract Value')}",
+        'ProjectStart': f"{quote_sheet('Project Overview')}!$B${overview_row('Project Start Date')}"
+    }
+    for name, (sheet_name, header) in NAMED_COLUMNS.items():
+        headers = [cell.value for cell in workbook[sheet_name][1]]
+        column = get_column_letter(headers.index(header) + 1)
+        names[name] = f"{quote_sheet(sheet_name)}!${column}$2:${column}${weeks + 1}"
+
+    for name, reference in names.items():
+        workbook.defined_names[name] = DefinedName(name, attr_text=reference)
+
+@traced('excel.template')
+def create_excel_template(template_path="Construction_Project_Dashboard_Template.xlsx", weeks=TEMPLATE_WEEKS):
     """Create a comprehensive Excel template for construction project tracking"""
     
-    # Create Excel writer object
-    template_path = "Construction_Project_Dashboard_Template.xlsx"
+    write_template(template_path, weeks)
+    
+    print(f"✅ Excel template created: {template_path}")
+    return template_path
+
+def write_template(target, weeks=TEMPLATE_WEEKS):
+    """Write all template sheets to a path or binary file object"""
     
-    with pd.ExcelWriter(template_path, engine='openpyxl') as writer:
+    # Create Excel writer object
+    with pd.ExcelWriter(target, engine='openpyxl') as writer:
         
         # Sheet 1: Project Overview
         create_project_overview_sheet(writer)
         
         # Sheet 2: Schedule Tracking
-        create_schedule_tracking_sheet(writer)
+        create_schedule_tracking_sheet(writer, weeks)
         
         # Sheet 3: Cost Tracking
-        create_cost_tracking_sheet(writer)
+        create_cost_tracking_sheet(writer, weeks)
         
         # Sheet 4: Productivity Metrics
-        create_productivity_sheet(writer)
+        create_productivity_sheet(writer, weeks)
         
         # Sheet 5: Safety Tracking
-        create_safety_sheet(writer)
+        create_safety_sheet(writer, weeks)
         
         # Sheet 6: Quality Metrics
-        create_quality_sheet(writer)
+        create_quality_sheet(writer, weeks)
         
         # Sheet 7: Critical Path Tasks
         create_critical_path_sheet(writer)
@@ -45,31 +138,19 @@ def create_excel_template():
         
         # Sheet 10: Instructions
         create_instructions_sheet(writer)
-    
-    print(f"✅ Excel template created: {template_path}")
-    return template_path
+
+        define_named_ranges(writer.book, weeks)
 
 def create_project_overview_sheet(writer):
     """Create project overview and settings sheet"""
     
     overview_data = {
-        'Project Information': [
-            'Project Name',
-            'Project Manager',
-            'Client/Owner',
-            'Contract Value',
-            'Project Start Date',
-            'Planned End Date',
-            'Current Date',
-            'Project Location',
-            'Contract Type',
-            'Project Phase'
-        ],
+        'Project Information': OVERVIEW_FIELDS,
         'Value': [
             'Commercial Building Construction',
             '[Enter PM Name]',
             '[Enter Client Name]',
-            '$5,000,000',
+            CONTRACT_VALUE,
             '2024-01-15',
             '2024-12-20',
             datetime.now().strftime('%Y-%m-%d'),
@@ -93,109 +174,115 @@ def create_project_overview_sheet(writer):
     
     df = pd.DataFrame(overview_data)
     df.to_excel(writer, sheet_name='Project Overview', index=False, startrow=1)
+    writer.sheets['Project Overview'][f"B{overview_row('Contract Value')}"].number_format = '$#,##0'
 
-def create_schedule_tracking_sheet(writer):
+def create_schedule_tracking_sheet(writer, weeks=TEMPLATE_WEEKS):
     """Create schedule performance tracking sheet"""
     
-    # Create 52 weeks of template rows
-    weeks = pd.date_range(start='2024-01-15', periods=52, freq='W')
+    # One template row per week
+    dates = pd.date_range(start=TEMPLATE_START, periods=weeks, freq='W')
     
     schedule_template = {
-        'Date': weeks,
-        'Week': range(1, 53),
-        'Planned_Progress_Pct': [i * 100/52 for i in range(1, 53)],
-        'Actual_Progress_Pct': [''] * 52,  # To be filled by user
-        'Planned_Value': [i * 5000000/52 for i in range(1, 53)],
-        'Earned_Value': ['=D2*$B$2/100'] + [''] * 51,  # Formula for first row
-        'SPI': ['=F2/E2'] + [''] * 51,  # Formula for first row
-        'Days_Variance': ['=(D2-C2)*365/100'] + [''] * 51,  # Formula for first row
-        'Notes': [''] * 52
+        'Date': dates,
+        'Week': range(1, weeks + 1),
+        'Planned_Progress_Pct': [i * 100/weeks for i in range(1, weeks + 1)],
+        'Actual_Progress_Pct': [''] * weeks,  # To be filled by user
+        'Planned_Value': [i * CONTRACT_VALUE/weeks for i in range(1, weeks + 1)],
+        'Earned_Value': row_formulas('=IF(D{r}="","",D{r}*ContractValue/100)', weeks),
+        'SPI': row_formulas('=IF(OR(F{r}="",N(E{r})=0),"",F{r}/E{r})', weeks),
+        'Days_Variance': row_formulas('=IF(D{r}="","",(D{r}-C{r})*365/100)', weeks),
+        'Notes': [''] * weeks
     }
     
     df = pd.DataFrame(schedule_template)
     df.to_excel(writer, sheet_name='Schedule Tracking', index=False)
 
-def create_cost_tracking_sheet(writer):
+def create_cost_tracking_sheet(writer, weeks=TEMPLATE_WEEKS):
     """Create cost performance tracking sheet"""
     
-    weeks = pd.date_range(start='2024-01-15', periods=52, freq='W')
+    dates = pd.date_range(start=TEMPLATE_START, periods=weeks, freq='W')
+    schedule = quote_sheet('Schedule Tracking')
     
     cost_template = {
-        'Date': weeks,
-        'Week': range(1, 53),
-        'Weekly_Budget': [96000] * 52,  # ~$96k per week for $5M project
-        'Weekly_Actual': [''] * 52,  # To be filled by user
-        'Cumulative_Budget': ['=SUM($C$2:C2)'] + [''] * 51,
-        'Cumulative_Spent': ['=SUM($D$2:D2)'] + [''] * 51,
-        'CPI': ['=Schedule_Tracking.F2/F2'] + [''] * 51,  # Reference to earned value
-        'Forecasted_Cost': ['=5000000/G2'] + [''] * 51,
-        'Cost_Variance': ['=E2-F2'] + [''] * 51,
-        'Notes': [''] * 52
+        'Date': dates,
+        'Week': range(1, weeks + 1),
+        'Weekly_Budget': [round(CONTRACT_VALUE / weeks, -3)] * weeks,  # ~$96k per week for $5M over 52 weeks
+        'Weekly_Actual': [''] * weeks,  # To be filled by user
+        'Cumulative_Budget': row_formulas('=N(E{p})+N(C{r})', weeks),
+        'Cumulative_Spent': row_formulas('=N(F{p})+N(D{r})', weeks),
+        # Earned value of the same week on the schedule sheet
+        'CPI': row_formulas('=IF(OR(D{r}="",N(' + schedule + '!F{r})=0,N(F{r})=0),"",' + schedule + '!F{r}/F{r})', weeks),
+        'Forecasted_Cost': row_formulas('=IF(G{r}="","",ContractValue/G{r})', weeks),
+        'Cost_Variance': row_formulas('=IF(D{r}="","",E{r}-F{r})', weeks),
+        'Notes': [''] * weeks
     }
     
     df = pd.DataFrame(cost_template)
     df.to_excel(writer, sheet_name='Cost Tracking', index=False)
 
-def create_productivity_sheet(writer):
+def create_productivity_sheet(writer, weeks=TEMPLATE_WEEKS):
     """Create productivity metrics tracking sheet"""
     
-    weeks = pd.date_range(start='2024-01-15', periods=52, freq='W')
+    dates = pd.date_range(start=TEMPLATE_START, periods=weeks, freq='W')
     
     productivity_template = {
-        'Date': weeks,
-        'Week': range(1, 53),
-        'Labor_Hours': [''] * 52,
-        'Work_Units_Completed': [''] * 52,
-        'Labor_Hours_Per_Unit': ['=C2/D2'] + [''] * 51,
-        'Equipment_Utilization_Pct': [''] * 52,
-        'Material_Waste_Pct': [''] * 52,
-        'Equipment_Downtime_Hours': [''] * 52,
-        'Rework_Hours': [''] * 52,
-        'Notes': [''] * 52
+        'Date': dates,
+        'Week': range(1, weeks + 1),
+        'Labor_Hours': [''] * weeks,
+        'Work_Units_Completed': [''] * weeks,
+        'Labor_Hours_Per_Unit': row_formulas('=IF(N(D{r})=0,"",C{r}/D{r})', weeks),
+        'Equipment_Utilization_Pct': [''] * weeks,
+        'Material_Waste_Pct': [''] * weeks,
+        'Equipment_Downtime_Hours': [''] * weeks,
+        'Rework_Hours': [''] * weeks,
+        'Notes': [''] * weeks
     }
     
     df = pd.DataFrame(productivity_template)
     df.to_excel(writer, sheet_name='Productivity Metrics', index=False)
 
-def create_safety_sheet(writer):
+def create_safety_sheet(writer, weeks=TEMPLATE_WEEKS):
     """Create safety tracking sheet"""
     
-    weeks = pd.date_range(start='2024-01-15', periods=52, freq='W')
+    dates = pd.date_range(start=TEMPLATE_START, periods=weeks, freq='W')
     
     safety_template = {
-        'Date': weeks,
-        'Week': range(1, 53),
-        'Incident_Occurred': ['No'] * 52,  # Dropdown: Yes/No
-        'Incident_Type': [''] * 52,
-        'Near_Miss_Count': [''] * 52,
-        'Safety_Training_Hours': [''] * 52,
-        'Days_Since_Last_Incident': [''] * 52,
-        'Total_Work_Hours': [''] * 52,
-        'TRIR': ['=(COUNTIF($C$2:C2,"Yes")*200000)/SUM($H$2:H2)'] + [''] * 51,
-        'Safety_Observations': [''] * 52,
-        'Corrective_Actions': [''] * 52
+        'Date': dates,
+        'Week': range(1, weeks + 1),
+        'Incident_Occurred': ['No'] * weeks,  # Dropdown: Yes/No
+        'Incident_Type': [''] * weeks,
+        'Near_Miss_Count': [''] * weeks,
+        'Safety_Training_Hours': [''] * weeks,
+        'Days_Since_Last_Incident': [''] * weeks,
+        'Total_Work_Hours': [''] * weeks,
+        # Incidents and hours to date come from the running totals in L and M
+        'TRIR': row_formulas('=IF(H{r}="","",IF(N(M{r})=0,0,L{r}*200000/M{r}))', weeks),
+        'Safety_Observations': [''] * weeks,
+        'Corrective_Actions': [''] * weeks,
+        'Incidents_To_Date': row_formulas('=N(L{p})+IF(C{r}="Yes",1,0)', weeks),
+        'Work_Hours_To_Date': row_formulas('=N(M{p})+N(H{r})', weeks)
     }
     
     df = pd.DataFrame(safety_template)
     df.to_excel(writer, sheet_name='Safety Tracking', index=False)
 
-def create_quality_sheet(writer):
+def create_quality_sheet(writer, weeks=TEMPLATE_WEEKS):
     """Create quality metrics tracking sheet"""
     
-    weeks = pd.date_range(start='2024-01-15', periods=52, freq='W')
+    dates = pd.date_range(start=TEMPLATE_START, periods=weeks, freq='W')
     
     quality_template = {
-        'Date': weeks,
-        'Week': range(1, 53),
-        'Inspections_Conducted': [''] * 52,
-        'Inspections_Passed': [''] * 52,
-        'Inspection_Pass_Rate_Pct': ['=D2/C2*100'] + [''] * 51,
-        'Punch_List_Items_Added': [''] * 52,
-        'Punch_List_Items_Closed': [''] * 52,
-        'Open_Punch_Items': [''] * 52,
-        'Rework_Cost': [''] * 52,
-        'Quality_Issues': [''] * 52,
-        'Lessons_Learned': [''] * 52
+        'Date': dates,
+        'Week': range(1, weeks + 1),
+        'Inspections_Conducted': [''] * weeks,
+        'Inspections_Passed': [''] * weeks,
+        'Inspection_Pass_Rate_Pct': row_formulas('=IF(N(C{r})=0,"",D{r}/C{r}*100)', weeks),
+        'Punch_List_Items_Added': [''] * weeks,
+        'Punch_List_Items_Closed': [''] * weeks,
+        'Open_Punch_Items': row_formulas('=N(H{p})+N(F{r})-N(G{r})', weeks),
+        'Rework_Cost': [''] * weeks,
+        'Quality_Issues': [''] * weeks,
+        'Lessons_Learned': [''] * weeks
     }
     
     df = pd.DataFrame(quality_template)
@@ -262,7 +349,7 @@ def create_cost_breakdown_sheet(writer):
         ],
         'Actual_Cost': [''] * 11,
         'Committed_Cost': [''] * 11,
-        'Cost_Variance': ['=C2-B2'] + [''] * 10,
+        'Cost_Variance': row_formulas('=IF(C{r}="","",C{r}-B{r})', 11),
         'Percent_Complete': [''] * 11,
         'Forecast_Final_Cost': [''] * 11,
         'Notes': [''] * 11
@@ -289,19 +376,20 @@ def create_kpi_dashboard_sheet(writer):
             'Labor Efficiency',
             'Equipment Utilization %'
         ],
+        # Bounded named ranges (see NAMED_COLUMNS) rather than whole columns
         'Current_Value': [
-            '=AVERAGE(Schedule_Tracking.G:G)',
-            '=AVERAGE(Cost_Tracking.G:G)',
-            '=AVERAGE(Schedule_Tracking.H:H)',
-            '=SUM(Cost_Tracking.I:I)',
-            '=MAX(Schedule_Tracking.D:D)',
-            '=MAX(Cost_Tracking.F:F)/5000000*100',
-            '=MAX(Safety_Tracking.G:G)',
-            '=MAX(Safety_Tracking.I:I)',
-            '=AVERAGE(Quality_Metrics.E:E)',
-            '=MAX(Quality_Metrics.H:H)',
-            '=AVERAGE(Productivity_Metrics.E:E)',
-            '=AVERAGE(Productivity_Metrics.F:F)'
+            '=IFERROR(AVERAGE(Schedule_SPI),"")',
+            '=IFERROR(AVERAGE(Cost_CPI),"")',
+            '=IFERROR(AVERAGE(Schedule_Days_Variance),"")',
+            '=SUM(Cost_Variance)',
+            '=MAX(Schedule_Actual_Progress)',
+            '=MAX(Cost_Cumulative_Spent)/ContractValue*100',
+            '=MAX(Safety_Days_Since_Incident)',
+            '=MAX(Safety_TRIR)',
+            '=IFERROR(AVERAGE(Quality_Pass_Rate),"")',
+            '=MAX(Quality_Open_Punch_Items)',
+            '=IFERROR(AVERAGE(Productivity_Hours_Per_Unit),"")',
+            '=IFERROR(AVERAGE(Productivity_Equipment_Utilization),"")'
         ],
         'Target_Value': [1.0, 1.0, 0, 0, 100, 100, 30, 2.0, 85, 0, 40, 75],
         'Status': [''] * 12,  # Will be calculated based on current vs target
@@ -369,37 +457,25 @@ def create_instructions_sheet(writer):
     df = pd.DataFrame(instructions)
     df.to_excel(writer, sheet_name='Instructions', index=False)
 
-def create_sample_data_excel():
-    """Create Excel file with sample data (similar to CSV data)"""
+@traced('excel.sample_data')
+def create_sample_data_excel(data_dir='data', sample_path="Construction_Project_Sample_Data.xlsx", chunksize=DEFAULT_CHUNKSIZE):
+    """Create Excel file with sample data (similar to CSV data)
+
+    The CSVs are streamed into the workbook in chunks (see xlsx_stream), so
+    histories of any length export with bounded memory; tables longer than
+    Excel's row limit continue on 'Schedule Data (2)' and so on.
+    """
     
-    # Load existing CSV data
     try:
-        schedule_df = pd.read_csv('data/schedule_data.csv')
-        cost_df = pd.read_csv('data/cost_data.csv')
-        productivity_df = pd.read_csv('data/productivity_data.csv')
-        safety_df = pd.read_csv('data/safety_data.csv')
-        quality_df = pd.read_csv('data/quality_data.csv')
-        critical_path_df = pd.read_csv('data/critical_path_tasks.csv')
-        cost_breakdown_df = pd.read_csv('data/cost_breakdown.csv')
-        
-        # Create Excel file with sample data
-        sample_path = "Construction_Project_Sample_Data.xlsx"
-        
-        with pd.ExcelWriter(sample_path, engine='openpyxl') as writer:
-            schedule_df.to_excel(writer, sheet_name='Schedule Data', index=False)
-            cost_df.to_excel(writer, sheet_name='Cost Data', index=False)
-            productivity_df.to_excel(writer, sheet_name='Productivity Data', index=False)
-            safety_df.to_excel(writer, sheet_name='Safety Data', index=False)
-            quality_df.to_excel(writer, sheet_name='Quality Data', index=False)
-            critical_path_df.to_excel(writer, sheet_name='Critical Path Tasks', index=False)
-            cost_breakdown_df.to_excel(writer, sheet_name='Cost Breakdown', index=False)
-        
-        print(f"✅ Sample data Excel file created: {sample_path}")
-        return sample_path
-        
+        sheets = csv_sheets(data_dir, SAMPLE_DATA_SHEETS)
     except FileNotFoundError:
         print("❌ CSV data files not found. Run data_generator.py first.")
         return None
+    
+    write_csv_workbook(sheets, sample_path, chunksize)
+    
+    print(f"✅ Sample data Excel file created: {sample_path}")
+    return sample_path
 
 def main():
     """Generate both template and sample Excel files"""
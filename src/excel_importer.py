@@ -0,0 +1,372 @@
+"""
+Excel round-trip importer
+Reads filled-in tracking templates (see excel_generator) in openpyxl read-only
+mode, recomputes the formula columns in vectorized form, validates the result
+against the KPI table schema and appends it to a project store
+"""
+
+import os
+import re
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import pandas as pd
+from chunked_analytics import TABLE_FILES, resolve_table_path
+from evm import DEFAULT_BUDGET_AT_COMPLETION
+from excel_templates import project_slug
+from project_store import is_project_dir, read_table
+
+# Store schema of each KPI table (column order as written by data_generator)
+STORE_COLUMNS = {
+    'schedule': ['Date', 'Week', 'Planned_Progress_Pct', 'Actual_Progress_Pct', 'Planned_Value', 'Earned_Value', 'SPI', 'Days_Variance'],
+    'cost': ['Date', 'Week', 'Weekly_Budget', 'Weekly_Actual', 'Cumulative_Budget', 'Cumulative_Spent', 'CPI', 'Forecasted_Cost', 'Cost_Variance'],
+    'productivity': ['Date', 'Week', 'Labor_Hours', 'Work_Units', 'Labor_Hours_Per_Unit', 'Equipment_Utilization_Pct', 'Material_Waste_Pct'],
+    'safety': ['Date', 'Week', 'Incident_Occurred', 'Near_Miss_Count', 'Days_Since_Last_Incident', 'TRIR'],
+    'quality': ['Date', 'Week', 'Inspections_Conducted', 'Inspections_Passed', 'Inspection_Pass_Rate_Pct', 'Punch_List_Items', 'Rework_Cost']
+}
+
+# Table -> (tracking sheet, columns the field team fills in, sheet column renames)
+# A row is imported once any of its entry columns holds a value
+TRACKING_SHEETS = {
+    'schedule': ('Schedule Tracking', ['Actual_Progress_Pct'], {}),
+    'cost': ('Cost Tracking', ['Weekly_Actual'], {}),
+    'productivity': ('Productivity Metrics', ['Labor_Hours', 'Work_Units_Completed'], {'Work_Units_Completed': 'Work_Units'}),
+    'safety': ('Safety Tracking', ['Near_Miss_Count', 'Total_Work_Hours', 'Days_Since_Last_Incident'], {}),
+    'quality': ('Quality Metrics', ['Inspections_Conducted', 'Inspections_Passed', 'Rework_Cost'], {'Punch_List_Items_Added': 'Punch_List_Items'})
+}
+
+# Columns the template fills with formulas; they are always recomputed here
+FORMULA_COLUMNS = {
+    'schedule': ['Earned_Value', 'SPI', 'Days_Variance'],
+    'cost': ['Cumulative_Budget', 'Cumulative_Spent', 'CPI', 'Forecasted_Cost', 'Cost_Variance'],
+    'productivity': ['Labor_Hours_Per_Unit'],
+    'safety': ['TRIR'],
+    'quality': ['Inspection_Pass_Rate_Pct']
+}
+
+# Entered columns that must be numbers within [low, high]
+NUMERIC_RANGES = {
+    'schedule': {'Week': (1, None), 'Planned_Progress_Pct': (0, 100), 'Actual_Progress_Pct': (0, 100), 'Planned_Value': (0, None)},
+    'cost': {'Week': (1, None), 'Weekly_Budget': (0, None), 'Weekly_Actual': (0, None)},
+    'productivity': {'Week': (1, None), 'Labor_Hours': (0, None), 'Work_Units': (0, None),
+                     'Equipment_Utilization_Pct': (0, 100), 'Material_Waste_Pct': (0, 100)},
+    'safety': {'Week': (1, None), 'Near_Miss_Count': (0, None), 'Days_Since_Last_Incident': (0, None), 'Total_Work_Hours': (0, None)},
+    'quality': {'Week': (1, None), 'Inspections_Conducted': (0, None), 'Inspections_Passed': (0, None),
+                'Punch_List_Items': (0, None), 'Rework_Cost': (0, None)}
+}
+
+# Relative difference above which a cached formula value is reported as stale
+FORMULA_TOLERANCE = 0.005
+
+YES_VALUES = {'yes', 'y', 'true', '1'}
+NO_VALUES = {'no', 'n', 'false', '0', ''}
+
+def _read_sheet(workbook, sheet_name):
+    """Read a sheet with openpyxl's streaming reader into a DataFrame of raw cell values"""
+
+    if sheet_name not in workbook.sheetnames:
+        return None
+    rows = workbook[sheet_name].iter_rows(values_only=True)
+    header = next(rows, None)
+    if header is None:
+        return pd.DataFrame()
+    columns = [str(name) if name is not None else f'Column_{i + 1}' for i, name in enumerate(header)]
+    df = pd.DataFrame.from_records(list(rows), columns=columns)
+    df.index = df.index + 2  # Excel row numbers, for error messages
+    return df
+
+def _read_project_overview(workbook):
+    """Project name and contract value (budget at completion) from the Project Overview sheet"""
+
+    name = None
+    contract_value = None
+    if 'Project Overview' in workbook.sheetnames:
+        for row in workbook['Project Overview'].iter_rows(values_only=True):
+            if not row or row[0] is None:
+                continue
+            label = str(row[0]).strip()
+            value = row[1] if len(row) > 1 else None
+            if label == 'Project Name' and value:
+                name = str(value).strip()
+            elif label == 'Contract Value' and value is not None:
+                try:
+                    contract_value = float(re.sub(r'[^0-9.\-]', '', str(value)))
+                except ValueError:
+                    contract_value = None
+    return name, contract_value
+
+def _is_blank(series):
+    return series.isna() | (series.astype(str).str.strip() == '')
+
+def _to_numbers(df, columns, errors, sheet_name):
+    """Coerce columns to floats, recording cells that hold something else"""
+
+    for column in columns:
+        if column not in df.columns:
+            continue
+        raw = df[column]
+        numbers = pd.to_numeric(raw.where(~_is_blank(raw)), errors='coerce')
+        bad = numbers.isna() & ~_is_blank(raw) & ~raw.astype(str).str.startswith('=')
+        if bad.any():
+            rows = ', '.join(str(row) for row in bad[bad].index[:5])
+            errors.append(f"{sheet_name}: non-numeric {column} in row(s) {rows}")
+        df[column] = numbers.astype(float)
+    return df
+
+def _check_ranges(df, table, errors, sheet_name):
+    for column, (low, high) in NUMERIC_RANGES[table].items():
+        if column not in df.columns:
+            continue
+        values = df[column]
+        out = (values < low) if low is not None else pd.Series(False, index=values.index)
+        if high is not None:
+            out |= values > high
+        if out.any():
+            rows = ', '.join(str(row) for row in out[out].index[:5])
+            errors.append(f"{sheet_name}: {column} outside [{low}, {high if high is not None else '∞'}] in row(s) {rows}")
+
+def _safe_ratio(numerator, denominator, fallback=np.nan):
+    numerator = np.asarray(numerator, dtype=float)
+    denominator = np.asarray(denominator, dtype=float)
+    out = np.full(numerator.shape, fallback, dtype=float)
+    np.divide(numerator, denominator, out=out, where=denominator > 0)
+    return out
+
+def _recompute(tables, bac):
+    """Recompute every formula column from the entered columns, in place"""
+
+    schedule = tables.get('schedule')
+    if schedule is not None:
+        # =Actual% * contract value / 100, =EV/PV, =(Actual% - Planned%) * 365 / 100
+        schedule['Earned_Value'] = schedule['Actual_Progress_Pct'] * bac / 100
+        schedule['SPI'] = _safe_ratio(schedule['Earned_Value'], schedule['Planned_Value'], 1.0)
+        schedule['Days_Variance'] = (schedule['Actual_Progress_Pct'] - schedule['Planned_Progress_Pct']) * 365 / 100
+
+    cost = tables.get('cost')
+    if cost is not None:
+        cost['Cumulative_Budget'] = cost['Weekly_Budget'].fillna(0).cumsum()
+        cost['Cumulative_Spent'] = cost['Weekly_Actual'].fillna(0).cumsum()
+        earned_value = cost['Date'].map(schedule.set_index('Date')['Earned_Value']) if schedule is not None else pd.Series(np.nan, index=cost.index)
+        cpi = _safe_ratio(earned_value, cost['Cumulative_Spent'], 1.0)
+        cost['CPI'] = np.where(earned_value.isna(), 1.0, cpi)
+        cost['Forecasted_Cost'] = _safe_ratio(np.full(len(cost), bac), cost['CPI'], bac)
+        cost['Cost_Variance'] = cost['Cumulative_Budget'] - cost['Cumulative_Spent']
+
+    productivity = tables.get('productivity')
+    if productivity is not None:
+        productivity['Labor_Hours_Per_Unit'] = _safe_ratio(productivity['Labor_Hours'], productivity['Work_Units'])
+
+    safety = tables.get('safety')
+    if safety is not None:
+        hours = safety.get('Total_Work_Hours', pd.Series(np.nan, index=safety.index))
+        if productivity is not None:
+            hours = hours.fillna(safety['Date'].map(productivity.set_index('Date')['Labor_Hours']))
+        incidents = safety['Incident_Occurred'].astype(int).cumsum()
+        safety['TRIR'] = _safe_ratio(incidents * 200000, hours.fillna(0).cumsum(), 0.0)
+
+        # Days since the last incident where the team left it blank
+        incident_dates = safety['Date'].where(safety['Incident_Occurred']).ffill()
+        since_start = (safety['Date'] - safety['Date'].iloc[0]).dt.days if len(safety) else safety['Date']
+        derived = (safety['Date'] - incident_dates).dt.days.fillna(since_start)
+        safety['Days_Since_Last_Incident'] = safety['Days_Since_Last_Incident'].fillna(derived)
+
+    quality = tables.get('quality')
+    if quality is not None:
+        quality['Inspection_Pass_Rate_Pct'] = _safe_ratio(quality['Inspections_Passed'] * 100, quality['Inspections_Conducted'])
+
+    return tables
+
+# Count columns stored as integers
+INTEGER_COLUMNS = ['Week', 'Near_Miss_Count', 'Days_Since_Last_Incident', 'Inspections_Conducted', 'Inspections_Passed', 'Punch_List_Items']
+
+def _store_types(df):
+    """Round and cast columns the way data_generator writes them"""
+
+    decimals = {
+        'Planned_Progress_Pct': 2, 'Actual_Progress_Pct': 2, 'Planned_Value': 2, 'Earned_Value': 2, 'SPI': 3, 'Days_Variance': 1,
+        'Weekly_Budget': 2, 'Weekly_Actual': 2, 'Cumulative_Budget': 2, 'Cumulative_Spent': 2, 'CPI': 3, 'Forecasted_Cost': 2, 'Cost_Variance': 2,
+        'Labor_Hours_Per_Unit': 2, 'TRIR': 2, 'Inspection_Pass_Rate_Pct': 1, 'Rework_Cost': 2
+    }
+    df = df.round({column: places for column, places in decimals.items() if column in df.columns})
+    return df.astype({column: 'Int64' for column in INTEGER_COLUMNS if column in df.columns})
+
+def parse_workbook(path, project=None):
+    """Parse one filled-in template
+
+    Returns a dict with 'path', 'project', 'tables' (table name -> DataFrame in
+    the store schema), 'errors' (the workbook must not be imported) and
+    'warnings' (stale cached formula values and similar).
+    """
+
+    from openpyxl import load_workbook
+
+    result = {'path': path, 'project': project, 'tables': {}, 'errors': [], 'warnings': []}
+    try:
+        workbook = load_workbook(path, read_only=True, data_only=True)
+    except Exception as e:
+        result['errors'].append(f"Cannot open workbook: {e}")
+        return result
+
+    try:
+        name, contract_value = _read_project_overview(workbook)
+        if result['project'] is None:
+            result['project'] = project_slug(name) if name else os.path.splitext(os.path.basename(path))[0]
+        bac = contract_value or DEFAULT_BUDGET_AT_COMPLETION
+
+        raw_tables = {}
+        cached = {}
+        for table, (sheet_name, entry_columns, renames) in TRACKING_SHEETS.items():
+            df = _read_sheet(workbook, sheet_name)
+            if df is None:
+                result['errors'].append(f"Missing sheet '{sheet_name}'")
+                continue
+            missing = [column for column in ['Date', 'Week'] + entry_columns if column not in df.columns]
+            if missing:
+                result['errors'].append(f"{sheet_name}: missing column(s) {', '.join(missing)}")
+                continue
+
+            present = [column for column in entry_columns if column in df.columns]
+            filled = ~pd.concat([_is_blank(df[column]) for column in present], axis=1).all(axis=1)
+            df = df.loc[filled].rename(columns=renames)
+
+            dates = pd.to_datetime(df['Date'], errors='coerce')
+            if dates.isna().any():
+                rows = ', '.join(str(row) for row in dates[dates.isna()].index[:5])
+                result['errors'].append(f"{sheet_name}: invalid Date in row(s) {rows}")
+            df['Date'] = dates
+
+            if table == 'safety':
+                flags = df['Incident_Occurred'].map(lambda value: '' if value is None else str(value).strip().lower())
+                invalid = ~flags.isin(YES_VALUES | NO_VALUES)
+                if invalid.any():
+                    rows = ', '.join(str(row) for row in invalid[invalid].index[:5])
+                    result['errors'].append(f"{sheet_name}: Incident_Occurred must be Yes or No in row(s) {rows}")
+                df['Incident_Occurred'] = flags.isin(YES_VALUES)
+
+            numeric = [column for column in df.columns if column in NUMERIC_RANGES[table] or column in FORMULA_COLUMNS[table]]
+            numeric += [column for column in ('Total_Work_Hours',) if column in df.columns and column not in numeric]
+            df = _to_numbers(df, numeric, result['errors'], sheet_name)
+            _check_ranges(df, table, result['errors'], sheet_name)
+
+            if table == 'safety':
+                df['Near_Miss_Count'] = df['Near_Miss_Count'].fillna(0)
+            if table == 'quality':
+                over = df['Inspections_Passed'] > df['Inspections_Conducted']
+                if over.any():
+                    rows = ', '.join(str(row) for row in over[over].index[:5])
+                    result['errors'].append(f"{sheet_name}: more inspections passed than conducted in row(s) {rows}")
+
+            duplicated = df['Date'].notna() & df['Date'].duplicated(keep=False)
+            if duplicated.any():
+                rows = ', '.join(str(row) for row in duplicated[duplicated].index[:5])
+                result['errors'].append(f"{sheet_name}: duplicate Date in row(s) {rows}")
+            df = df.sort_values('Date').reset_index(drop=True)
+            cached[table] = df[[column for column in FORMULA_COLUMNS[table] if column in df.columns]].copy()
+            raw_tables[table] = df
+    finally:
+        workbook.close()
+
+    if result['errors']:
+        return result
+
+    tables = _recompute(raw_tables, bac)
+    for table, df in tables.items():
+        # Cached values are what Excel last calculated; report where they disagree
+        for column in cached[table].columns:
+            stored = cached[table][column]
+            known = stored.notna()
+            if not known.any():
+                continue
+            difference = (df.loc[known, column] - stored[known]).abs()
+            stale = difference > FORMULA_TOLERANCE * np.maximum(1.0, stored[known].abs())
+            if stale.any():
+                result['warnings'].append(
+                    f"{TRACKING_SHEETS[table][0]}: cached {column} differs from the recomputed value in {int(stale.sum())} row(s); recomputed values used"
+                )
+        for column in STORE_COLUMNS[table]:
+            if column not in df.columns:
+                df[column] = np.nan
+        result['tables'][table] = _store_types(df[STORE_COLUMNS[table]].round({column: 0 for column in INTEGER_COLUMNS if column in df.columns}))
+
+    if len(tables.get('schedule', [])) and not tables['schedule']['Actual_Progress_Pct'].is_monotonic_increasing:
+        result['warnings'].append("Schedule Tracking: Actual_Progress_Pct decreases between weeks")
+
+    return result
+
+def append_to_store(project_dir, tables):
+    """Append imported rows to a project's tables, replacing rows with the same Date
+
+    Existing Parquet tables stay Parquet; new tables are written as CSV.
+    Returns the number of rows written per table.
+    """
+
+    os.makedirs(project_dir, exist_ok=True)
+    written = {}
+    for table, df in tables.items():
+        if len(df) == 0:
+            continue
+        try:
+            path = resolve_table_path(project_dir, table)
+            existing = read_table(path)
+        except FileNotFoundError:
+            path = os.path.join(project_dir, TABLE_FILES[table] + '.csv')
+            existing = None
+
+        combined = df if existing is None else pd.concat([existing, df], ignore_index=True)
+        combined = combined.drop_duplicates(subset='Date', keep='last').sort_values('Date').reset_index(drop=True)
+        if path.endswith('.parquet'):
+            combined.to_parquet(path, index=False)
+        else:
+            combined.to_csv(path, index=False, date_format='%Y-%m-%d')
+        written[table] = len(df)
+    return written
+
+def _parse_job(job):
+    path, project = job
+    return parse_workbook(path, project)
+
+def import_workbooks(paths, store_dir, project=None, workers=None, prewarm=True, log=sys.stderr):
+    """Parse many workbooks in parallel and append the valid ones to the store
+
+    Each workbook goes to `store_dir/<project>` (the project name from its
+    Project Overview sheet, unless `project` is given), or straight into
+    `store_dir` when that already is a project directory. With `prewarm`, the
+    dashboard's first paint of every updated project is rebuilt. Returns the
+    parse results.
+    """
+
+    start = time.perf_counter()
+    jobs = [(path, project) for path in paths]
+    workers = min(workers or os.cpu_count() or 1, max(len(jobs), 1))
+    if workers == 1:
+        results = [_parse_job(job) for job in jobs]
+    else:
+        chunksize = max(1, len(jobs) // (workers * 4))
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(_parse_job, jobs, chunksize=chunksize))
+    parse_seconds = time.perf_counter() - start
+
+    single_project = is_project_dir(store_dir)
+    imported = 0
+    updated_dirs = set()
+    for result in results:
+        for warning in result['warnings']:
+            print(f"⚠️ {result['path']}: {warning}", file=log)
+        if result['errors']:
+            for error in result['errors']:
+                print(f"❌ {result['path']}: {error}", file=log)
+            continue
+        project_dir = store_dir if single_project else os.path.join(store_dir, result['project'])
+        written = append_to_store(project_dir, result['tables'])
+        result['written'] = written
+        updated_dirs.add(project_dir)
+        imported += 1
+
+    print(f"✅ Imported {imported} of {len(results)} workbooks into {store_dir} "
+          f"(parsed in {parse_seconds:.2f}s with {workers} workers)", file=log)
+
+    if prewarm and updated_dirs:
+        from prewarm import prewarm as prewarm_first_paint
+        prewarm_first_paint(sorted(updated_dirs), workers=workers, log=log)
+    return results
@@ -0,0 +1,188 @@
+"""
+Per-project Excel templates from a cached workbook skeleton
+Builds the blank template once per row count, then writes each project's copy
+by patching only its settings, dates and budget cells in the sheet XML
+"""
+
+import io
+import os
+import re
+import time
+import zipfile
+from datetime import datetime
+from functools import lru_cache
+from xml.etree import ElementTree
+from xml.sax.saxutils import escape
+import pandas as pd
+from excel_generator import OVERVIEW_FIELDS, TEMPLATE_WEEKS, overview_row, write_template
+from tracing import traced
+
+_MAIN_NS = '{http://schemas.openxmlformats.org/spreadsheetml/2006/main}'
+_REL_NS = '{http://schemas.openxmlformats.org/officeDocument/2006/relationships}'
+_PKG_REL_NS = '{http://schemas.openxmlformats.org/package/2006/relationships}'
+
+_CELL = re.compile(r'<c r="([A-Z]+[0-9]+)"([^>]*?)(?:/>|>.*?</c>)', re.DOTALL)
+_TYPE_ATTR = re.compile(r'\s+t="[^"]*"')
+_EXCEL_EPOCH = pd.Timestamp('1899-12-30')
+
+# Tracking sheets whose Date column follows the project start date
+DATED_SHEETS = ['Schedule Tracking', 'Cost Tracking', 'Productivity Metrics', 'Safety Tracking', 'Quality Metrics']
+
+def project_slug(name):
+    """File- and directory-safe project id from a project name"""
+    return re.sub(r'[^A-Za-z0-9_-]+', '-', str(name)).strip('-')
+
+def _sheet_parts(files):
+    """Sheet name -> worksheet part path inside the package"""
+
+    workbook = ElementTree.fromstring(files['xl/workbook.xml'])
+    rels = ElementTree.fromstring(files['xl/_rels/workbook.xml.rels'])
+    targets = {rel.get('Id'): rel.get('Target') for rel in rels.iter(f'{_PKG_REL_NS}Relationship')}
+    parts = {}
+    for sheet in workbook.iter(f'{_MAIN_NS}sheet'):
+        target = targets[sheet.get(f'{_REL_NS}id')]
+        parts[sheet.get('name')] = target.lstrip('/') if target.startswith('/') else 'xl/' + target
+    return parts
+
+def cell_index(xml):
+    """Cell reference -> (start, end, attributes) of each cell element in a worksheet's XML"""
+    return {match.group(1): (match.start(), match.end(), match.group(2)) for match in _CELL.finditer(xml)}
+
+@lru_cache(maxsize=8)
+def template_skeleton(weeks=TEMPLATE_WEEKS):
+    """The blank template, built once per row count
+
+    Returns (compressed package of the parts every project shares, sheet name
+    -> part path, part path -> (sheet XML, cell index) of the sheets projects
+    patch).
+    """
+
+    buffer = io.BytesIO()
+    write_template(buffer, weeks)
+    with zipfile.ZipFile(io.BytesIO(buffer.getvalue())) as package:
+        files = {info.filename: package.read(info) for info in package.infolist()}
+    sheet_parts = _sheet_parts(files)
+    sheets = {}
+    for sheet_name in ['Project Overview'] + DATED_SHEETS:
+        xml = files[sheet_parts[sheet_name]].decode('utf-8')
+        sheets[sheet_parts[sheet_name]] = (xml, cell_index(xml))
+
+    shared = io.BytesIO()
+    with zipfile.ZipFile(shared, 'w', zipfile.ZIP_DEFLATED) as package:
+        for name, data in files.items():
+            if name not in sheets:
+                package.writestr(name, data)
+    return shared.getvalue(), sheet_parts, sheets
+
+def _cell_xml(ref, attributes, value):
+    """XML of one cell keeping its style (dates are passed as Excel serial numbers)"""
+
+    attributes = _TYPE_ATTR.sub('', attributes)
+    if isinstance(value, (int, float)):
+        return f'<c r="{ref}"{attributes} t="n"><v>{value}</v></c>'
+    return f'<c r="{ref}"{attributes} t="inlineStr"><is><t>{escape(str(value))}</t></is></c>'
+
+def patch_sheet(xml, index, cells):
+    """Replace the given cells ({ref: value}) of a worksheet's XML
+
+    Only the patched cells are touched: the XML between them is copied as
+    slices using the skeleton's cell index.
+    """
+
+    pieces = []
+    position = 0
+    for start, end, attributes, ref in sorted((*index[ref], ref) for ref in cells if ref in index):
+        pieces.append(xml[position:start])
+        pieces.append(_cell_xml(ref, attributes, cells[ref]))
+        position = end
+    pieces.append(xml[position:])
+    return ''.join(pieces)
+
+def _contract_value(value):
+    if isinstance(value, (int, float)):
+        return float(value)
+    return float(re.sub(r'[^0-9.\-]', '', str(value)))
+
+def project_cells(settings, weeks=TEMPLATE_WEEKS):
+    """Cells to patch per sheet for one project's settings
+
+    `settings` maps Project Overview labels ('Project Name', 'Contract Value',
+    'Project Start Date', ...) to values; missing settings keep the template
+    defaults.
+    """
+
+    overview = {}
+    for field in OVERVIEW_FIELDS:
+        value = settings.get(field)
+        if value is None or (isinstance(value, float) and pd.isna(value)):
+            continue
+        overview[f'B{overview_row(field)}'] = _contract_value(value) if field == 'Contract Value' else str(value)
+    overview[f"B{overview_row('Current Date')}"] = datetime.now().strftime('%Y-%m-%d')
+    cells = {'Project Overview': overview}
+
+    start = settings.get('Project Start Date')
+    if start is not None and not pd.isna(start):
+        dates = pd.date_range(start=pd.Timestamp(start), periods=weeks, freq='W')
+        serials = ((dates - _EXCEL_EPOCH).days).tolist()
+        for sheet_name in DATED_SHEETS:
+            cells[sheet_name] = {f'A{row}': serial for row, serial in enumerate(serials, start=2)}
+
+    contract = settings.get('Contract Value')
+    if contract is not None and not pd.isna(contract):
+        contract = _contract_value(contract)
+        schedule = cells.setdefault('Schedule Tracking', {})
+        cost = cells.setdefault('Cost Tracking', {})
+        weekly_budget = round(contract / weeks, -3)
+        for week in range(1, weeks + 1):
+            schedule[f'E{week + 1}'] = week * contract / weeks
+            cost[f'C{week + 1}'] = weekly_budget
+
+    return cells
+
+def write_project_template(path, settings, weeks=TEMPLATE_WEEKS):
+    """Write one project's template by patching the cached skeleton"""
+
+    shared, sheet_parts, sheets = template_skeleton(weeks)
+    cells = project_cells(settings, weeks)
+
+    # Shared parts are copied already compressed; only the patchable sheets are added
+    with open(path, 'wb') as stream:
+        stream.write(shared)
+    with zipfile.ZipFile(path, 'a', zipfile.ZIP_DEFLATED) as package:
+        for sheet_name in ['Project Overview'] + DATED_SHEETS:
+            part = sheet_parts[sheet_name]
+            xml, index = sheets[part]
+            package.writestr(part, patch_sheet(xml, index, cells[sheet_name]) if sheet_name in cells else xml)
+    return path
+
+def read_project_settings(path):
+    """Project settings from a CSV with one row per project and Project Overview labels as columns"""
+    settings = pd.read_csv(path, dtype=str, keep_default_na=False)
+    return [{field: value for field, value in row.items() if value != ''} for row in settings.to_dict('records')]
+
+@traced('excel.project_templates')
+def create_project_templates(projects, output_dir='.', weeks=TEMPLATE_WEEKS):
+    """Write one template per project settings dict; returns the file paths
+
+    Projects whose names give the same slug (compared case-insensitively, as
+    on Windows and macOS) get a -2, -3, ... suffix instead of overwriting
+    each other's workbook.
+    """
+
+    start = time.perf_counter()
+    os.makedirs(output_dir, exist_ok=True)
+    paths = []
+    used = set()
+    for index, settings in enumerate(projects, start=1):
+        slug = project_slug(settings.get('Project Name') or f'Project-{index}')
+        name, suffix = slug, 2
+        while name.lower() in used:
+            name, suffix = f"{slug}-{suffix}", suffix + 1
+        if name != slug:
+            print(f"⚠️ Project {index} has the same file name as an earlier project; writing it as {name}")
+        used.add(name.lower())
+        path = os.path.join(output_dir, f"{name}_Dashboard_Template.xlsx")
+        paths.append(write_project_template(path, settings, weeks))
+
+    print(f"✅ {len(paths)} project templates written to {output_dir} in {time.perf_counter() - start:.1f}s")
+    return paths
@@ -0,0 +1,315 @@
+"""
+Figure and KPI card builders for the dashboard's overview charts
+Plain plotly with no Streamlit calls, so the same figures can be built at ingest
+time (see prewarm.py) and rendered later by the dashboard
+"""
+
+import plotly.express as px
+import plotly.graph_objects as go
+from risk_scanner import RISK_RULES, latest_pass_rate
+
+def kpi_cards(schedule_df, cost_df, safety_df, quality_df):
+    """KPI card columns as lists of (label, value text, status class); None without data"""
+
+    if len(schedule_df) == 0:
+        return None
+
+    # Get latest data
+    latest_schedule = schedule_df.iloc[-1]
+    latest_cost = cost_df.iloc[-1]
+    latest_safety = safety_df.iloc[-1]
+    latest_quality = quality_df.iloc[-1]
+    pass_rate = latest_pass_rate(quality_df)
+
+    return [
+        [
+            ("Schedule Performance Index (SPI)", f"{latest_schedule['SPI']:.3f}",
+             "status-good" if latest_schedule['SPI'] >= 1.0 else "status-danger"),
+            ("Days Ahead/Behind Schedule", f"{latest_schedule['Days_Variance']:+.1f}",
+             "status-good" if latest_schedule['Days_Variance'] >= 0 else "status-danger")
+        ],
+        [
+            ("Cost Performance Index (CPI)", f"{latest_cost['CPI']:.3f}",
+             "status-good" if latest_cost['CPI'] >= 1.0 else "status-danger"),
+            ("Cost Variance", f"${latest_cost['Cost_Variance']:,.0f}",
+             "status-good" if latest_cost['Cost_Variance'] >= 0 else "status-danger")
+        ],
+        [
+            ("Days Since Last Incident", f"{latest_safety['Days_Since_Last_Incident']}",
+             "status-good" if latest_safety['Days_Since_Last_Incident'] > 30 else "status-warning"),
+            ("Total Recordable Incident Rate", f"{latest_safety['TRIR']:.2f}",
+             "status-good" if latest_safety['TRIR'] <= 2.0 else "status-danger")
+        ],
+        [
+            ("Inspection Pass Rate", f"{pass_rate:.1f}%",
+             "status-good" if pass_rate >= 85 else "status-warning"),
+            ("Open Punch List Items", f"{latest_quality['Punch_List_Items']}", "")
+        ]
+    ]
+
+def risk_history_figure(history):
+    """Heatmap of when each risk rule was active"""
+
+    labels = [RISK_RULES[rule][1] for rule in history.columns]
+    fig = go.Figure(go.Heatmap(
+        x=history.index,
+        y=labels,
+        z=history.T.astype(int).values,
+        colorscale=[[0, '#d4edda'], [1, '#dc3545']],
+        zmin=0,
+        zmax=1,
+        showscale=False,
+        xgap=1,
+        ygap=2
+    ))
+    fig.update_layout(
+        height=60 + 35 * len(labels),
+        margin=dict(l=10, r=10, t=10, b=10),
+        xaxis_title="Date"
+    )
+    return fig
+
+def risk_event_rows(events):
+    """Risk onset/resolution table as shown under the heatmap"""
+    events = events.assign(
+        Onset=events['Onset'].dt.strftime('%Y-%m-%d'),
+        Resolved=events['Resolved'].dt.strftime('%Y-%m-%d').fillna('Active')
+    )
+    return events[['Risk', 'Onset', 'Resolved', 'Periods']]
+
+def schedule_figures(schedule_df):
+    """Planned vs actual progress and SPI trend figures"""
+
+    # Progress tracking chart
+    progress = go.Figure()
+    progress.add_trace(go.Scatter(
+        x=schedule_df['Date'],
+        y=schedule_df['Planned_Progress_Pct'],
+        mode='lines',
+        name='Planned Progress',
+        line=dict(color='blue', width=3)
+    ))
+    progress.add_trace(go.Scatter(
+        x=schedule_df['Date'],
+        y=schedule_df['Actual_Progress_Pct'],
+        mode='lines',
+        name='Actual Progress',
+        line=dict(color='red', width=3)
+    ))
+    progress.update_layout(
+        title="Planned vs Actual Progress",
+        xaxis_title="Date",
+        yaxis_title="Progress (%)",
+        hovermode='x unified'
+    )
+
+    # SPI trend chart
+    spi = go.Figure()
+    spi.add_trace(go.Scatter(
+        x=schedule_df['Date'],
+        y=schedule_df['SPI'],
+        mode='lines+markers',
+        name='SPI',
+        line=dict(color='green', width=3)
+    ))
+    spi.add_hline(y=1.0, line_dash="dash", line_color="black",
+                  annotation_text="Target SPI = 1.0")
+    spi.update_layout(
+        title="Schedule Performance Index (SPI) Trend",
+        xaxis_title="Date",
+        yaxis_title="SPI",
+        hovermode='x unified'
+    )
+    return progress, spi
+
+def cost_figures(cost_df):
+    """Budget vs actual spending and CPI trend figures"""
+
+    # Budget vs Actual spending
+    spending = go.Figure()
+    spending.add_trace(go.Scatter(
+        x=cost_df['Date'],
+        y=cost_df['Cumulative_Budget'],
+        mode='lines',
+        name='Budget',
+        line=dict(color='blue', width=3)
+    ))
+    spending.add_trace(go.Scatter(
+        x=cost_df['Date'],
+        y=cost_df['Cumulative_Spent'],
+        mode='lines',
+        name='Actual Spent',
+        line=dict(color='red', width=3)
+    ))
+    spending.update_layout(
+        title="Budget vs Actual Spending",
+        xaxis_title="Date",
+        yaxis_title="Cost ($)",
+        hovermode='x unified'
+    )
+
+    # CPI trend
+    cpi = go.Figure()
+    cpi.add_trace(go.Scatter(
+        x=cost_df['Date'],
+        y=cost_df['CPI'],
+        mode='lines+markers',
+        name='CPI',
+        line=dict(color='purple', width=3)
+    ))
+    cpi.add_hline(y=1.0, line_dash="dash", line_color="black",
+                  annotation_text="Target CPI = 1.0")
+    cpi.update_layout(
+        title="Cost Performance Index (CPI) Trend",
+        xaxis_title="Date",
+        yaxis_title="CPI",
+        hovermode='x unified'
+    )
+    return spending, cpi
+
+def evm_figures(evm_df):
+    """Performance index and estimate at completion trend figures from the per-week EVM series"""
+
+    # Performance indices
+    indices = go.Figure()
+    for metric, color in [('SPI', 'green'), ('CPI', 'purple'), ('TCPI', 'orange')]:
+        indices.add_trace(go.Scatter(
+            x=evm_df['Date'],
+            y=evm_df[metric],
+            mode='lines',
+            name=metric,
+            line=dict(color=color, width=2)
+        ))
+    indices.add_trace(go.Scatter(
+        x=evm_df['Date'],
+        y=evm_df['CPI_Rolling'],
+        mode='lines',
+        name='CPI (4-week avg)',
+        line=dict(color='purple', width=2, dash='dot')
+    ))
+    indices.add_hline(y=1.0, line_dash="dash", line_color="black")
+    indices.update_layout(
+        title="Performance Indices by Week",
+        xaxis_title="Date",
+        yaxis_title="Index",
+        hovermode='x unified'
+    )
+
+    # Estimate at completion
+    eac = go.Figure()
+    eac.add_trace(go.Scatter(
+        x=evm_df['Date'],
+        y=evm_df['EAC'],
+        mode='lines+markers',
+        name='Estimate at Completion',
+        line=dict(color='red', width=3)
+    ))
+    eac.add_hline(y=5000000, line_dash="dash", line_color="blue",
+                  annotation_text="Budget at Completion")
+    eac.update_layout(
+        title="Estimate at Completion (EAC) Trend",
+        xaxis_title="Date",
+        yaxis_title="Cost ($)",
+        hovermode='x unified'
+    )
+    return indices, eac
+
+def cost_breakdown_figure(cost_breakdown_df):
+    """Budget vs actual by cost category"""
+
+    fig = px.bar(
+        cost_breakdown_df,
+        x='Category',
+        y=['Budget', 'Actual'],
+        title="Budget vs Actual by Category",
+        barmode='group',
+        color_discrete_map={'Budget': 'lightblue', 'Actual': 'darkblue'}
+    )
+    fig.update_layout(xaxis_tickangle=-45)
+    return fig
+
+def cost_code_figure(rollup_df, title="Budget vs Actual by Category"):
+    """Budget vs actual of cost codes from a CostHierarchy rollup"""
+
+    fig = px.bar(
+        rollup_df,
+        x='Description',
+        y=['Budget', 'Actual'],
+        title=title,
+        barmode='group',
+        color_discrete_map={'Budget': 'lightblue', 'Actual': 'darkblue'},
+        hover_data={'Code': True, 'Committed': ':,.0f', 'Variance': ':,.0f'}
+    )
+    fig.update_layout(xaxis_tickangle=-45, xaxis_title=None)
+    return fig
+
+def cost_drilldown(hierarchy, path):
+    """(figure, breadcrumb, drill options) for the cost code at the end of `path` (top level when empty)
+
+    Drill options map the child codes that have sub-codes to their labels.
+    """
+
+    code = path[-1] if path else None
+    rollup = hierarchy.drilldown(code)
+    title = "Budget vs Actual by Category" if code is None else f"Budget vs Actual: {hierarchy.label(code)}"
+    breadcrumb = " › ".join(["All categories"] + [hierarchy.label(ancestor) for ancestor in path])
+    options = {row.Code: f"{row.Code} {row.Description}" for row in rollup[rollup['Has_Children']].itertuples()}
+    return cost_code_figure(rollup, title), breadcrumb, options
+
+def fleet_utilization_figure(fleet_df):
+    """Daily fleet utilization and idle ratio from telematics"""
+
+    fig = go.Figure()
+    fig.add_trace(go.Scatter(
+        x=fleet_df['Date'],
+        y=fleet_df['Utilization_Pct'],
+        mode='lines+markers',
+        name='Utilization',
+        line=dict(color='orange', width=2)
+    ))
+    fig.add_trace(go.Scatter(
+        x=fleet_df['Date'],
+        y=fleet_df['Idle_Ratio_Pct'],
+        mode='lines',
+        name='Idle Ratio',
+        line=dict(color='gray', width=2, dash='dot')
+    ))
+    fig.add_hline(y=80, line_dash="dash", line_color="green",
+                  annotation_text="Target: 80%")
+    fig.update_layout(
+        title="Fleet Utilization and Idle Ratio (%)",
+        xaxis_title="Date",
+        yaxis_title="%",
+        hovermode='x unified'
+    )
+    return fig
+
+def machine_utilization_figure(machine_df):
+    """Utilization by machine, colored by idle ratio"""
+
+    fig = px.bar(
+        machine_df,
+        x='Machine',
+        y='Utilization_Pct',
+        color='Idle_Ratio_Pct',
+        color_continuous_scale='OrRd',
+        title="Utilization by Machine (%)",
+        hover_data={'Engine_Hours': ':,.1f', 'Idle_Hours': ':,.1f', 'Days': True}
+    )
+    fig.update_layout(xaxis_tickangle=-45, xaxis_title=None, yaxis_title="Utilization (%)",
+                      coloraxis_colorbar=dict(title="Idle %"))
+    return fig
+
+def crew_productivity_figure(crew_df, code):
+    """Weekly labor hours per unit of each crew on one activity"""
+
+    fig = px.line(
+        crew_df.sort_values('Date'),
+        x='Date',
+        y='Hours_Per_Unit',
+        color='Crew',
+        title=f"Labor Hours per Unit by Crew: {code}",
+        markers=True
+    )
+    fig.update_layout(xaxis_title="Week", yaxis_title="Hours per Unit", hovermode='x unified')
+    return fig
@@ -0,0 +1,246 @@
+"""
+Completion forecasting from the progress curve
+Fits logistic and Weibull S-curves (closed-form weighted least squares on the
+linearized curve) and a robust Theil-Sen trend over recent periods, batched across projects
+"""
+
+import numpy as np
+import pandas as pd
+
+DEFAULT_PLANNED_COMPLETION = '2024-12-20'
+
+# Progress (%) at which a project counts as complete for forecasting purposes
+COMPLETION_PCT = 99.0
+
+# Recent periods used by the robust linear trend
+TREND_PERIODS = 8
+
+# Two-sided 90% normal quantile for the confidence band
+BAND_Z = 1.645
+
+# Forecasts further than this from the latest report are treated as "cannot predict"
+MAX_HORIZON_DAYS = 3650
+
+MODELS = ['logistic', 'weibull', 'linear']
+
+def _logit(fraction):
+    return np.log(fraction / (1 - fraction))
+
+def _cloglog(fraction):
+    return np.log(-np.log(1 - fraction))
+
+def _weighted_line(x, y, weights):
+    """Row-wise weighted least squares y = a + b x; invalid points carry zero weight
+
+    Returns intercept, slope, residual variance (unit weight), weight sum,
+    weighted mean of x, Sxx and the number of points per row.
+    """
+
+    n = np.count_nonzero(weights > 0, axis=1)
+    weights = weights / np.where(n > 0, weights.sum(axis=1) / np.maximum(n, 1), 1)[:, None]
+    x = np.where(weights > 0, x, 0.0)
+    y = np.where(weights > 0, y, 0.0)
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        sw = weights.sum(axis=1)
+        x_mean = (weights * x).sum(axis=1) / sw
+        y_mean = (weights * y).sum(axis=1) / sw
+        dx = np.where(weights > 0, x - x_mean[:, None], 0.0)
+        sxx = (weights * dx ** 2).sum(axis=1)
+        sxy = (weights * dx * (y - y_mean[:, None])).sum(axis=1)
+        slope = sxy / sxx
+        intercept = y_mean - slope * x_mean
+        residuals = np.where(weights > 0, y - (intercept[:, None] + slope[:, None] * x), 0.0)
+        variance = (weights * residuals ** 2).sum(axis=1) / (n - 2)
+
+    return intercept, slope, variance, sw, x_mean, sxx, n
+
+def _inverse_prediction(target, intercept, slope, variance, sw, x_mean, sxx):
+    """x where the fitted line reaches `target`, with its standard error"""
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        x_target = (target - intercept) / slope
+        se = np.sqrt(variance * (1 + 1 / sw + (x_target - x_mean) ** 2 / sxx)) / np.abs(slope)
+    return x_target, se
+
+def _fitted_sse(fitted, progress, mask):
+    return np.where(mask, (fitted - progress) ** 2, 0.0).sum(axis=1)
+
+def fit_s_curves(t, progress, completion_pct=COMPLETION_PCT):
+    """Fit every model to a batch of progress curves
+
+    `t` and `progress` are (projects x periods) arrays of elapsed days and
+    actual progress (%), NaN-padded. Returns a dict keyed by model name of
+    dicts with 'completion' (elapsed days at `completion_pct`), 'se' (its
+    standard error in days) and 'sse' (squared error of the fitted curve over
+    all points, in progress points), each an array with one value per project.
+    Completions more than MAX_HORIZON_DAYS away from a curve's latest point
+    are dropped.
+    """
+
+    t = np.atleast_2d(np.asarray(t, dtype=float))
+    progress = np.atleast_2d(np.asarray(progress, dtype=float))
+    valid = ~np.isnan(t) & ~np.isnan(progress) & (t > 0)
+
+    fraction = np.clip(np.where(valid, progress, 50.0) / 100, 0.005, 0.995)
+    target = completion_pct / 100
+    # Delta-method weights undo the variance inflation of the logit transform at the tails
+    weights = np.where(valid, (fraction * (1 - fraction)) ** 2, 0.0)
+    safe_t = np.where(valid, t, 1.0)
+    last_t = np.where(valid, t, -np.inf).max(axis=1)
+    results = {}
+
+    # Logistic: logit(p) = a + b t
+    a, b, var, sw, x_mean, sxx, n = _weighted_line(safe_t, _logit(fraction), weights)
+    completion, se = _inverse_prediction(_logit(target), a, b, var, sw, x_mean, sxx)
+    with np.errstate(over='ignore'):
+        fitted = 100 / (1 + np.exp(-(a[:, None] + b[:, None] * safe_t)))
+    results['logistic'] = {'completion': completion, 'se': se, 'sse': _fitted_sse(fitted, progress, valid), 'n': n, 'slope': b}
+
+    # Weibull: cloglog(p) = k log t - k log(scale)
+    log_t = np.log(safe_t)
+    a, b, var, sw, x_mean, sxx, n = _weighted_line(log_t, _cloglog(fraction), weights)
+    log_completion, log_se = _inverse_prediction(_cloglog(target), a, b, var, sw, x_mean, sxx)
+    with np.errstate(over='ignore'):
+        completion = np.exp(log_completion)
+        fitted = 100 * (1 - np.exp(-np.exp(a[:, None] + b[:, None] * log_t)))
+    results['weibull'] = {'completion': completion, 'se': completion * log_se, 'sse': _fitted_sse(fitted, progress, valid), 'n': n, 'slope': b}
+
+    results['linear'] = fit_robust_trend(t, progress, completion_pct)
+
+    for model in results.values():
+        usable = (model['n'] >= 3) & (model['slope'] > 0) & (np.abs(model['completion'] - last_t) <= MAX_HORIZON_DAYS)
+        model['completion'] = np.where(usable, model['completion'], np.nan)
+        model['se'] = np.where(usable, model['se'], np.nan)
+        model['sse'] = np.where(usable, model['sse'], np.inf)
+
+    return results
+
+def fit_robust_trend(t, progress, completion_pct=COMPLETION_PCT, periods=TREND_PERIODS):
+    """Theil-Sen line through the last `periods` valid points of each curve
+
+    The fit error ('sse') is measured over every point of the curve, so a
+    recent trend that does not explain the earlier history scores poorly.
+    """
+
+    t = np.atleast_2d(np.asarray(t, dtype=float))
+    progress = np.atleast_2d(np.asarray(progress, dtype=float))
+    valid = ~np.isnan(t) & ~np.isnan(progress)
+
+    # Curves with fewer than 3 points have no trend (and would only raise all-NaN warnings)
+    counts = valid.sum(axis=1)
+    n = np.minimum(counts, periods)
+    enough = counts >= 3
+    nan = np.full(len(t), np.nan)
+    if not enough.all():
+        results = {'completion': nan.copy(), 'se': nan.copy(), 'sse': nan.copy(), 'n': n, 'slope': nan.copy()}
+        if enough.any():
+            fitted = fit_robust_trend(t[enough], progress[enough], completion_pct, periods)
+            for key in ['completion', 'se', 'sse', 'slope']:
+                results[key][enough] = fitted[key]
+        return results
+
+    # Right-align the last `periods` valid points of every row
+    order = np.argsort(~valid, axis=1, kind='stable')
+    columns = np.clip(counts[:, None] - periods + np.arange(periods)[None, :], -1, None)
+    rows = np.arange(len(t))[:, None]
+    pick = order[rows, np.maximum(columns, 0)]
+    x = np.where(columns >= 0, t[rows, pick], np.nan)
+    y = np.where(columns >= 0, progress[rows, pick], np.nan)
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        upper = np.triu(np.ones((periods, periods), dtype=bool), k=1)
+        pair_slopes = (y[:, None, :] - y[:, :, None]) / (x[:, None, :] - x[:, :, None])
+        pair_slopes = np.where(upper[None], pair_slopes, np.nan)
+        slope = np.nanmedian(pair_slopes.reshape(len(t), -1), axis=1)
+        intercept = np.nanmedian(y - slope[:, None] * x, axis=1)
+        residuals = y - (intercept[:, None] + slope[:, None] * x)
+        scale = 1.4826 * np.nanmedian(np.abs(residuals - np.nanmedian(residuals, axis=1)[:, None]), axis=1)
+
+        x_mean = np.nanmean(x, axis=1)
+        sxx = np.nansum((x - x_mean[:, None]) ** 2, axis=1)
+        completion = (completion_pct - intercept) / slope
+        se = scale * np.sqrt(1 + 1 / n + (completion - x_mean) ** 2 / sxx) / np.abs(slope)
+        sse = np.nansum((progress - (intercept[:, None] + slope[:, None] * t)) ** 2, axis=1)
+
+    return {'completion': completion, 'se': se, 'sse': sse, 'n': n, 'slope': slope}
+
+def forecast_portfolio(schedules, planned_completion=DEFAULT_PLANNED_COMPLETION, completion_pct=COMPLETION_PCT, band_z=BAND_Z):
+    """Forecast completion dates for many projects at once
+
+    `schedules` maps project id to its schedule table (Date and
+    Actual_Progress_Pct). The model with the smallest fit error is chosen per
+    project; projects whose progress already reached `completion_pct` get
+    the date they first did (Model 'reported'), and other forecasts never
+    fall before the latest report. Returns one row per project with Model,
+    Forecast_Completion, Lower_Bound, Upper_Bound and Slip_Days against
+    `planned_completion` (a date, or a mapping of project id to date).
+    """
+
+    project_ids = list(schedules)
+    columns = ['Project', 'Model', 'Forecast_Completion', 'Lower_Bound', 'Upper_Bound', 'Slip_Days']
+    if not project_ids:
+        return pd.DataFrame(columns=columns)
+
+    lengths = [len(schedules[project_id]) for project_id in project_ids]
+    width = max(max(lengths), 1)
+    t = np.full((len(project_ids), width), np.nan)
+    progress = np.full((len(project_ids), width), np.nan)
+    starts = np.full(len(project_ids), np.datetime64('NaT'), dtype='datetime64[ns]')
+    for i, project_id in enumerate(project_ids):
+        schedule = schedules[project_id]
+        if len(schedule) == 0:
+            continue
+        dates = schedule['Date'].to_numpy(dtype='datetime64[ns]')
+        # Elapsed days since the start of the first reporting period
+        spacing = np.median(np.diff(dates)) if len(dates) > 1 else np.timedelta64(7, 'D')
+        starts[i] = dates[0] - spacing
+        t[i, :len(dates)] = (dates - starts[i]) / np.timedelta64(1, 'D')
+        progress[i, :len(dates)] = schedule['Actual_Progress_Pct'].to_numpy(dtype=float)
+
+    fits = fit_s_curves(t, progress, completion_pct)
+    sse = np.vstack([fits[model]['sse'] for model in MODELS])
+    best = np.argmin(sse, axis=0)
+    rows = np.arange(len(project_ids))
+    completion = np.vstack([fits[model]['completion'] for model in MODELS])[best, rows]
+    se = np.vstack([fits[model]['se'] for model in MODELS])[best, rows]
+
+    # A project that already reached the threshold completed when it first did;
+    # otherwise no forecast or bound falls before the latest report
+    reached = np.where(progress >= completion_pct, t, np.inf).min(axis=1)
+    done = np.isfinite(reached)
+    last_t = np.where(np.isnan(t), -np.inf, t).max(axis=1)
+    completion = np.where(done, reached, np.maximum(completion, last_t))
+    se = np.where(done, 0.0, se)
+
+    # The band always contains the forecast and reaches no further than the forecast horizon
+    low_days = np.clip(completion - band_z * se, np.minimum(last_t, completion), completion)
+    high_days = np.clip(completion + band_z * se, completion, last_t + MAX_HORIZON_DAYS)
+
+    starts = pd.DatetimeIndex(starts)
+    forecast = (starts + pd.to_timedelta(completion, unit='D')).normalize()
+    lower = (starts + pd.to_timedelta(low_days, unit='D')).normalize()
+    upper = (starts + pd.to_timedelta(high_days, unit='D')).normalize()
+
+    if isinstance(planned_completion, dict):
+        planned = pd.DatetimeIndex([pd.to_datetime(planned_completion.get(project_id)) for project_id in project_ids])
+    else:
+        planned = pd.DatetimeIndex([pd.to_datetime(planned_completion)] * len(project_ids))
+
+    has_fit = np.isfinite(completion)
+    return pd.DataFrame({
+        'Project': project_ids,
+        'Model': np.where(done, 'reported', np.where(has_fit, np.array(MODELS)[best], None)),
+        'Forecast_Completion': forecast,
+        'Lower_Bound': lower,
+        'Upper_Bound': upper,
+        'Slip_Days': ((forecast - planned) / pd.Timedelta(days=1)).to_numpy().round(1)
+    }, columns=columns)
+
+def forecast_completion(schedule_df, planned_completion=DEFAULT_PLANNED_COMPLETION, completion_pct=COMPLETION_PCT):
+    """Forecast the completion date of one project with its confidence band"""
+    return forecast_portfolio({None: schedule_df}, planned_completion, completion_pct).drop(columns='Project').iloc[0]
+
+def rank_by_forecast_slip(forecasts):
+    """Order portfolio forecasts from the largest forecast slip to the smallest"""
+    return forecasts.sort_values('Slip_Days', ascending=False, na_position='last').reset_index(drop=True)
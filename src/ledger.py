@@ -0,0 +1,122 @@
+"""
+Incremental file ingestion
+Folds raw files (transactions, telematics pings, timesheets) into a project's
+tables through a ledger. Each ingested file's own totals are kept as a partial
+beside a manifest of the file's size and modification time, so unchanged files
+are skipped and a changed file only contributes its difference from the
+partial it replaces
+"""
+
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+MANIFEST_FILE = 'manifest.json'
+
+def file_signature(path):
+    """(size, modification time) identifying one version of an ingested file"""
+    stat = os.stat(path)
+    return [stat.st_size, stat.st_mtime]
+
+def read_manifest(data_dir, ledger):
+    """Ingested file path -> {'signature', 'partial', 'rows'} of a project's ledger"""
+
+    path = os.path.join(data_dir, ledger, MANIFEST_FILE)
+    if not os.path.exists(path):
+        return {}
+    with open(path, encoding='utf-8') as stream:
+        return json.load(stream)
+
+def write_manifest(data_dir, manifest, ledger):
+    path = os.path.join(data_dir, ledger, MANIFEST_FILE)
+    with open(path + '.tmp', 'w', encoding='utf-8') as stream:
+        json.dump(manifest, stream, indent=1)
+    os.replace(path + '.tmp', path)
+
+def _aggregate_job(task):
+    aggregate, job = task
+    try:
+        return aggregate(job), None
+    except (OSError, ValueError) as e:
+        return None, str(e)
+
+def ingest_files(jobs, data_dir, ledger, aggregate, apply, read_partial, write_partial, noun='rows', unit='periods',
+                 decimals=2, workers=None, prewarm=True, log=sys.stderr):
+    """Fold new or changed files into a project's tables through the ledger directory `ledger`
+
+    `jobs` are tuples starting with a file path; files whose size and
+    modification time match the manifest are skipped. `aggregate(job)` runs
+    in worker processes and returns (totals, rows, warning or None) for one
+    file, where totals is a Series or DataFrame that `read_partial(path)` and
+    `write_partial(totals, path)` store. The differences from the files'
+    previous partials, without rows that round to zero at `decimals`, are
+    passed to `apply(delta)`, which updates the project tables and returns the
+    sorted touched periods. Partials and the manifest are only written once
+    `apply` succeeded. With `prewarm`, the dashboard's first paint is rebuilt.
+    Returns the touched periods; raises FileNotFoundError before reading
+    anything when a path does not exist.
+    """
+
+    missing = [job[0] for job in jobs if not os.path.isfile(job[0])]
+    if missing:
+        raise FileNotFoundError(f"Missing files: {', '.join(missing)}")
+
+    start = time.perf_counter()
+    manifest = read_manifest(data_dir, ledger)
+    jobs = [job for job in jobs if manifest.get(os.path.abspath(job[0]), {}).get('signature') != file_signature(job[0])]
+    if not jobs:
+        print(f"✅ No new {noun} for {data_dir}", file=log)
+        return []
+
+    tasks = [(aggregate, job) for job in jobs]
+    workers = min(workers or os.cpu_count() or 1, len(tasks))
+    if workers == 1:
+        results = [_aggregate_job(task) for task in tasks]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(_aggregate_job, tasks))
+
+    ledger_dir = os.path.join(data_dir, ledger)
+    os.makedirs(ledger_dir, exist_ok=True)
+    delta = None
+    partials = {}
+    rows = 0
+    for job, (result, error) in zip(jobs, results):
+        if error:
+            print(f"❌ {error}", file=log)
+            continue
+        totals, count, warning = result
+        if warning:
+            print(f"⚠️ {job[0]}: {warning}", file=log)
+        key = os.path.abspath(job[0])
+        change = totals
+        previous = manifest.get(key)
+        if previous:
+            change = change.sub(read_partial(os.path.join(ledger_dir, previous['partial'])), fill_value=0)
+        delta = change if delta is None else delta.add(change, fill_value=0)
+        partials[key] = (totals, count)
+        rows += count
+
+    touched = []
+    if delta is not None:
+        nonzero = delta.round(decimals) != 0
+        delta = delta[nonzero.any(axis=1) if nonzero.ndim > 1 else nonzero]
+        if len(delta):
+            touched = apply(delta)
+
+    # The ledger is only updated once the tables hold the new totals
+    for key, (totals, count) in partials.items():
+        partial = manifest.get(key, {}).get('partial') or f"{len(manifest):06d}.csv"
+        write_partial(totals, os.path.join(ledger_dir, partial))
+        manifest[key] = {'signature': file_signature(key), 'partial': partial, 'rows': count}
+    write_manifest(data_dir, manifest, ledger)
+
+    print(f"✅ Ingested {rows:,} {noun} from {len(partials)} files into {data_dir}, "
+          f"updating {len(touched)} {unit} in {time.perf_counter() - start:.1f}s", file=log)
+
+    if prewarm and touched:
+        from prewarm import prewarm as prewarm_first_paint
+        prewarm_first_paint([data_dir], workers=1, log=log)
+    return touched
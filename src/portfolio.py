@@ -0,0 +1,223 @@
+"""
+Portfolio summary across many projects
+Precomputes one row of headline KPIs per project (health score, SPI, CPI, TRIR,
+pass rate, forecast finish, risks new this period, latest KPI anomalies) and serves
+sorted, filtered pages of it
+"""
+
+import fnmatch
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+import pandas as pd
+from analytics import ConstructionAnalytics
+from anomaly import latest_anomaly_alerts
+from chunked_analytics import TABLE_FILES, resolve_table_path
+from forecasting import forecast_portfolio
+from project_store import discover_projects, load_project_tables, project_groups, split_by_project
+from risk_scanner import latest_pass_rate, portfolio_new_risks
+
+PROJECTS_DIR_ENV = 'CONDASH_PROJECTS_DIR'
+DEFAULT_PROJECTS_DIR = os.path.join('data', 'projects')
+SUMMARY_FILE = 'portfolio_summary.csv'
+
+SUMMARY_COLUMNS = [
+    'Project', 'Status', 'Health_Score', 'SPI', 'CPI', 'TRIR', 'Pass_Rate_Pct',
+    'Progress_Pct', 'Forecast_Completion', 'Slip_Days', 'New_Risks', 'New_Risk_List', 'Anomalies', 'Anomaly_KPIs',
+    'Last_Report', 'Source'
+]
+
+# Text columns of the summary that are listed but not offered for sorting
+TEXT_COLUMNS = ['Status', 'New_Risk_List', 'Anomaly_KPIs', 'Source']
+
+# Health score bands for the Status column
+STATUS_BANDS = [
+    (80, 'On Track'),
+    (60, 'At Risk'),
+    (0, 'Critical')
+]
+
+DEFAULT_PAGE_SIZE = 50
+
+def projects_dir():
+    """Projects directory from CONDASH_PROJECTS_DIR, or data/projects"""
+    return os.environ.get(PROJECTS_DIR_ENV, DEFAULT_PROJECTS_DIR)
+
+def health_status(score):
+    for threshold, status in STATUS_BANDS:
+        if score >= threshold:
+            return status
+    return STATUS_BANDS[-1][1]
+
+def summarize_project(project_id, tables, source=None, alerts=(), risks=()):
+    """Headline KPIs of one project (forecast columns are filled in by build_portfolio_summary)
+
+    `alerts` are the project's latest KPI anomalies (see anomaly.latest_anomaly_alerts)
+    and `risks` the risk messages whose onset is its latest period.
+    """
+
+    schedule_df, cost_df, productivity_df, safety_df, quality_df = tables
+    latest = [df.iloc[-1] if len(df) else None for df in (schedule_df, cost_df, safety_df, quality_df)]
+    complete = all(row is not None for row in latest)
+    health = ConstructionAnalytics(*tables).calculate_project_health_score() if complete else None
+
+    return {
+        'Project': project_id,
+        'Status': health_status(health) if health is not None and pd.notna(health) else 'No Data',
+        'Health_Score': health,
+        'SPI': latest[0]['SPI'] if latest[0] is not None else None,
+        'CPI': latest[1]['CPI'] if latest[1] is not None else None,
+        'TRIR': latest[2]['TRIR'] if latest[2] is not None else None,
+        'Pass_Rate_Pct': latest_pass_rate(quality_df) if latest[3] is not None else None,
+        'Progress_Pct': latest[0]['Actual_Progress_Pct'] if latest[0] is not None else None,
+        'New_Risks': len(risks),
+        'New_Risk_List': '; '.join(risks),
+        'Anomalies': len(alerts),
+        'Anomaly_KPIs': '; '.join(alerts),
+        'Last_Report': latest[0]['Date'] if latest[0] is not None else None,
+        'Source': source
+    }
+
+def _summarize_projects(item):
+    """Worker: summary rows and progress curves of one work item (a directory, or a group of its Project_IDs)
+
+    The anomaly detectors need every project's full history, so whole tables are read.
+    """
+
+    project_dir, project_ids = item
+    tables = load_project_tables(project_dir, project_ids)
+    projects = dict(split_by_project(project_dir, tables, project_ids=project_ids))
+    alerts = latest_anomaly_alerts({project_id: project_tables[1:] for project_id, project_tables in projects.items()})
+    risks = portfolio_new_risks(projects).groupby('Project')['Risk'].agg(list)
+    rows = []
+    curves = {}
+    for project_id, project_tables in projects.items():
+        rows.append(summarize_project(project_id, project_tables, project_dir, alerts.get(project_id, []), risks.get(project_id, [])))
+        curves[project_id] = project_tables[0][['Date', 'Actual_Progress_Pct']]
+    return rows, curves
+
+def build_portfolio_summary(projects_dir=DEFAULT_PROJECTS_DIR, workers=None):
+    """Summarize every project under `projects_dir` into one table"""
+
+    project_dirs = discover_projects([projects_dir])
+    if not project_dirs:
+        return pd.DataFrame(columns=SUMMARY_COLUMNS)
+
+    rows = []
+    curves = {}
+    workers = workers or os.cpu_count() or 1
+    # Directories holding many projects by Project_ID are split so every worker gets a share
+    items = project_groups(project_dirs, groups=workers)
+    workers = max(1, min(workers, len(items)))
+    if workers == 1:
+        results = map(_summarize_projects, items)
+        for project_rows, project_curves in results:
+            rows.extend(project_rows)
+            curves.update(project_curves)
+    else:
+        chunksize = max(1, len(items) // (workers * 4))
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            for project_rows, project_curves in pool.map(_summarize_projects, items, chunksize=chunksize):
+                rows.extend(project_rows)
+                curves.update(project_curves)
+
+    summary = pd.DataFrame(rows)
+    forecasts = forecast_portfolio(curves).set_index('Project')
+    summary['Forecast_Completion'] = summary['Project'].map(forecasts['Forecast_Completion'])
+    summary['Slip_Days'] = summary['Project'].map(forecasts['Slip_Days'])
+    return summary[SUMMARY_COLUMNS]
+
+def summary_path(projects_dir=DEFAULT_PROJECTS_DIR):
+    return os.path.join(projects_dir, SUMMARY_FILE)
+
+def _latest_table_mtime(projects_dir):
+    latest = 0.0
+    for project_dir in discover_projects([projects_dir]):
+        for table in TABLE_FILES:
+            latest = max(latest, os.path.getmtime(resolve_table_path(project_dir, table)))
+    return latest
+
+def summary_is_stale(projects_dir=DEFAULT_PROJECTS_DIR):
+    """Check whether any project table changed after the stored summary was written"""
+    path = summary_path(projects_dir)
+    if not os.path.exists(path):
+        return True
+    return _latest_table_mtime(projects_dir) > os.path.getmtime(path)
+
+def write_portfolio_summary(projects_dir=DEFAULT_PROJECTS_DIR, workers=None):
+    """Rebuild and store the summary table; returns it"""
+
+    start = time.perf_counter()
+    summary = build_portfolio_summary(projects_dir, workers)
+    summary.to_csv(summary_path(projects_dir), index=False)
+    print(f"✅ Portfolio summary for {len(summary)} projects written to {summary_path(projects_dir)} "
+          f"in {time.perf_counter() - start:.1f}s")
+    return summary
+
+def load_portfolio_summary(projects_dir=DEFAULT_PROJECTS_DIR, rebuild_stale=True, workers=None):
+    """Read the stored summary, rebuilding it first when missing (or stale, or written with other columns)"""
+
+    if not os.path.isdir(projects_dir):
+        return pd.DataFrame(columns=SUMMARY_COLUMNS)
+    if not os.path.exists(summary_path(projects_dir)) or (rebuild_stale and summary_is_stale(projects_dir)):
+        return write_portfolio_summary(projects_dir, workers)
+    summary = pd.read_csv(
+        summary_path(projects_dir),
+        parse_dates=['Forecast_Completion', 'Last_Report'],
+        dtype={'Project': str, 'New_Risk_List': str, 'Anomaly_KPIs': str}
+    )
+    if list(summary.columns) != SUMMARY_COLUMNS:
+        return write_portfolio_summary(projects_dir, workers)
+    summary[['New_Risk_List', 'Anomaly_KPIs']] = summary[['New_Risk_List', 'Anomaly_KPIs']].fillna('')
+    return summary
+
+def filter_portfolio(summary, search=None, statuses=None, anomalies_only=False, new_risks_only=False):
+    """Summary rows matching a project search and a list of statuses
+
+    `search` matches project ids as a glob pattern when it contains wildcards,
+    otherwise as a case-insensitive substring. With `anomalies_only` or
+    `new_risks_only`, only projects with a KPI anomaly or a risk that started
+    in their latest period are kept.
+    """
+
+    rows = summary
+    if search:
+        names = rows['Project'].astype(str)
+        if any(char in search for char in '*?['):
+            rows = rows[names.map(lambda name: fnmatch.fnmatch(name, search))]
+        else:
+            rows = rows[names.str.contains(search, case=False, regex=False)]
+    if statuses:
+        rows = rows[rows['Status'].isin(statuses)]
+    if anomalies_only:
+        rows = rows[rows['Anomalies'] > 0]
+    if new_risks_only:
+        rows = rows[rows['New_Risks'] > 0]
+    return rows
+
+def page_count(rows, page_size=DEFAULT_PAGE_SIZE):
+    return max(1, -(-len(rows) // page_size))
+
+def sort_page(rows, sort_by='Health_Score', ascending=True, page=1, page_size=DEFAULT_PAGE_SIZE):
+    """One page of rows after sorting; `page` is clamped to the available pages"""
+
+    if sort_by in rows.columns:
+        rows = rows.sort_values(sort_by, ascending=ascending, na_position='last', kind='stable')
+    page = max(1, min(page, page_count(rows, page_size)))
+    start = (page - 1) * page_size
+    return rows.iloc[start:start + page_size].reset_index(drop=True)
+
+def query_portfolio(summary, search=None, statuses=None, sort_by='Health_Score', ascending=True, page=1, page_size=DEFAULT_PAGE_SIZE,
+                    anomalies_only=False, new_risks_only=False):
+    """One page of the summary after filtering and sorting; returns (page_df, matching_rows)"""
+    rows = filter_portfolio(summary, search, statuses, anomalies_only, new_risks_only)
+    return sort_page(rows, sort_by, ascending, page, page_size), len(rows)
+
+def load_project_detail(source, project_id):
+    """Full KPI tables of one project of the summary"""
+
+    tables = load_project_tables(source)
+    for name, project_tables in split_by_project(source, tables, [project_id]):
+        if name == project_id:
+            return project_tables
+    return None
@@ -0,0 +1,166 @@
+"""
+Ingest-time precompute of the dashboard's first paint
+Builds the default Overview view (KPI cards, latest KPI anomalies, risk history,
+schedule, cost and earned value figures over the full date range) and the analytics report once
+when data lands, and stores them in a JSON artifact beside the data that the
+dashboard renders without parsing a single CSV
+"""
+
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+import plotly.utils
+from analytics import generate_analytics_report
+from anomaly import latest_anomaly_alerts
+from chunked_analytics import TABLE_FILES, resolve_table_path
+from cost_hierarchy import CostHierarchy
+from evm import TREND_WINDOW, calculate_evm_series
+import figures
+from project_store import discover_projects, read_table
+from risk_scanner import risk_events, scan_risk_history
+from timesheets import crew_productivity_path, read_crew_productivity
+from rollups import RESOLUTION_LABELS, build_all_rollups, tables_for_range
+
+ARTIFACT_FILE = 'first_paint.json'
+
+# Bump when the artifact layout or the figures change so old artifacts are rebuilt
+ARTIFACT_VERSION = 3
+
+# Tables shown on the first paint besides the KPI tables, when present
+EXTRA_TABLES = ['cost_breakdown', 'cost_codes', 'cost_code_actuals', 'crew_productivity']
+
+def artifact_path(data_dir):
+    return os.path.join(data_dir, ARTIFACT_FILE)
+
+def source_files(data_dir):
+    """Table files the first paint is built from"""
+
+    paths = [resolve_table_path(data_dir, table) for table in TABLE_FILES]
+    for stem in EXTRA_TABLES:
+        path = os.path.join(data_dir, stem + '.csv')
+        if os.path.exists(path):
+            paths.append(path)
+    return paths
+
+def source_signature(data_dir):
+    """File name -> modification time of the source tables"""
+    return {os.path.basename(path): os.path.getmtime(path) for path in source_files(data_dir)}
+
+def build_first_paint(data_dir):
+    """Everything the Overview section shows for the full date range, as plain JSON-able values"""
+
+    signature = source_signature(data_dir)
+    tables = tuple(read_table(resolve_table_path(data_dir, table)) for table in TABLE_FILES)
+    schedule_df, cost_df, productivity_df, safety_df, quality_df = tables
+    cost_breakdown_path = os.path.join(data_dir, 'cost_breakdown.csv')
+    cost_breakdown_df = read_table(cost_breakdown_path) if os.path.exists(cost_breakdown_path) else None
+    crew_path = crew_productivity_path(data_dir)
+    crew_productivity_df = read_crew_productivity(crew_path) if os.path.exists(crew_path) else None
+
+    start_date = schedule_df['Date'].min().date()
+    end_date = schedule_df['Date'].max().date()
+    rollups = build_all_rollups(dict(zip(TABLE_FILES, tables)))
+    resolution, chart_tables = tables_for_range(dict(zip(TABLE_FILES, tables)), rollups, start_date, end_date)
+
+    history = scan_risk_history(*tables)
+    events = risk_events(history)
+    evm_df = calculate_evm_series(chart_tables['schedule'], chart_tables['cost'], rolling_window=TREND_WINDOW)
+
+    figure_set = {}
+    figure_set['progress'], figure_set['spi'] = figures.schedule_figures(chart_tables['schedule'])
+    figure_set['spending'], figure_set['cpi'] = figures.cost_figures(chart_tables['cost'])
+    if len(evm_df):
+        figure_set['evm_indices'], figure_set['eac'] = figures.evm_figures(evm_df)
+    if len(history):
+        figure_set['risk_history'] = figures.risk_history_figure(history)
+    hierarchy = CostHierarchy.from_data_dir(data_dir)
+    cost_drill = None
+    if hierarchy is not None:
+        figure_set['cost_breakdown'], breadcrumb, options = figures.cost_drilldown(hierarchy, [])
+        cost_drill = {'breadcrumb': breadcrumb, 'options': options}
+    elif cost_breakdown_df is not None:
+        figure_set['cost_breakdown'] = figures.cost_breakdown_figure(cost_breakdown_df)
+
+    artifact = {
+        'version': ARTIFACT_VERSION,
+        'signature': signature,
+        'start_date': start_date.isoformat(),
+        'end_date': end_date.isoformat(),
+        'resolution_caption': f"Charts show {RESOLUTION_LABELS[resolution].lower()} data ({len(chart_tables['schedule'])} points)",
+        'progress_pct': float(schedule_df['Actual_Progress_Pct'].iloc[-1]),
+        'kpi_cards': figures.kpi_cards(schedule_df, cost_df, safety_df, quality_df),
+        'risk_events': figures.risk_event_rows(events).to_dict('records') if len(events) else [],
+        'figures': {name: fig.to_plotly_json() for name, fig in figure_set.items()},
+        'analytics_report': generate_analytics_report(*tables, crew_productivity_df=crew_productivity_df),
+        'anomalies': latest_anomaly_alerts({None: tables[1:]}).get(None, [])
+    }
+    if cost_drill is not None:
+        artifact['cost_drill'] = cost_drill
+    return artifact
+
+def write_first_paint(data_dir):
+    """Build and store the first-paint artifact of one data directory; returns its path"""
+
+    artifact = build_first_paint(data_dir)
+    path = artifact_path(data_dir)
+    temporary = path + '.tmp'
+    with open(temporary, 'w', encoding='utf-8') as stream:
+        json.dump(artifact, stream, cls=plotly.utils.PlotlyJSONEncoder, separators=(',', ':'))
+    os.replace(temporary, path)
+    return path
+
+def read_first_paint(path):
+    with open(path, encoding='utf-8') as stream:
+        return json.load(stream)
+
+def is_current(artifact, data_dir):
+    """Check an artifact was built by this version from the data now in `data_dir`"""
+    try:
+        current = source_signature(data_dir)
+    except FileNotFoundError:
+        return False
+    return artifact.get('version') == ARTIFACT_VERSION and artifact.get('signature') == current
+
+def load_first_paint(data_dir):
+    """The stored first paint of a data directory, or None when missing or older than its data"""
+
+    path = artifact_path(data_dir)
+    if not os.path.exists(path):
+        return None
+    artifact = read_first_paint(path)
+    return artifact if is_current(artifact, data_dir) else None
+
+def _prewarm_dir(data_dir):
+    try:
+        return write_first_paint(data_dir), None
+    except (KeyError, ValueError, IndexError) as e:
+        return None, f"{data_dir}: {e}"
+
+def prewarm(inputs, workers=None, log=sys.stderr):
+    """Write the first-paint artifact for every project directory found under `inputs`
+
+    Returns the artifact paths written.
+    """
+
+    start = time.perf_counter()
+    data_dirs = discover_projects(inputs)
+    if not data_dirs:
+        print("❌ No project data found for the given inputs", file=log)
+        return []
+
+    workers = min(workers or os.cpu_count() or 1, len(data_dirs))
+    if workers == 1:
+        results = [_prewarm_dir(data_dir) for data_dir in data_dirs]
+    else:
+        chunksize = max(1, len(data_dirs) // (workers * 4))
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(_prewarm_dir, data_dirs, chunksize=chunksize))
+
+    paths = [path for path, _ in results if path]
+    for _, error in results:
+        if error:
+            print(f"⚠️ Skipped {error}", file=log)
+    print(f"✅ Precomputed the first paint of {len(paths)} projects in {time.perf_counter() - start:.1f}s", file=log)
+    return paths
@@ -0,0 +1,312 @@
+"""
+On-demand profiling of dashboard reruns
+Profiles one rerun end to end with cProfile (or pyinstrument when installed),
+stores it as folded stacks and a speedscope file keyed by section and date
+range, and aggregates hot functions across every stored profile
+"""
+
+import cProfile
+import json
+import os
+import pstats
+import random
+import re
+from datetime import datetime
+
+import pandas as pd
+
+PROFILE_ENV = 'CONDASH_PROFILE'          # '1', an engine name, or a sampling rate such as '0.05'
+PROFILE_DIR_ENV = 'CONDASH_PROFILE_DIR'
+PROFILE_PARAM = 'profile'                # ?profile=1 (or =cprofile / =pyinstrument) profiles one rerun
+
+DEFAULT_PROFILE_DIR = 'profiles'
+ENGINES = ['cprofile', 'pyinstrument']
+
+# Oldest profiles beyond this count are deleted
+PROFILE_RETENTION = 200
+
+# Call paths cheaper than this are dropped from cProfile flame graphs
+MIN_STACK_MS = 0.05
+MAX_STACK_DEPTH = 64
+
+def _default_engine():
+    try:
+        import pyinstrument  # noqa: F401
+    except ImportError:
+        return 'cprofile'
+    return 'pyinstrument'
+
+def _engine_from_value(value):
+    """Engine named (or implied) by a query param / env value, or None when off"""
+
+    value = (value or '').strip().lower()
+    if value in ('', '0', 'false', 'off', 'no'):
+        return None
+    if value == 'cprofile':
+        return value
+    # pyinstrument is optional; fall back to cProfile when it is not installed
+    return _default_engine()
+
+def requested_engine(query_value=None, environ=None):
+    """Profiling engine for this rerun, or None to run unprofiled
+
+    The query parameter wins; otherwise CONDASH_PROFILE either profiles every
+    rerun ('1' or an engine name) or a random share of them ('0.05').
+    """
+
+    if query_value is not None:
+        return _engine_from_value(query_value)
+
+    environ = os.environ if environ is None else environ
+    value = environ.get(PROFILE_ENV, '')
+    try:
+        rate = float(value)
+    except ValueError:
+        return _engine_from_value(value)
+    if 0 < rate < 1:
+        return _default_engine() if random.random() < rate else None
+    return _default_engine() if rate >= 1 else None
+
+def _frame_label(function, filename, line):
+    filename = filename.replace('\\', '/')
+    short = '/'.join(filename.split('/')[-2:]) if filename not in ('~', '') else 'built-in'
+    label = f"{function} ({short}:{line})" if line else f"{function} ({short})"
+    return label.replace(';', ',')
+
+def pstats_to_folded(stats, min_ms=MIN_STACK_MS, max_depth=MAX_STACK_DEPTH):
+    """Approximate folded stacks from cProfile statistics
+
+    cProfile only keeps caller/callee pairs, so each function's time is split
+    between its call paths in proportion to the time spent from each caller.
+    Self times are exact. Returns {stack: milliseconds}.
+    """
+
+    raw = stats.stats
+    callees = {}
+    for function, (_, _, _, _, callers) in raw.items():
+        for caller, edge in callers.items():
+            callees.setdefault(caller, []).append((function, edge[3]))
+
+    labels = {function: _frame_label(function[2], function[0], function[1]) for function in raw}
+    roots = [function for function, entry in raw.items() if not entry[4]]
+    folded = {}
+
+    def walk(function, path, cumulative):
+        _, _, own, total, _ = raw[function]
+        share = cumulative / total if total > 0 else 0.0
+        stack = path + [labels[function]]
+        self_ms = own * share * 1000
+        if self_ms >= min_ms:
+            key = ';'.join(stack)
+            folded[key] = folded.get(key, 0.0) + self_ms
+        if len(stack) >= max_depth:
+            return
+        for callee, edge_total in callees.get(function, []):
+            if labels[callee] in stack:
+                continue
+            child_cumulative = edge_total * share
+            if child_cumulative * 1000 >= min_ms:
+                walk(callee, stack, child_cumulative)
+
+    for root in roots:
+        walk(root, [], raw[root][3])
+
+    return folded
+
+def pyinstrument_to_folded(session):
+    """Exact folded stacks from a pyinstrument session; returns {stack: milliseconds}"""
+
+    folded = {}
+
+    def walk(frame, path):
+        stack = path + [_frame_label(frame.function or '<module>', frame.file_path_short or frame.file_path or '', frame.line_no)]
+        self_ms = getattr(frame, 'total_self_time', frame.self_time) * 1000
+        if self_ms > 0:
+            key = ';'.join(stack)
+            folded[key] = folded.get(key, 0.0) + self_ms
+        for child in frame.children:
+            walk(child, stack)
+
+    root = session.root_frame()
+    if root is not None:
+        walk(root, [])
+    return folded
+
+def folded_to_speedscope(folded, name):
+    """Speedscope 'sampled' profile (weights in milliseconds) from folded stacks"""
+
+    frames = []
+    frame_index = {}
+    samples = []
+    weights = []
+    for stack, ms in folded.items():
+        sample = []
+        for label in stack.split(';'):
+            if label not in frame_index:
+                frame_index[label] = len(frames)
+                frames.append({'name': label})
+            sample.append(frame_index[label])
+        samples.append(sample)
+        weights.append(round(ms, 3))
+
+    return {
+        '$schema': 'https://www.speedscope.app/file-format-schema.json',
+        'name': name,
+        'exporter': 'condash',
+        'activeProfileIndex': 0,
+        'shared': {'frames': frames},
+        'profiles': [{
+            'type': 'sampled',
+            'name': name,
+            'unit': 'milliseconds',
+            'startValue': 0,
+            'endValue': round(sum(weights), 3),
+            'samples': samples,
+            'weights': weights
+        }]
+    }
+
+def _slug(value):
+    return re.sub(r'[^A-Za-z0-9-]+', '-', str(value)).strip('-') or 'none'
+
+def profile_key(section, start_date, end_date):
+    """File-name stem identifying a section and date range"""
+    return f"{_slug(section)}__{start_date}__{end_date}"
+
+class RerunProfiler:
+    """Profiles one dashboard rerun and stores the result"""
+
+    def __init__(self, engine=None, profile_dir=None):
+        self.engine = engine or _default_engine()
+        self.profile_dir = profile_dir or os.environ.get(PROFILE_DIR_ENV, DEFAULT_PROFILE_DIR)
+        self.folded = None
+        self._profiler = None
+
+    def start(self):
+        if self.engine == 'pyinstrument':
+            from pyinstrument import Profiler
+            self._profiler = Profiler()
+            self._profiler.start()
+        else:
+            self._profiler = cProfile.Profile()
+            self._profiler.enable()
+        return self
+
+    def stop(self):
+        if self.engine == 'pyinstrument':
+            session = self._profiler.stop()
+            self.folded = pyinstrument_to_folded(session)
+        else:
+            self._profiler.disable()
+            self.folded = pstats_to_folded(pstats.Stats(self._profiler))
+        return self.folded
+
+    def save(self, section, start_date, end_date):
+        """Write folded stacks and a speedscope file; returns their paths"""
+
+        os.makedirs(self.profile_dir, exist_ok=True)
+        stamp = datetime.now().strftime('%Y%m%dT%H%M%S%f')
+        stem = os.path.join(self.profile_dir, f"{profile_key(section, start_date, end_date)}__{stamp}.{self.engine}")
+
+        folded_path = stem + '.folded'
+        with open(folded_path, 'w', encoding='utf-8') as stream:
+            for stack, ms in self.folded.items():
+                # flamegraph.pl expects integer sample counts; microseconds keep the resolution
+                stream.write(f"{stack} {max(int(round(ms * 1000)), 1)}\n")
+
+        speedscope_path = stem + '.speedscope.json'
+        with open(speedscope_path, 'w', encoding='utf-8') as stream:
+            json.dump(folded_to_speedscope(self.folded, f"{section} {start_date} to {end_date}"), stream)
+
+        prune_profiles(self.profile_dir)
+        return {'folded': folded_path, 'speedscope': speedscope_path}
+
+def list_profiles(profile_dir=DEFAULT_PROFILE_DIR, section=None, start_date=None, end_date=None):
+    """Stored profiles, newest first, optionally limited to one section/date range"""
+
+    columns = ['Section', 'Start', 'End', 'Captured', 'Engine', 'Folded', 'Speedscope']
+    if not os.path.isdir(profile_dir):
+        return pd.DataFrame(columns=columns)
+
+    rows = []
+    for filename in os.listdir(profile_dir):
+        if not filename.endswith('.folded'):
+            continue
+        parts = filename[:-len('.folded')].split('__')
+        if len(parts) != 4 or '.' not in parts[3]:
+            continue
+        stamp, engine = parts[3].rsplit('.', 1)
+        folded_path = os.path.join(profile_dir, filename)
+        rows.append({
+            'Section': parts[0],
+            'Start': parts[1],
+            'End': parts[2],
+            'Captured': pd.to_datetime(stamp, format='%Y%m%dT%H%M%S%f', errors='coerce'),
+            'Engine': engine,
+            'Folded': folded_path,
+            'Speedscope': folded_path[:-len('.folded')] + '.speedscope.json'
+        })
+
+    profiles = pd.DataFrame(rows, columns=columns)
+    if section is not None:
+        profiles = profiles[profiles['Section'] == _slug(section)]
+    if start_date is not None:
+        profiles = profiles[profiles['Start'] == str(start_date)]
+    if end_date is not None:
+        profiles = profiles[profiles['End'] == str(end_date)]
+    return profiles.sort_values('Captured', ascending=False).reset_index(drop=True)
+
+def prune_profiles(profile_dir=DEFAULT_PROFILE_DIR, keep=PROFILE_RETENTION):
+    """Delete the oldest profiles beyond `keep`"""
+
+    profiles = list_profiles(profile_dir)
+    for _, profile in profiles.iloc[keep:].iterrows():
+        for path in (profile['Folded'], profile['Speedscope']):
+            if os.path.exists(path):
+                os.remove(path)
+
+def read_folded(path):
+    """Read a folded-stack file back into {stack: milliseconds}"""
+
+    folded = {}
+    with open(path, encoding='utf-8') as stream:
+        for line in stream:
+            stack, _, value = line.rstrip('\n').rpartition(' ')
+            if stack:
+                folded[stack] = folded.get(stack, 0.0) + int(value) / 1000
+    return folded
+
+def hot_functions(profile_dir=DEFAULT_PROFILE_DIR, section=None, limit=20):
+    """Aggregate self and inclusive time per function across stored profiles
+
+    Returns Function, Self_ms, Total_ms and Reruns (profiles the function
+    appears in), sorted by self time.
+    """
+
+    columns = ['Function', 'Self_ms', 'Total_ms', 'Reruns']
+    profiles = list_profiles(profile_dir, section)
+    self_ms = {}
+    total_ms = {}
+    reruns = {}
+
+    for path in profiles['Folded']:
+        seen = set()
+        for stack, ms in read_folded(path).items():
+            frames = stack.split(';')
+            self_ms[frames[-1]] = self_ms.get(frames[-1], 0.0) + ms
+            for function in set(frames):
+                total_ms[function] = total_ms.get(function, 0.0) + ms
+            seen.update(frames)
+        for function in seen:
+            reruns[function] = reruns.get(function, 0) + 1
+
+    if not total_ms:
+        return pd.DataFrame(columns=columns)
+
+    hot = pd.DataFrame({
+        'Function': list(total_ms),
+        'Self_ms': [round(self_ms.get(function, 0.0), 2) for function in total_ms],
+        'Total_ms': [round(total_ms[function], 2) for function in total_ms],
+        'Reruns': [reruns[function] for function in total_ms]
+    }, columns=columns)
+    return hot.sort_values('Self_ms', ascending=False).head(limit).reset_index(drop=True)
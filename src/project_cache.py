@@ -0,0 +1,155 @@
+"""
+Per-project data cache for serving many projects from one dashboard process
+Loads a project's tables the first time any session asks for it, shares them
+and everything derived from them across sessions, and evicts the least recently
+used projects once the cache grows past its memory budget
+"""
+
+import os
+import threading
+import time
+from collections import OrderedDict
+import pandas as pd
+from chunked_analytics import TABLE_FILES, resolve_table_path
+from project_store import discover_projects, project_name, read_table
+
+CACHE_MB_ENV = 'CONDASH_CACHE_MB'
+DEFAULT_CACHE_MB = 512
+
+# Seconds the list of project directories is reused before rescanning
+LISTING_TTL = 30
+
+# Tables shown beside the KPI tables when a project directory has them
+EXTRA_TABLES = ['critical_path_tasks', 'cost_breakdown']
+
+def cache_budget():
+    """Cache memory budget in bytes from CONDASH_CACHE_MB (default 512 MB)"""
+    return int(float(os.environ.get(CACHE_MB_ENV, DEFAULT_CACHE_MB)) * 1024 * 1024)
+
+def memory_size(value):
+    """Approximate bytes held by DataFrames in a (nested) value"""
+
+    if isinstance(value, (pd.DataFrame, pd.Series, pd.Index)):
+        usage = value.memory_usage(deep=True)
+        return int(usage.sum() if isinstance(usage, pd.Series) else usage)
+    if isinstance(value, dict):
+        return sum(memory_size(item) for item in value.values())
+    if isinstance(value, (list, tuple)):
+        return sum(memory_size(item) for item in value)
+    return 0
+
+def _table_paths(project_dir):
+    paths = [resolve_table_path(project_dir, table) for table in TABLE_FILES]
+    for stem in EXTRA_TABLES:
+        path = os.path.join(project_dir, stem + '.csv')
+        paths.append(path if os.path.exists(path) else None)
+    return paths
+
+def _signature(paths):
+    """Modification times of a project's table files; a change means the project is reloaded"""
+    return tuple(os.path.getmtime(path) if path else None for path in paths)
+
+class ProjectData:
+    """One project's tables plus the values derived from them"""
+
+    def __init__(self, project_id, project_dir, signature, tables):
+        self.project_id = project_id
+        self.project_dir = project_dir
+        self.signature = signature
+        self.tables = tables
+        self.derived = {}
+        self.nbytes = memory_size(tables)
+        self._lock = threading.Lock()
+
+    def derive(self, name, compute):
+        """Value `name` computed from the tables, once for all sessions"""
+
+        with self._lock:
+            if name not in self.derived:
+                value = compute(*self.tables)
+                self.derived[name] = value
+                self.nbytes += memory_size(value)
+            return self.derived[name]
+
+class ProjectCache:
+    """LRU cache of ProjectData keyed by project id, bounded by memory
+
+    Project ids are the directory names under `projects_dir`. Safe to share
+    between the threads Streamlit runs sessions on.
+    """
+
+    def __init__(self, projects_dir, max_bytes=None):
+        self.projects_dir = projects_dir
+        self.max_bytes = max_bytes if max_bytes is not None else cache_budget()
+        self._entries = OrderedDict()
+        self._loading = {}
+        self._lock = threading.Lock()
+        self._listing = None
+        self._listed_at = 0.0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def project_dirs(self):
+        """Project id -> directory, rescanned at most every LISTING_TTL seconds"""
+
+        now = time.monotonic()
+        if self._listing is None or now - self._listed_at > LISTING_TTL:
+            self._listing = {project_name(path): path for path in discover_projects([self.projects_dir])}
+            self._listed_at = now
+        return self._listing
+
+    def get(self, project_id):
+        """A project's ProjectData, loading it on first use or after its files changed"""
+
+        project_dir = self.project_dirs().get(project_id)
+        if project_dir is None:
+            raise KeyError(f"Unknown project: {project_id}")
+        paths = _table_paths(project_dir)
+        signature = _signature(paths)
+
+        with self._lock:
+            entry = self._entries.get(project_id)
+            if entry is not None and entry.signature == signature:
+                self._entries.move_to_end(project_id)
+                self.hits += 1
+                return entry
+            loading = self._loading.setdefault(project_id, threading.Lock())
+
+        # Sessions asking for the same project wait for one load; other projects are not blocked
+        with loading:
+            with self._lock:
+                entry = self._entries.get(project_id)
+                if entry is not None and entry.signature == signature:
+                    self._entries.move_to_end(project_id)
+                    self.hits += 1
+                    return entry
+            tables = tuple(read_table(path) if path else None for path in paths)
+            entry = ProjectData(project_id, project_dir, signature, tables)
+            with self._lock:
+                self.misses += 1
+                self._entries[project_id] = entry
+                self._entries.move_to_end(project_id)
+                self._evict()
+        return entry
+
+    def _evict(self):
+        """Drop least recently used projects until within budget (the newest always stays)"""
+        while len(self._entries) > 1 and self.size() > self.max_bytes:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def size(self):
+        """Bytes held by the cached projects"""
+        return sum(entry.nbytes for entry in list(self._entries.values()))
+
+    def stats(self):
+        """Cache counters for monitoring"""
+        return {
+            'projects': len(self._entries),
+            'bytes': self.size(),
+            'max_bytes': self.max_bytes,
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions
+        }
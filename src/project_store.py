@@ -0,0 +1,144 @@
+"""
+Project discovery and loading for multi-project data directories
+A project is a directory holding the KPI tables (schedule_data.csv, cost_data.csv, ...),
+or a set of tables whose rows carry a Project_ID column
+"""
+
+import fnmatch
+import glob
+import os
+import pandas as pd
+from chunked_analytics import TABLE_FILES, iter_table_chunks, resolve_table_path
+
+PROJECT_COLUMN = 'Project_ID'
+
+def is_project_dir(path):
+    """Check whether a directory holds the schedule table of a project"""
+    try:
+        resolve_table_path(path, 'schedule')
+        return True
+    except FileNotFoundError:
+        return False
+
+def discover_projects(patterns):
+    """Expand paths or glob patterns into a sorted list of project directories
+
+    A matched directory that is not itself a project is searched one level
+    down, so both `data` and `data/projects` are accepted.
+    """
+
+    project_dirs = set()
+    for pattern in patterns:
+        for path in glob.glob(pattern) or [pattern]:
+            if not os.path.isdir(path):
+                continue
+            if is_project_dir(path):
+                project_dirs.add(os.path.normpath(path))
+                continue
+            for child in os.listdir(path):
+                child_path = os.path.join(path, child)
+                if os.path.isdir(child_path) and is_project_dir(child_path):
+                    project_dirs.add(os.path.normpath(child_path))
+
+    return sorted(project_dirs)
+
+def project_name(project_dir):
+    """Default project identifier for a project directory"""
+    return os.path.basename(os.path.normpath(project_dir))
+
+def matches_filter(name, project_filter):
+    """Check a project identifier against a list of fnmatch patterns"""
+    if not project_filter:
+        return True
+    return any(fnmatch.fnmatch(name, pattern) for pattern in project_filter)
+
+def read_table(path):
+    """Read one KPI table from CSV or Parquet with its Date column parsed"""
+
+    if path.endswith('.parquet'):
+        df = pd.read_parquet(path)
+    else:
+        df = pd.read_csv(path)
+    return _parse_dates(df)
+
+def _parse_dates(df):
+    if 'Date' in df.columns:
+        df['Date'] = pd.to_datetime(df['Date'])
+    return df
+
+def _read_project_rows(path, project_ids):
+    """Read the rows of the given Project_ID values (as strings) from a table, in chunks so only they are held"""
+
+    project_ids = set(project_ids)
+    kept = [chunk[chunk[PROJECT_COLUMN].astype(str).isin(project_ids)] for chunk in iter_table_chunks(path)]
+    if not kept:
+        return read_table(path)
+    return _parse_dates(pd.concat(kept, ignore_index=True))
+
+def _project_ids(path):
+    """Distinct Project_ID values of a table, or None when it has no such column; reads only that column"""
+
+    if path.endswith('.parquet'):
+        import pyarrow.parquet as pq
+        if PROJECT_COLUMN not in pq.read_schema(path).names:
+            return None
+        return pd.read_parquet(path, columns=[PROJECT_COLUMN])[PROJECT_COLUMN].unique()
+    if PROJECT_COLUMN not in pd.read_csv(path, nrows=0).columns:
+        return None
+    return pd.read_csv(path, usecols=[PROJECT_COLUMN])[PROJECT_COLUMN].unique()
+
+def project_groups(project_dirs, project_filter=None, groups=1):
+    """Split project directories into (project_dir, project_ids) work items without loading their tables
+
+    A directory whose tables carry Project_ID gives up to `groups` items that
+    share its matching ids (read from that column only); other directories give
+    one item with project_ids None. Directories without a matching project are left out.
+    """
+
+    items = []
+    for project_dir in project_dirs:
+        project_ids = _project_ids(resolve_table_path(project_dir, 'schedule'))
+        if project_ids is None:
+            if matches_filter(project_name(project_dir), project_filter):
+                items.append((project_dir, None))
+            continue
+        matching = [str(project_id) for project_id in project_ids if matches_filter(str(project_id), project_filter)]
+        size = max(1, -(-len(matching) // groups))
+        items.extend((project_dir, tuple(matching[start:start + size])) for start in range(0, len(matching), size))
+    return items
+
+def load_project_tables(project_dir, project_ids=None):
+    """Load the five KPI tables of a project directory
+
+    With `project_ids` (as strings, e.g. a group from project_groups), only
+    the rows of those Project_ID values are kept, reading the tables chunk by
+    chunk, so a worker holds just its own group.
+    Returns a tuple (schedule_df, cost_df, productivity_df, safety_df, quality_df).
+    """
+
+    paths = [resolve_table_path(project_dir, table) for table in TABLE_FILES]
+    if project_ids is None:
+        return tuple(read_table(path) for path in paths)
+    return tuple(_read_project_rows(path, project_ids) for path in paths)
+
+def split_by_project(project_dir, tables, project_filter=None, project_ids=None):
+    """Yield (project_id, tables) pairs, splitting on Project_ID when the tables carry it
+
+    `project_ids` limits a split to those Project_ID values (as strings).
+    """
+
+    if PROJECT_COLUMN not in tables[0].columns:
+        name = project_name(project_dir)
+        if matches_filter(name, project_filter):
+            yield name, tables
+        return
+
+    grouped = [dict(tuple(df.groupby(PROJECT_COLUMN, sort=False))) for df in tables]
+    for project_id in grouped[0]:
+        name = str(project_id)
+        if not matches_filter(name, project_filter) or (project_ids is not None and name not in project_ids):
+            continue
+        yield name, tuple(
+            groups.get(project_id, df.iloc[0:0]).reset_index(drop=True)
+            for groups, df in zip(grouped, tables)
+        )
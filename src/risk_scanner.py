@@ -0,0 +1,245 @@
+"""
+Risk trend scanner
+Evaluates every risk rule of ConstructionAnalytics.identify_risk_trends at every
+reporting period with rolling windows, and turns the result into an onset/resolution timeline
+"""
+
+import pandas as pd
+from rollups import period_length
+
+# Rule id -> (table, risk message); order matches identify_risk_trends
+RISK_RULES = {
+    'spi_downtrend': ('schedule', "Schedule Performance Index trending downward"),
+    'cpi_downtrend': ('cost', "Cost Performance Index trending downward"),
+    'near_miss': ('safety', "Higher than average near-miss incidents"),
+    'pass_rate': ('quality', "Inspection pass rate below 80%"),
+    'rework': ('quality', "High rework costs detected"),
+    'labor_efficiency': ('productivity', "Labor efficiency declining")
+}
+
+# Trailing time window each rule looks at (three or four weekly reports), so the
+# rules mean the same for weekly, daily and per-shift data
+RISK_WINDOWS = {
+    'spi_downtrend': pd.Timedelta(weeks=3),
+    'cpi_downtrend': pd.Timedelta(weeks=3),
+    'near_miss': pd.Timedelta(weeks=4),
+    'pass_rate': pd.Timedelta(weeks=3),
+    'rework': pd.Timedelta(weeks=3),
+    'labor_efficiency': pd.Timedelta(weeks=3)
+}
+
+# Trend analysis needs at least this much schedule history (three weekly reports)
+MIN_HISTORY = pd.Timedelta(weeks=2)
+
+# Near-miss and rework thresholds are per week; per-period values are scaled to weekly rates
+WEEK = pd.Timedelta(weeks=1)
+
+def _rolling_mean(values, window):
+    """Mean of the rows dated within `window` up to and including each row"""
+    return values.rolling(window, min_periods=1).mean()
+
+def _window_first(values, window):
+    """Value at the start of each trailing window (the first row for short windows)"""
+    first = values.index.searchsorted(values.index - window, side='right')
+    return pd.Series(values.to_numpy()[first], index=values.index)
+
+def _downtrend(values, window, threshold):
+    return (_rolling_mean(values, window) < threshold) & (values < _window_first(values, window))
+
+def _weekly_rate(values, window):
+    """Trailing mean of a per-period amount, scaled to a weekly amount"""
+    return _rolling_mean(values, window) * (WEEK / period_length(values.index))
+
+def _by_date(df, column):
+    """A column indexed by its (sorted) Date, as time-based rolling windows need"""
+    return df.set_index(pd.DatetimeIndex(df['Date']))[column].sort_index()
+
+def latest_pass_rate(quality_df):
+    """Inspection pass rate of the latest period with inspections (NaN when there are none)"""
+    rates = quality_df['Inspection_Pass_Rate_Pct'].dropna()
+    return rates.iloc[-1] if len(rates) else float('nan')
+
+def _evaluate_rules(tables):
+    """Return {rule: boolean Series indexed by Date} for every rule whose table has data"""
+
+    flags = {}
+
+    schedule = tables['schedule']
+    if len(schedule):
+        spi = _by_date(schedule, 'SPI')
+        flags['spi_downtrend'] = _downtrend(spi, RISK_WINDOWS['spi_downtrend'], 0.95)
+
+    cost = tables['cost']
+    if len(cost):
+        cpi = _by_date(cost, 'CPI')
+        flags['cpi_downtrend'] = _downtrend(cpi, RISK_WINDOWS['cpi_downtrend'], 0.95)
+
+    safety = tables['safety']
+    if len(safety):
+        near_miss = _by_date(safety, 'Near_Miss_Count')
+        flags['near_miss'] = _weekly_rate(near_miss, RISK_WINDOWS['near_miss']) > 3
+
+    quality = tables['quality']
+    if len(quality):
+        # Mean of the reported pass rates; periods without inspections (NaN) are skipped
+        flags['pass_rate'] = _rolling_mean(_by_date(quality, 'Inspection_Pass_Rate_Pct'), RISK_WINDOWS['pass_rate']) < 80
+        flags['rework'] = _weekly_rate(_by_date(quality, 'Rework_Cost'), RISK_WINDOWS['rework']) > 10000
+
+    productivity = tables['productivity']
+    if len(productivity):
+        efficiency = _by_date(productivity, 'Labor_Hours_Per_Unit')
+        window = RISK_WINDOWS['labor_efficiency']
+        has_history = efficiency.rolling(window, min_periods=1).count() > 1
+        flags['labor_efficiency'] = has_history & (efficiency > _rolling_mean(efficiency, window) * 1.2)
+
+    return flags
+
+def scan_risk_history(schedule_df, cost_df, productivity_df, safety_df, quality_df):
+    """Evaluate every risk rule at every reporting period
+
+    Returns a DataFrame indexed by Date with one boolean column per rule in
+    RISK_RULES. Each rule keeps its last evaluated state on dates its own table
+    does not report, and periods within MIN_HISTORY of the first schedule date
+    are all False.
+    """
+
+    tables = {
+        'schedule': schedule_df,
+        'cost': cost_df,
+        'productivity': productivity_df,
+        'safety': safety_df,
+        'quality': quality_df
+    }
+    flags = _evaluate_rules(tables)
+
+    dates = pd.DatetimeIndex(sorted(set().union(*[series.index for series in flags.values()]))) if flags else pd.DatetimeIndex([])
+    history = pd.DataFrame(index=dates)
+    history.index.name = 'Date'
+    for rule in RISK_RULES:
+        if rule in flags:
+            rule_flags = flags[rule]
+            rule_flags = rule_flags[~rule_flags.index.duplicated(keep='last')]
+            history[rule] = rule_flags.reindex(dates).ffill().fillna(False).astype(bool)
+        else:
+            history[rule] = False
+
+    if len(schedule_df) and len(history):
+        first_valid = pd.Timestamp(schedule_df['Date'].min()) + MIN_HISTORY
+        history.loc[history.index < first_valid, :] = False
+
+    return history
+
+def risk_events(history):
+    """Turn a risk history into an onset/resolution timeline
+
+    Returns one row per risk episode with Rule, Risk, Onset, Resolved (NaT
+    while still active) and Periods (number of flagged periods).
+    """
+
+    columns = ['Rule', 'Risk', 'Onset', 'Resolved', 'Periods']
+    if len(history) == 0:
+        return pd.DataFrame(columns=columns)
+
+    events = []
+    dates = history.index
+    for rule in history.columns:
+        active = history[rule].astype(int)
+        change = active.diff().fillna(active.iloc[0])
+        onsets = dates[(change == 1).to_numpy()]
+        resolutions = dates[(change == -1).to_numpy()]
+        positions = pd.Series(range(len(dates)), index=dates)
+
+        for i, onset in enumerate(onsets):
+            resolved = resolutions[i] if i < len(resolutions) else pd.NaT
+            end_position = positions[resolved] if resolved is not pd.NaT else len(dates)
+            events.append({
+                'Rule': rule,
+                'Risk': RISK_RULES[rule][1],
+                'Onset': onset,
+                'Resolved': resolved,
+                'Periods': int(end_position - positions[onset])
+            })
+
+    return pd.DataFrame(events, columns=columns).sort_values(['Onset', 'Rule']).reset_index(drop=True)
+
+def active_risks(history):
+    """Risk messages active at the latest period of a history"""
+    if len(history) == 0:
+        return []
+    latest = history.iloc[-1]
+    return [RISK_RULES[rule][1] for rule in RISK_RULES if latest[rule]]
+
+def new_risks(history):
+    """Risk messages whose onset is the latest period of a history"""
+    if len(history) == 0:
+        return []
+    latest = history.iloc[-1]
+    previous = history.iloc[-2] if len(history) > 1 else pd.Series(False, index=history.columns)
+    return [RISK_RULES[rule][1] for rule in RISK_RULES if latest[rule] and not previous[rule]]
+
+def attribute_labor_efficiency(crew_df, as_of=None, window=RISK_WINDOWS['labor_efficiency']):
+    """Crews behind a rise in labor hours per unit in the latest week of a crew productivity table
+
+    `crew_df` has Date (week), Crew, Code, Labor_Hours and Quantity rows, as
+    written by timesheets.py. Each crew's latest hours on an activity are
+    compared with the hours its installed quantity would have taken at the
+    crew's own hours-per-unit rate over the preceding `window`. Returns one
+    row per crew that overran (Crew, Labor_Hours, Expected_Hours,
+    Excess_Hours and the Code it overran most on), largest overrun first.
+    """
+
+    columns = ['Crew', 'Labor_Hours', 'Expected_Hours', 'Excess_Hours', 'Code']
+    dates = pd.to_datetime(crew_df['Date'])
+    if as_of is not None:
+        crew_df, dates = crew_df[dates <= as_of], dates[dates <= as_of]
+    if len(crew_df) == 0:
+        return pd.DataFrame(columns=columns)
+
+    latest = dates.max()
+    current = crew_df[dates == latest]
+    baseline = crew_df[(dates < latest) & (dates > latest - window)]
+    rates = baseline.groupby(['Crew', 'Code'], observed=True)[['Labor_Hours', 'Quantity']].sum()
+    rates = (rates['Labor_Hours'] / rates['Quantity'].where(rates['Quantity'] > 0)).dropna().rename('Rate')
+
+    current = current.join(rates, on=['Crew', 'Code'], how='inner')
+    current = current.assign(Expected_Hours=current['Quantity'] * current['Rate'])
+    current = current.assign(Excess_Hours=current['Labor_Hours'] - current['Expected_Hours'])
+    if len(current) == 0:
+        return pd.DataFrame(columns=columns)
+
+    crews = current.groupby('Crew', observed=True)[['Labor_Hours', 'Expected_Hours', 'Excess_Hours']].sum()
+    crews['Code'] = current.loc[current.groupby('Crew', observed=True)['Excess_Hours'].idxmax().to_numpy(), ['Crew', 'Code']].set_index('Crew')['Code']
+    crews = crews[crews['Excess_Hours'] > 0].sort_values('Excess_Hours', ascending=False).round(1)
+    return crews.reset_index()[columns]
+
+def scan_recent_risks(schedule_df, cost_df, productivity_df, safety_df, quality_df, periods=2):
+    """Scan only the rows needed to evaluate the last `periods` periods"""
+
+    tables = (schedule_df, cost_df, productivity_df, safety_df, quality_df)
+    if len(schedule_df) == 0:
+        return scan_risk_history(*tables).tail(periods)
+
+    # Rows within the longest window of the first evaluated schedule date
+    first_evaluated = pd.Timestamp(schedule_df['Date'].iloc[-min(periods, len(schedule_df))])
+    start = first_evaluated - max(RISK_WINDOWS.values())
+    history = scan_risk_history(*[df[pd.to_datetime(df['Date']) > start] for df in tables])
+    history.loc[history.index < pd.Timestamp(schedule_df['Date'].iloc[0]) + MIN_HISTORY, :] = False
+    return history.tail(periods)
+
+def portfolio_new_risks(projects):
+    """List risks that started in each project's latest period across a portfolio
+
+    `projects` maps project id to its (schedule, cost, productivity, safety,
+    quality) tables. Only the trailing rows of each project are scanned.
+    Returns a DataFrame with Project, Date and Risk columns.
+    """
+
+    rows = []
+    for project_id, tables in projects.items():
+        history = scan_recent_risks(*tables)
+        if len(history) == 0:
+            continue
+        for risk in new_risks(history):
+            rows.append({'Project': project_id, 'Date': history.index[-1], 'Risk': risk})
+
+    return pd.DataFrame(rows, columns=['Project', 'Date', 'Risk'])
@@ -0,0 +1,319 @@
+"""
+Pre-aggregated KPI rollups
+Builds daily, weekly, monthly and quarterly tables from the raw KPI tables
+(reported per shift, day or week) with the right aggregate per column, and picks
+the resolution that fits a chart's point budget
+"""
+
+import os
+import numpy as np
+import pandas as pd
+
+# Resolution -> pandas period frequency, finest first. Shift rows are only ever raw
+RESOLUTIONS = {
+    'shift': None,
+    'daily': 'D',
+    'weekly': 'W',
+    'monthly': 'M',
+    'quarterly': 'Q'
+}
+
+# Approximate days per point at each resolution, for point-budget estimates
+RESOLUTION_DAYS = {
+    'shift': 1 / 3,
+    'daily': 1,
+    'weekly': 7,
+    'monthly': 30.44,
+    'quarterly': 91.31
+}
+
+RESOLUTION_LABELS = {
+    'shift': 'Per-Shift',
+    'daily': 'Daily',
+    'weekly': 'Weekly',
+    'monthly': 'Monthly',
+    'quarterly': 'Quarterly'
+}
+
+# Resolution -> finer resolutions whose periods nest inside its periods, so a
+# rollup can be built from them instead of the raw rows (weeks straddle months)
+NESTED_RESOLUTIONS = {
+    'weekly': ['daily'],
+    'monthly': ['daily'],
+    'quarterly': ['monthly', 'daily']
+}
+
+# Default number of points a time-series chart should plot
+DEFAULT_POINT_BUDGET = 120
+
+# Column -> aggregate. 'last' is used for cumulative values and end-of-period
+# states, 'sum' for flows, 'mean' for rates (weighted by Periods when merging),
+# 'ratio' for columns recomputed from their components after aggregation
+ROLLUP_RULES = {
+    'schedule': {
+        'Week': 'last',
+        'Planned_Progress_Pct': 'last',
+        'Actual_Progress_Pct': 'last',
+        'Planned_Value': 'last',
+        'Earned_Value': 'last',
+        'SPI': 'ratio',
+        'Days_Variance': 'last'
+    },
+    'cost': {
+        'Week': 'last',
+        'Weekly_Budget': 'sum',
+        'Weekly_Actual': 'sum',
+        'Cumulative_Budget': 'last',
+        'Cumulative_Spent': 'last',
+        'CPI': 'ratio',
+        'Forecasted_Cost': 'last',
+        'Cost_Variance': 'last'
+    },
+    'productivity': {
+        'Week': 'last',
+        'Labor_Hours': 'sum',
+        'Work_Units': 'sum',
+        'Labor_Hours_Per_Unit': 'ratio',
+        'Equipment_Utilization_Pct': 'mean',
+        'Material_Waste_Pct': 'mean'
+    },
+    'safety': {
+        'Week': 'last',
+        'Incident_Occurred': 'max',
+        'Incident_Count': 'sum',
+        'Near_Miss_Count': 'sum',
+        'Days_Since_Last_Incident': 'last',
+        'TRIR': 'ratio'
+    },
+    'quality': {
+        'Week': 'last',
+        'Inspections_Conducted': 'sum',
+        'Inspections_Passed': 'sum',
+        'Inspection_Pass_Rate_Pct': 'ratio',
+        'Punch_List_Items': 'sum',
+        'Rework_Cost': 'sum'
+    }
+}
+
+TABLES = list(ROLLUP_RULES)
+
+def _ratio(numerator, denominator, fallback):
+    ratio = numerator / denominator.where(denominator > 0)
+    return ratio.fillna(fallback)
+
+def _aggregate(df, rules, keys):
+    """Group `df` (with Period, Date and Periods columns) by Period using `rules`"""
+
+    df = df.sort_values('Date')
+    grouped = df.groupby(keys, sort=True)
+    result = pd.DataFrame({'Date': grouped['Date'].max(), 'Periods': grouped['Periods'].sum()})
+
+    for column, rule in rules.items():
+        if column not in df.columns:
+            continue
+        if rule == 'sum':
+            result[column] = grouped[column].sum()
+        elif rule == 'max':
+            result[column] = grouped[column].max()
+        elif rule == 'mean':
+            # Weighted by the number of weekly rows so partial rollups merge exactly
+            weighted = (df[column] * df['Periods']).groupby([df[key] for key in keys]).sum()
+            result[column] = weighted / result['Periods']
+        else:
+            # 'last' columns, and ratio columns until their components are known
+            result[column] = grouped[column].last()
+
+    return result.reset_index()
+
+def _recompute_ratios(rollups):
+    """Recompute SPI, CPI, labor hours per unit, TRIR and pass rate from their components"""
+
+    schedule = rollups.get('schedule')
+    if schedule is not None and len(schedule):
+        schedule['SPI'] = _ratio(schedule['Earned_Value'], schedule['Planned_Value'], 1.0).round(3)
+
+    cost = rollups.get('cost')
+    if cost is not None and len(cost) and schedule is not None and len(schedule):
+        earned_value = cost['Period'].map(schedule.set_index('Period')['Earned_Value'])
+        cpi = _ratio(earned_value, cost['Cumulative_Spent'], 1.0).round(3)
+        cost['CPI'] = cpi.where(earned_value.notna(), cost['CPI'])
+
+    productivity = rollups.get('productivity')
+    if productivity is not None and len(productivity):
+        productivity['Labor_Hours_Per_Unit'] = _ratio(productivity['Labor_Hours'], productivity['Work_Units'], 40).round(2)
+
+    safety = rollups.get('safety')
+    if safety is not None and len(safety) and productivity is not None and len(productivity):
+        # TRIR is cumulative: incidents to date per 200,000 hours worked to date
+        hours = safety['Period'].map(productivity.set_index('Period')['Labor_Hours']).fillna(0)
+        trir = _ratio(safety['Incident_Count'].cumsum() * 200000, hours.cumsum(), 0.0).round(2)
+        safety['TRIR'] = trir.where(hours.cumsum() > 0, safety['TRIR'])
+
+    quality = rollups.get('quality')
+    if quality is not None and len(quality):
+        quality['Inspection_Pass_Rate_Pct'] = _ratio(quality['Inspections_Passed'] * 100, quality['Inspections_Conducted'], np.nan).round(1)
+
+    return rollups
+
+def _prepare_rows(df, table, freq):
+    """Raw rows with the Period, Periods and derived columns rollups aggregate"""
+
+    rows = df.copy()
+    rows['Date'] = pd.to_datetime(rows['Date'])
+    rows['Period'] = rows['Date'].dt.to_period(freq).astype(str)
+    rows['Periods'] = 1
+    if table == 'safety':
+        rows['Incident_Count'] = rows['Incident_Occurred'].astype(int)
+    return rows
+
+def _finish(df, rules):
+    columns = ['Period', 'Date'] + [column for column in rules if column in df.columns] + ['Periods']
+    return df[columns]
+
+def period_length(dates):
+    """Typical spacing of reporting dates (median gap; 7 days for fewer than two dates)"""
+
+    dates = pd.DatetimeIndex(pd.to_datetime(pd.Series(dates)).dropna().unique()).sort_values()
+    if len(dates) < 2:
+        return pd.Timedelta(days=7)
+    return pd.Timedelta(np.median(np.diff(dates.to_numpy(dtype='datetime64[ns]')).astype('int64')))
+
+def infer_resolution(dates):
+    """Resolution whose period length is closest to the spacing of `dates`"""
+
+    days = period_length(dates) / pd.Timedelta(days=1)
+    return min(RESOLUTION_DAYS, key=lambda resolution: abs(np.log(RESOLUTION_DAYS[resolution] / days)))
+
+def build_rollups(tables, resolution='monthly'):
+    """Roll the raw KPI tables up to `resolution`
+
+    `tables` maps table name ('schedule', 'cost', 'productivity', 'safety',
+    'quality') to its raw DataFrame (one row per shift, day or week). Each
+    rollup row carries Period (e.g. '2024-03' or '2024Q1'), Date (last
+    reporting date in the period) and Periods (raw rows aggregated).
+    """
+
+    freq = RESOLUTIONS[resolution]
+    rollups = {}
+    for table, df in tables.items():
+        if table not in ROLLUP_RULES or df is None:
+            continue
+        rules = ROLLUP_RULES[table]
+        if len(df) == 0:
+            rollups[table] = pd.DataFrame(columns=['Period', 'Date'] + list(rules) + ['Periods'])
+            continue
+        rows = _prepare_rows(df, table, freq)
+        rollups[table] = _finish(_aggregate(rows, rules, ['Period']), rules)
+
+    return _recompute_ratios(rollups)
+
+def coarsen_rollups(rollups, resolution='quarterly'):
+    """Roll existing (finer) rollups up to a coarser resolution, e.g. monthly to quarterly"""
+
+    freq = RESOLUTIONS[resolution]
+    coarse = {}
+    for table, df in rollups.items():
+        rules = ROLLUP_RULES[table]
+        df = df.copy()
+        df['Period'] = pd.to_datetime(df['Date']).dt.to_period(freq).astype(str)
+        coarse[table] = _finish(_aggregate(df, rules, ['Period']), rules) if len(df) else df
+
+    return _recompute_ratios(coarse)
+
+def update_rollups(rollups, new_tables, resolution='monthly'):
+    """Fold newly reported raw rows into existing rollups of the same resolution
+
+    Only the periods the new rows fall in are re-aggregated, by merging their
+    partial rollup rows with the stored ones.
+    """
+
+    partial = build_rollups(new_tables, resolution)
+    merged = {}
+    for table in set(rollups) | set(partial):
+        rules = ROLLUP_RULES[table]
+        frames = [df for df in (rollups.get(table), partial.get(table)) if df is not None and len(df)]
+        if not frames:
+            merged[table] = rollups.get(table, partial.get(table))
+            continue
+        combined = pd.concat(frames, ignore_index=True)
+        merged[table] = _finish(_aggregate(combined, rules, ['Period']), rules)
+
+    return _recompute_ratios(merged)
+
+def coarser_resolutions(resolution):
+    """Resolutions coarser than `resolution`, finest first"""
+    names = list(RESOLUTIONS)
+    return names[names.index(resolution) + 1:]
+
+def build_all_rollups(tables, resolution=None):
+    """Rollups at every resolution coarser than the raw tables' `resolution`
+
+    The raw resolution is inferred from the schedule dates when not given.
+    Each rollup is coarsened from a finer rollup that nests in it (quarterly
+    from monthly, weekly and monthly from daily) and otherwise built from the
+    raw rows.
+    """
+
+    resolution = resolution or infer_resolution(tables['schedule']['Date'])
+    all_rollups = {}
+    for target in coarser_resolutions(resolution):
+        source = next((finer for finer in NESTED_RESOLUTIONS.get(target, []) if finer in all_rollups), None)
+        all_rollups[target] = coarsen_rollups(all_rollups[source], target) if source else build_rollups(tables, target)
+    return all_rollups
+
+def choose_resolution(start_date, end_date, point_budget=DEFAULT_POINT_BUDGET, finest='shift'):
+    """Finest resolution (no finer than `finest`) whose point count for the range fits `point_budget`
+
+    Falls back to the coarsest resolution when even that exceeds the budget.
+    """
+
+    days = (pd.Timestamp(end_date) - pd.Timestamp(start_date)).days + 1
+    for resolution in [finest] + coarser_resolutions(finest):
+        if days / RESOLUTION_DAYS[resolution] <= point_budget:
+            return resolution
+    return list(RESOLUTIONS)[-1]
+
+def filter_range(df, start_date, end_date):
+    """Rows whose reporting Date falls within [start_date, end_date]"""
+    dates = pd.to_datetime(df['Date']).dt.date
+    return df.loc[(dates >= start_date) & (dates <= end_date)]
+
+def tables_for_range(raw_tables, rollups, start_date, end_date, point_budget=DEFAULT_POINT_BUDGET, resolution=None):
+    """KPI tables for a date range at the chosen (or given) resolution
+
+    A resolution at or finer than the raw tables' gives the raw rows.
+    Returns (resolution, tables) where tables maps table name to the rows
+    within the range.
+    """
+
+    raw_resolution = infer_resolution(raw_tables['schedule']['Date'])
+    resolution = resolution or choose_resolution(start_date, end_date, point_budget, finest=raw_resolution)
+    if resolution not in rollups:
+        resolution = raw_resolution
+    source = rollups.get(resolution, raw_tables)
+    return resolution, {table: filter_range(df, start_date, end_date) for table, df in source.items()}
+
+def rollup_path(rollup_dir, table, resolution):
+    return os.path.join(rollup_dir, f"{table}_{resolution}.csv")
+
+def write_rollups(all_rollups, rollup_dir):
+    """Write {resolution: {table: df}} rollups as CSV files under `rollup_dir`"""
+
+    os.makedirs(rollup_dir, exist_ok=True)
+    for resolution, rollups in all_rollups.items():
+        for table, df in rollups.items():
+            df.to_csv(rollup_path(rollup_dir, table, resolution), index=False)
+
+def read_rollups(rollup_dir, resolutions=('daily', 'weekly', 'monthly', 'quarterly')):
+    """Read rollups written by write_rollups; missing tables are skipped"""
+
+    all_rollups = {}
+    for resolution in resolutions:
+        rollups = {}
+        for table in TABLES:
+            path = rollup_path(rollup_dir, table, resolution)
+            if os.path.exists(path):
+                rollups[table] = pd.read_csv(path, parse_dates=['Date'], dtype={'Period': str})
+        if rollups:
+            all_rollups[resolution] = rollups
+    return all_rollups
@@ -0,0 +1,199 @@
+"""
+Versioned KPI snapshots and "as of" queries
+Each snapshot is a small manifest listing content-addressed row chunks (one per
+table and calendar quarter), so unchanged quarters are stored once across all
+versions and a restated week only adds a new chunk for its quarter
+"""
+
+import gzip
+import hashlib
+import io
+import json
+import os
+from datetime import datetime
+import pandas as pd
+from chunked_analytics import TABLE_FILES
+
+# Tables kept in a snapshot: table -> file stem in the data directory
+SNAPSHOT_TABLES = dict(TABLE_FILES, critical_path='critical_path_tasks', cost_breakdown='cost_breakdown')
+
+SNAPSHOT_DIR = 'snapshots'
+
+# Rows of dated tables are chunked by this period of their Date
+CHUNK_PERIOD = 'Q'
+
+def snapshot_dir(data_dir='data'):
+    """Snapshot store of a data directory"""
+    return os.path.join(data_dir, SNAPSHOT_DIR)
+
+def _chunk_path(store_dir, digest):
+    return os.path.join(store_dir, 'chunks', digest[:2], digest + '.csv.gz')
+
+def _write_chunk(store_dir, text):
+    """Store rows (CSV text without header) under their hash; existing chunks are reused"""
+
+    data = text.encode('utf-8')
+    digest = hashlib.sha256(data).hexdigest()
+    path = _chunk_path(store_dir, digest)
+    if not os.path.exists(path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        temporary = path + '.tmp'
+        with open(temporary, 'wb') as stream:
+            stream.write(gzip.compress(data, mtime=0))
+        os.replace(temporary, path)
+    return digest
+
+def _read_chunk(store_dir, digest):
+    with open(_chunk_path(store_dir, digest), 'rb') as stream:
+        return gzip.decompress(stream.read()).decode('utf-8')
+
+def format_as_of(as_of):
+    """As-of text at full resolution: the date alone at midnight, otherwise with the time of day"""
+
+    as_of = pd.Timestamp(as_of)
+    return as_of.strftime('%Y-%m-%d') if as_of == as_of.normalize() else as_of.strftime('%Y-%m-%d %H:%M:%S')
+
+def _table_chunks(df):
+    """CSV text of a table's rows split into chunks by calendar period of Date
+
+    Datetime columns keep their time of day (per-shift rows), and are written
+    as plain dates when every value in the chunk is at midnight.
+    """
+
+    if len(df) == 0:
+        return []
+    if 'Date' not in df.columns:
+        return [df.to_csv(index=False, header=False)]
+    dates = pd.to_datetime(df['Date'])
+    periods = dates.dt.to_period(CHUNK_PERIOD)
+    return [
+        rows.to_csv(index=False, header=False)
+        for _, rows in df.groupby(periods.to_numpy(), sort=True)
+    ]
+
+def _manifests_dir(store_dir):
+    return os.path.join(store_dir, 'manifests')
+
+def list_snapshots(store_dir):
+    """Snapshots in the store, oldest first, as a DataFrame (Version, As_Of, Created, Rows)"""
+
+    directory = _manifests_dir(store_dir)
+    rows = []
+    if os.path.isdir(directory):
+        for name in sorted(os.listdir(directory)):
+            if not name.endswith('.json'):
+                continue
+            with open(os.path.join(directory, name), encoding='utf-8') as stream:
+                manifest = json.load(stream)
+            rows.append({
+                'Version': name[:-len('.json')],
+                'As_Of': pd.Timestamp(manifest['as_of']),
+                'Created': pd.Timestamp(manifest['created']),
+                'Rows': sum(table['rows'] for table in manifest['tables'].values())
+            })
+    return pd.DataFrame(rows, columns=['Version', 'As_Of', 'Created', 'Rows'])
+
+def _read_manifest(store_dir, version):
+    with open(os.path.join(_manifests_dir(store_dir), version + '.json'), encoding='utf-8') as stream:
+        return json.load(stream)
+
+def take_snapshot(data_dir='data', store_dir=None, as_of=None):
+    """Record the current tables of `data_dir` as a new snapshot
+
+    `as_of` defaults to the latest schedule Date. Snapshots are append-only:
+    a new version is written even for an as_of that already has one (e.g.
+    restated actuals), unless nothing changed since the latest version.
+    Returns the version id.
+    """
+
+    store_dir = store_dir or snapshot_dir(data_dir)
+    tables = {}
+    for table, stem in SNAPSHOT_TABLES.items():
+        path = os.path.join(data_dir, stem + '.csv')
+        parquet_path = os.path.join(data_dir, stem + '.parquet')
+        if os.path.exists(parquet_path):
+            tables[table] = pd.read_parquet(parquet_path)
+        elif os.path.exists(path):
+            tables[table] = pd.read_csv(path)
+
+    if as_of is None:
+        as_of = pd.to_datetime(tables['schedule']['Date']).max()
+    as_of = format_as_of(as_of)
+
+    manifest_tables = {}
+    for table, df in tables.items():
+        manifest_tables[table] = {
+            'columns': list(df.columns),
+            'rows': len(df),
+            'chunks': [_write_chunk(store_dir, text) for text in _table_chunks(df)]
+        }
+
+    existing = list_snapshots(store_dir)
+    if len(existing):
+        latest = existing.sort_values('Created').iloc[-1]
+        if latest['As_Of'] == pd.Timestamp(as_of) and _read_manifest(store_dir, latest['Version'])['tables'] == manifest_tables:
+            print(f"✅ Data unchanged since snapshot {latest['Version']}")
+            return latest['Version']
+
+    created = datetime.now()
+    version = f"{as_of.replace(' ', 'T').replace(':', '')}__{created:%Y%m%dT%H%M%S%f}"
+    os.makedirs(_manifests_dir(store_dir), exist_ok=True)
+    with open(os.path.join(_manifests_dir(store_dir), version + '.json'), 'w', encoding='utf-8') as stream:
+        json.dump({'as_of': as_of, 'created': created.isoformat(), 'tables': manifest_tables}, stream)
+    print(f"✅ Snapshot {version} stored in {store_dir} ({store_size(store_dir) / 1e6:.1f} MB total)")
+    return version
+
+def resolve_snapshot(store_dir, as_of=None):
+    """Version id of the snapshot in effect at `as_of` (the latest one by default)
+
+    That is the most recently created snapshot whose as_of is on or before
+    the requested date and time. Returns None when there is none.
+    """
+
+    snapshots = list_snapshots(store_dir)
+    if as_of is not None:
+        snapshots = snapshots[snapshots['As_Of'] <= pd.Timestamp(as_of)]
+    if len(snapshots) == 0:
+        return None
+    return snapshots.sort_values(['As_Of', 'Created']).iloc[-1]['Version']
+
+def load_snapshot(store_dir, as_of=None, version=None):
+    """Tables of a snapshot, in load_data order
+
+    Returns (schedule_df, cost_df, productivity_df, safety_df, quality_df,
+    critical_path_df, cost_breakdown_df); tables missing from the snapshot
+    are None.
+    """
+
+    version = version or resolve_snapshot(store_dir, as_of)
+    if version is None:
+        raise FileNotFoundError(f"No snapshot in {store_dir} as of {as_of}")
+    manifest = _read_manifest(store_dir, version)
+
+    tables = []
+    for table in SNAPSHOT_TABLES:
+        entry = manifest['tables'].get(table)
+        if entry is None:
+            tables.append(None)
+            continue
+        text = ''.join(_read_chunk(store_dir, digest) for digest in entry['chunks'])
+        df = pd.read_csv(io.StringIO(text), names=entry['columns'], header=None) if text else pd.DataFrame(columns=entry['columns'])
+        if 'Date' in df.columns:
+            df['Date'] = pd.to_datetime(df['Date'])
+        tables.append(df)
+    return tuple(tables)
+
+def analytics_as_of(store_dir, as_of):
+    """ConstructionAnalytics over the snapshot in effect at `as_of`, cut off at that date"""
+
+    from analytics import ConstructionAnalytics
+    tables = load_snapshot(store_dir, as_of)
+    return ConstructionAnalytics(*tables[:5], as_of=as_of)
+
+def store_size(store_dir):
+    """Bytes used by the snapshot store"""
+    return sum(
+        os.path.getsize(os.path.join(root, name))
+        for root, _, names in os.walk(store_dir)
+        for name in names
+    )
@@ -0,0 +1,295 @@
+"""
+Static executive reports
+Renders one page per project (KPI tiles, trend charts, top risks) to PDF or PNG
+with matplotlib's Agg backend, across worker processes. Each worker builds the
+page figure once and only swaps the data in; reports whose data did not change
+since the last run are skipped by content hash
+"""
+
+import hashlib
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+import matplotlib
+matplotlib.use('Agg')
+import matplotlib.dates as mdates
+import matplotlib.pyplot as plt
+from matplotlib.patches import Rectangle
+import pandas as pd
+from analytics import ConstructionAnalytics
+from excel_templates import project_slug
+from portfolio import health_status
+from project_store import discover_projects, load_project_tables, project_groups, project_name, split_by_project
+from risk_scanner import latest_pass_rate
+
+REPORT_FORMATS = ('pdf', 'png')
+MANIFEST_FILE = '.render_manifest.json'
+
+# Bump when the page layout changes so cached reports are re-rendered
+LAYOUT_VERSION = 1
+
+PAGE_SIZE = (11.69, 8.27)  # A4 landscape, inches
+PNG_DPI = 110
+
+STATUS_COLORS = {
+    'good': '#2e7d32',
+    'warning': '#f9a825',
+    'poor': '#c62828',
+    'neutral': '#1f4e79'
+}
+
+# Tile label, formatter, status rule
+KPI_TILES = [
+    ('Health Score', '{:.0f}/100', lambda v: 'good' if v >= 80 else 'warning' if v >= 60 else 'poor'),
+    ('SPI', '{:.3f}', lambda v: 'good' if v >= 1.0 else 'warning' if v >= 0.9 else 'poor'),
+    ('CPI', '{:.3f}', lambda v: 'good' if v >= 1.0 else 'warning' if v >= 0.9 else 'poor'),
+    ('Progress', '{:.1f}%', lambda v: 'neutral'),
+    ('TRIR', '{:.2f}', lambda v: 'good' if v <= 2.0 else 'warning' if v <= 4.0 else 'poor'),
+    ('Pass Rate', '{:.1f}%', lambda v: 'good' if v >= 85 else 'warning' if v >= 75 else 'poor')
+]
+
+_page = None
+
+def data_hash(tables, project_id):
+    """Content hash of a project's KPI tables (plus the layout version)"""
+
+    digest = hashlib.sha1(f'{LAYOUT_VERSION}:{project_id}'.encode('utf-8'))
+    for df in tables:
+        digest.update(','.join(map(str, df.columns)).encode('utf-8'))
+        digest.update(pd.util.hash_pandas_object(df, index=False).to_numpy().tobytes())
+    return digest.hexdigest()
+
+def report_content(project_id, tables):
+    """Values drawn on a project's page"""
+
+    schedule_df, cost_df, productivity_df, safety_df, quality_df = tables
+    analytics = ConstructionAnalytics(*tables)
+    health = analytics.calculate_project_health_score()
+    latest_schedule = schedule_df.iloc[-1]
+    latest_cost = cost_df.iloc[-1]
+    return {
+        'project': project_id,
+        'report_date': pd.Timestamp(latest_schedule['Date']),
+        'status': health_status(health),
+        'tiles': [
+            health,
+            latest_schedule['SPI'],
+            latest_cost['CPI'],
+            latest_schedule['Actual_Progress_Pct'],
+            safety_df['TRIR'].iloc[-1] if len(safety_df) else float('nan'),
+            latest_pass_rate(quality_df)
+        ],
+        'completion': analytics.predict_completion_date(),
+        'eac': analytics.calculate_earned_value_metrics().get('EAC'),
+        'risks': analytics.identify_risk_trends()[:3],
+        'tables': tables
+    }
+
+def _build_page():
+    """Create the page figure once; returns the figure and the artists updated per project"""
+
+    fig = plt.figure(figsize=PAGE_SIZE)
+    grid = fig.add_gridspec(2, 6, hspace=0.35, wspace=0.35, left=0.05, right=0.97, top=0.66, bottom=0.06)
+    page = {'figure': fig}
+    page['title'] = fig.text(0.05, 0.955, '', parse_math=False, fontsize=18, weight='bold', color=STATUS_COLORS['neutral'])
+    page['subtitle'] = fig.text(0.97, 0.955, '', parse_math=False, fontsize=10, ha='right', color='#555555')
+    page['info'] = fig.text(0.05, 0.9, '', parse_math=False, fontsize=9.5, va='center', color='#333333')
+
+    # KPI tiles are figure-level patches, which draw much faster than axes
+    page['tiles'] = []
+    width = (0.97 - 0.05 - 5 * 0.02) / len(KPI_TILES)
+    for column, (label, _, _) in enumerate(KPI_TILES):
+        left = 0.05 + column * (width + 0.02)
+        tile = Rectangle((left, 0.72), width, 0.1, transform=fig.transFigure, linewidth=0)
+        fig.patches.append(tile)
+        fig.text(left + width / 2, 0.8, label, ha='center', va='center', fontsize=9, color='white')
+        value = fig.text(left + width / 2, 0.755, '', ha='center', va='center', fontsize=17, weight='bold', color='white')
+        page['tiles'].append((tile, value))
+
+    progress = fig.add_subplot(grid[0, :3])
+    progress.set_title('Progress: Planned vs Actual (%)', fontsize=10, loc='left')
+    page['planned'], = progress.plot([], [], color='#90a4ae', linestyle='--', label='Planned')
+    page['actual'], = progress.plot([], [], color=STATUS_COLORS['neutral'], linewidth=2, label='Actual')
+    progress.legend(fontsize=8, loc='upper left')
+
+    indices = fig.add_subplot(grid[0, 3:])
+    indices.set_title('Performance Indices', fontsize=10, loc='left')
+    indices.axhline(1.0, color='#bdbdbd', linewidth=1)
+    page['spi'], = indices.plot([], [], color='#1565c0', label='SPI')
+    page['cpi'], = indices.plot([], [], color='#ef6c00', label='CPI')
+    indices.legend(fontsize=8, loc='lower left')
+
+    cost = fig.add_subplot(grid[1, :3])
+    cost.set_title('Cumulative Cost ($M)', fontsize=10, loc='left')
+    page['budget'], = cost.plot([], [], color='#90a4ae', linestyle='--', label='Budget')
+    page['spent'], = cost.plot([], [], color='#c62828', linewidth=2, label='Spent')
+    cost.legend(fontsize=8, loc='upper left')
+
+    safety = fig.add_subplot(grid[1, 3:])
+    safety.set_title('TRIR and Inspection Pass Rate', fontsize=10, loc='left')
+    page['trir'], = safety.plot([], [], color='#6a1b9a', label='TRIR')
+    pass_rate_axis = safety.twinx()
+    page['pass_rate'], = pass_rate_axis.plot([], [], color='#2e7d32', alpha=0.8, label='Pass Rate %')
+    safety.legend(handles=[page['trir'], page['pass_rate']], fontsize=8, loc='upper right')
+
+    page['charts'] = [progress, indices, cost, safety, pass_rate_axis]
+    for ax in page['charts']:
+        ax.tick_params(labelsize=8)
+        ax.grid(True, alpha=0.25)
+        ax.xaxis_date()
+        locator = mdates.AutoDateLocator(maxticks=8)
+        ax.xaxis.set_major_locator(locator)
+        ax.xaxis.set_major_formatter(mdates.ConciseDateFormatter(locator))
+    return page
+
+def page_template():
+    """This process's page figure, built on first use"""
+    global _page
+    if _page is None:
+        _page = _build_page()
+    return _page
+
+def _set_series(line, dates, values):
+    line.set_data(pd.to_datetime(dates).to_numpy(), values.to_numpy(dtype=float))
+
+def draw_report(content):
+    """Fill the page template with one project's content; returns the figure"""
+
+    page = page_template()
+    schedule_df, cost_df, _, safety_df, quality_df = content['tables']
+
+    page['title'].set_text(content['project'])
+    page['subtitle'].set_text(f"Executive summary · week ending {content['report_date']:%Y-%m-%d} · {content['status']}")
+    eac = f"${content['eac']:,.0f}" if content['eac'] else 'N/A'
+    risks = '; '.join(content['risks']) or 'None'
+    page['info'].set_text(f"Predicted completion: {content['completion']}    Estimated final cost: {eac}\nTop risks: {risks}")
+
+    for (tile, text), (_, fmt, rule), value in zip(page['tiles'], KPI_TILES, content['tiles']):
+        if pd.isna(value):
+            text.set_text('N/A')
+            tile.set_facecolor('#9e9e9e')
+        else:
+            text.set_text(fmt.format(value))
+            tile.set_facecolor(STATUS_COLORS[rule(value)])
+
+    _set_series(page['planned'], schedule_df['Date'], schedule_df['Planned_Progress_Pct'])
+    _set_series(page['actual'], schedule_df['Date'], schedule_df['Actual_Progress_Pct'])
+    _set_series(page['spi'], schedule_df['Date'], schedule_df['SPI'])
+    _set_series(page['cpi'], cost_df['Date'], cost_df['CPI'])
+    _set_series(page['budget'], cost_df['Date'], cost_df['Cumulative_Budget'] / 1e6)
+    _set_series(page['spent'], cost_df['Date'], cost_df['Cumulative_Spent'] / 1e6)
+    _set_series(page['trir'], safety_df['Date'], safety_df['TRIR'])
+    _set_series(page['pass_rate'], quality_df['Date'], quality_df['Inspection_Pass_Rate_Pct'])
+
+    for ax in page['charts']:
+        ax.relim()
+        ax.autoscale_view()
+    return page['figure']
+
+def report_path(output_dir, project_id, report_date, output_format):
+    return os.path.join(output_dir, f"{project_slug(project_id)}_{report_date:%Y-%m-%d}.{output_format}")
+
+def _render_projects(args):
+    """Worker: render every project of one work item (a directory, or a group of its Project_IDs) whose data hash changed
+
+    `known_hashes` holds the manifest entries of the item's projects only.
+    """
+
+    project_dir, project_ids, output_dir, formats, project_filter, known_hashes = args
+    rendered = {}
+    skipped = 0
+    tables = load_project_tables(project_dir, project_ids)
+    for project_id, project_tables in split_by_project(project_dir, tables, project_filter, project_ids):
+        if len(project_tables[0]) == 0 or len(project_tables[1]) == 0:
+            continue
+        key = data_hash(project_tables, project_id)
+        report_date = pd.Timestamp(project_tables[0]['Date'].iloc[-1])
+        paths = [report_path(output_dir, project_id, report_date, output_format) for output_format in formats]
+        if known_hashes.get(project_id) == key and all(os.path.exists(path) for path in paths):
+            skipped += 1
+            continue
+
+        figure = draw_report(report_content(project_id, project_tables))
+        for output_format, path in zip(formats, paths):
+            figure.savefig(path, format=output_format, dpi=PNG_DPI)
+        rendered[project_id] = key
+    return rendered, skipped
+
+def _read_manifest(output_dir):
+    path = os.path.join(output_dir, MANIFEST_FILE)
+    if not os.path.exists(path):
+        return {}
+    with open(path, encoding='utf-8') as stream:
+        return json.load(stream)
+
+def _write_manifest(output_dir, manifest):
+    path = os.path.join(output_dir, MANIFEST_FILE)
+    with open(path + '.tmp', 'w', encoding='utf-8') as stream:
+        json.dump(manifest, stream)
+    os.replace(path + '.tmp', path)
+
+def render_reports(inputs, output_dir='reports', formats=('pdf',), project_filter=None, workers=None, log=sys.stderr):
+    """Render executive report pages for every project found under `inputs`
+
+    Reports are written as `<project>_<week ending>.<format>`; nothing is
+    rendered when two projects share a file name. A manifest of
+    data hashes in `output_dir` lets later runs skip projects whose tables did
+    not change; it is saved as each work item finishes, so an interrupted run
+    keeps the pages already rendered. Returns the number of projects with an up-to-date report,
+    rendered or skipped as unchanged.
+    """
+
+    start = time.perf_counter()
+    project_dirs = discover_projects(inputs)
+    if not project_dirs:
+        print("❌ No project data found for the given inputs", file=log)
+        return 0
+
+    os.makedirs(output_dir, exist_ok=True)
+    manifest = _read_manifest(output_dir)
+    formats = tuple(formats)
+    workers = workers or os.cpu_count() or 1
+    # Directories holding many projects by Project_ID are split into several items per worker,
+    # so pages are shared across workers and recorded in the manifest as each item finishes
+    jobs = []
+    slugs = {}
+    for project_dir, project_ids in project_groups(project_dirs, project_filter, workers * 4):
+        names = project_ids if project_ids is not None else (project_name(project_dir),)
+        for name in names:
+            slugs.setdefault(project_slug(name).lower(), []).append(f"{name} ({project_dir})")
+        known_hashes = {name: manifest[name] for name in names if name in manifest}
+        jobs.append((project_dir, project_ids, output_dir, formats, project_filter, known_hashes))
+
+    # Reports are named by project slug, so projects sharing one would overwrite each other's pages
+    collisions = [' and '.join(projects) for projects in slugs.values() if len(projects) > 1]
+    if collisions:
+        print(f"❌ Projects with the same report file name: {'; '.join(collisions[:5])}. "
+              f"Rename them or render them to separate output directories", file=log)
+        return 0
+    workers = max(1, min(workers, len(jobs)))
+
+    rendered_count = 0
+    skipped = 0
+    if workers == 1:
+        results = map(_render_projects, jobs)
+        for rendered, project_skipped in results:
+            rendered_count += len(rendered)
+            skipped += project_skipped
+            if rendered:
+                manifest.update(rendered)
+                _write_manifest(output_dir, manifest)
+    else:
+        # One item per task, so each finished item reaches the manifest without waiting for a batch
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            for rendered, project_skipped in pool.map(_render_projects, jobs):
+                rendered_count += len(rendered)
+                skipped += project_skipped
+                if rendered:
+                    manifest.update(rendered)
+                    _write_manifest(output_dir, manifest)
+
+    print(f"✅ Rendered {rendered_count} reports in {output_dir} ({skipped} unchanged skipped, {workers} workers) "
+          f"in {time.perf_counter() - start:.1f}s", file=log)
+    return rendered_count + skipped
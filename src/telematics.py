@@ -0,0 +1,379 @@
+"""
+Equipment telematics ingestion
+Streams engine and idle pings (every ~30 s from each machine) from CSV, JSON
+lines or Parquet logs into per-machine hourly engine and idle hours. A ping's
+state lasts until the machine's next ping, so hours come from interval
+arithmetic on the sorted timestamps rather than from counting pings. Only the
+hourly series is stored, and fleet utilization of each reporting period is
+written into Equipment_Utilization_Pct of the productivity table
+"""
+
+import os
+import sys
+import numpy as np
+import pandas as pd
+from chunked_analytics import iter_table_chunks, resolve_table_path
+from ledger import ingest_files
+from project_store import read_table
+from rollups import period_length
+
+# Columns every ping log must have; Engine_On and Idle are 0/1 or true/false
+PING_COLUMNS = ['Machine', 'Timestamp', 'Engine_On', 'Idle']
+
+# Hourly engine and idle hours per machine, beside the KPI tables
+SERIES_FILE = 'telematics_hourly.csv'
+SERIES_COLUMNS = ['Hour', 'Machine', 'Engine_Hours', 'Idle_Hours', 'Pings']
+SERIES_FREQ = pd.Timedelta(hours=1)
+
+# Ledger of ingested ping logs and their hourly series
+LEDGER_DIR = 'telematics_ledger'
+
+PING_CHUNKSIZE = 1000000
+
+# A ping's state lasts until the machine's next ping but at most MAX_GAP, so a
+# machine that drops off the network is not credited for the outage; the last
+# ping of a machine in a file is credited with one PING_INTERVAL
+PING_INTERVAL = pd.Timedelta(seconds=30)
+MAX_GAP = pd.Timedelta(minutes=2)
+
+# Hours a machine is expected to work on each day it reports
+SCHEDULED_HOURS_PER_DAY = 10
+
+# Partial (hour, machine) rows held before they are combined
+COMPACT_ROWS = 500000
+
+DAY = pd.Timedelta(days=1)
+
+_TRUE_FLAGS = ['1', 'true', 't', 'yes', 'y', 'on']
+
+def parse_timestamps(values, tz=None):
+    """Naive datetime64[ns] Series from epoch seconds or ISO 8601 text; NaT when unparseable
+
+    Timestamps with an offset are converted to UTC, or to the time zone `tz`
+    (e.g. 'America/Chicago') when given; timestamps without one are taken as
+    UTC.
+    """
+
+    values = pd.Series(values)
+    if pd.api.types.is_numeric_dtype(values) and not pd.api.types.is_bool_dtype(values):
+        parsed = pd.to_datetime(values, unit='s', utc=True, errors='coerce')
+    else:
+        parsed = pd.to_datetime(values, format='ISO8601', utc=True, errors='coerce')
+    if tz is not None:
+        parsed = parsed.dt.tz_convert(tz)
+    return parsed.dt.tz_localize(None).astype('datetime64[ns]')
+
+def _flags(values):
+    if pd.api.types.is_bool_dtype(values):
+        return values.to_numpy()
+    if pd.api.types.is_numeric_dtype(values):
+        return values.fillna(0).to_numpy() != 0
+    return values.astype(str).str.strip().str.lower().isin(_TRUE_FLAGS).to_numpy()
+
+class UtilizationAggregates:
+    """Per-hour, per-machine engine and idle seconds of a ping stream
+
+    Each ping is credited with the time until the same machine's next ping,
+    capped at `max_gap`, split at hour boundaries. The last ping of every
+    machine is carried over to the next chunk, so intervals spanning chunks
+    are exact; `finish` credits the final pings with `tail` each. Memory is
+    bounded by the distinct hours x machines, not by the ping count.
+
+    Pings may be in any order within a chunk, but each machine's pings must
+    arrive in time order across chunks: a ping earlier than the machine's
+    carried ping would credit time other chunks already covered, so it is
+    skipped and counted in `out_of_order`.
+    """
+
+    def __init__(self, max_gap=MAX_GAP, tail=PING_INTERVAL, tz=None, compact_rows=COMPACT_ROWS):
+        self.max_gap = max_gap.value
+        self.tail = min(tail, max_gap).value
+        self.tz = tz
+        self.compact_rows = compact_rows
+        self._machine_codes = {}
+        self._machines = []
+        self._carry = None
+        self._carried_ns = np.zeros(0, dtype=np.int64)
+        self._parts = []
+        self._pending = 0
+        self.pings = 0
+        self.rejected = 0
+        self.out_of_order = 0
+
+    def _codes(self, machines):
+        """Stable integer code of each machine name, so pings are sorted and grouped as numbers"""
+
+        positions, names = pd.factorize(machines)
+        for name in names:
+            if name not in self._machine_codes:
+                self._machine_codes[name] = len(self._machines)
+                self._machines.append(str(name))
+        return np.array([self._machine_codes[name] for name in names], dtype=np.int64)[positions]
+
+    def update(self, chunk):
+        """Fold one chunk of pings into the running totals
+
+        Rows without a machine or a valid timestamp are skipped, and so are
+        pings earlier than their machine's ping carried from previous chunks.
+        """
+
+        times = parse_timestamps(chunk['Timestamp'], self.tz)
+        valid = (times.notna() & chunk['Machine'].notna()).to_numpy()
+        self.rejected += int(len(chunk) - valid.sum())
+        engine = _flags(chunk['Engine_On'])
+        pings = (
+            self._codes(chunk['Machine'][valid]),
+            times.to_numpy()[valid].view('int64'),
+            engine[valid],
+            (engine & _flags(chunk['Idle']))[valid]
+        )
+
+        # Machines first seen in this chunk have nothing carried yet
+        known = len(self._carried_ns)
+        self._carried_ns = np.append(self._carried_ns, np.full(len(self._machines) - known, np.iinfo(np.int64).min))
+        in_order = pings[1] >= self._carried_ns[pings[0]]
+        self.out_of_order += int(len(in_order) - in_order.sum())
+        pings = tuple(values[in_order] for values in pings)
+        self.pings += len(pings[0])
+
+        if self._carry is not None:
+            pings = tuple(np.concatenate([carried, new]) for carried, new in zip(self._carry, pings))
+        if len(pings[0]) == 0:
+            return
+
+        order = np.lexsort((pings[1], pings[0]))
+        codes, time_ns, engine, idle = (values[order] for values in pings)
+
+        # The last ping of each machine waits for the next chunk to know how long it lasted
+        last = np.append(codes[1:] != codes[:-1], True)
+        durations = np.minimum(np.diff(time_ns, append=time_ns[-1]), self.max_gap)
+        credited = ~last
+        self._credit(codes[credited], time_ns[credited], durations[credited], engine[credited], idle[credited])
+        self._carry = (codes[last], time_ns[last], engine[last], idle[last])
+        self._carried_ns[codes[last]] = time_ns[last]
+
+    def _credit(self, codes, start, durations, engine, idle):
+        """Add the engine and idle seconds of intervals [start, start + duration) to their hours"""
+
+        if len(codes) == 0:
+            return
+        # Intervals are shorter than an hour, so each spills over into at most the next hour
+        hour = SERIES_FREQ.value
+        bucket = start // hour * hour
+        first = np.minimum(start + durations, bucket + hour) - start
+        spill = durations - first
+        spilled = spill > 0
+
+        seconds = np.concatenate([first, spill[spilled]]) / 1e9
+        part = pd.DataFrame({
+            'Hour': np.concatenate([bucket, bucket[spilled] + hour]),
+            'Code': np.concatenate([codes, codes[spilled]]),
+            'Engine_Seconds': seconds * np.concatenate([engine, engine[spilled]]),
+            'Idle_Seconds': seconds * np.concatenate([idle, idle[spilled]]),
+            'Pings': np.concatenate([np.ones(len(codes), dtype=np.int64), np.zeros(spilled.sum(), dtype=np.int64)])
+        }).groupby(['Hour', 'Code'], sort=False).sum()
+        self._parts.append(part)
+        self._pending += len(part)
+        if self._pending > self.compact_rows:
+            self._compact()
+
+    def _compact(self):
+        totals = pd.concat(self._parts).groupby(level=['Hour', 'Code'], sort=False).sum() if self._parts else None
+        self._parts = [totals] if totals is not None else []
+        self._pending = len(totals) if totals is not None else 0
+        self.compact_rows = max(self.compact_rows, 2 * self._pending)
+
+    def finish(self):
+        """Credit each machine's last ping with the tail interval; returns self"""
+
+        if self._carry is not None:
+            codes, time_ns, engine, idle = self._carry
+            self._credit(codes, time_ns, np.full(len(codes), self.tail), engine, idle)
+        self._carry = None
+        return self
+
+    def series(self):
+        """Hourly series (SERIES_COLUMNS) sorted by hour and machine"""
+
+        self._compact()
+        if not self._parts:
+            return _empty_series()
+        totals = self._parts[0]
+        series = pd.DataFrame({
+            'Hour': pd.to_datetime(totals.index.get_level_values('Hour').to_numpy()),
+            'Machine': np.array(self._machines, dtype=object)[totals.index.get_level_values('Code').to_numpy()],
+            'Engine_Hours': totals['Engine_Seconds'].to_numpy() / 3600,
+            'Idle_Hours': totals['Idle_Seconds'].to_numpy() / 3600,
+            'Pings': totals['Pings'].to_numpy(dtype=np.int64)
+        })
+        return series.sort_values(['Hour', 'Machine']).reset_index(drop=True)
+
+def _empty_series():
+    return pd.DataFrame({
+        'Hour': pd.DatetimeIndex([]),
+        'Machine': pd.Series([], dtype=str),
+        'Engine_Hours': pd.Series([], dtype=float),
+        'Idle_Hours': pd.Series([], dtype=float),
+        'Pings': pd.Series([], dtype=np.int64)
+    })
+
+def _keyed(series):
+    return series.set_index(['Hour', 'Machine'])
+
+def aggregate_pings(path, chunksize=PING_CHUNKSIZE, tz=None):
+    """Stream one ping log (CSV, JSON lines or Parquet) into finished UtilizationAggregates"""
+
+    aggregates = UtilizationAggregates(tz=tz)
+    for chunk in iter_table_chunks(path, columns=PING_COLUMNS, chunksize=chunksize, dtype={'Machine': str}):
+        missing = [column for column in PING_COLUMNS if column not in chunk.columns]
+        if missing:
+            raise ValueError(f"{path}: missing columns {', '.join(missing)}")
+        aggregates.update(chunk)
+    return aggregates.finish()
+
+def _aggregate_job(job):
+    path, chunksize, tz = job
+    aggregates = aggregate_pings(path, chunksize, tz)
+    warnings = []
+    if aggregates.rejected:
+        warnings.append(f"skipped {aggregates.rejected} pings without a machine or a valid timestamp")
+    if aggregates.out_of_order:
+        warnings.append(f"skipped {aggregates.out_of_order} pings earlier than an already read ping of the same machine "
+                        f"(sort ping logs by time)")
+    return _keyed(aggregates.series()), aggregates.pings, '; '.join(warnings) or None
+
+def series_path(data_dir):
+    return os.path.join(data_dir, SERIES_FILE)
+
+def read_series(path):
+    """Hourly series (SERIES_COLUMNS) from a CSV; empty when the file does not exist"""
+
+    if not os.path.exists(path):
+        return _empty_series()
+    return pd.read_csv(path, dtype={'Machine': str}, parse_dates=['Hour'])[SERIES_COLUMNS]
+
+def _write_series(series, path):
+    series.round({'Engine_Hours': 4, 'Idle_Hours': 4}).to_csv(path, index=False, date_format='%Y-%m-%d %H:%M')
+
+def _read_partial(path):
+    return _keyed(read_series(path))
+
+def _write_partial(totals, path):
+    _write_series(totals.reset_index(), path)
+
+def utilization_by_period(series, starts, length, scheduled_hours_per_day=SCHEDULED_HOURS_PER_DAY):
+    """Fleet engine hours, idle hours and utilization of the periods [start, start + length)
+
+    `series` is an hourly series with Hour and Machine columns and `starts`
+    are the sorted period starts. A machine counts as available for
+    `scheduled_hours_per_day` on every day it reports (pro rata per shift
+    for periods shorter than a day). Returns one row per period with data,
+    indexed by the period's position in `starts`.
+    """
+
+    starts = pd.DatetimeIndex(starts)
+    hours = pd.DatetimeIndex(series['Hour'])
+    position = starts.searchsorted(hours, side='right') - 1
+    inside = position >= 0
+    position = np.where(inside, position, 0)
+    offset = hours - starts[position]
+    inside &= np.asarray(offset < length)
+
+    slot = min(length, DAY)
+    frame = pd.DataFrame({
+        'Period': position,
+        'Machine': series['Machine'].to_numpy(),
+        'Slot': np.asarray(offset // slot),
+        'Engine_Hours': series['Engine_Hours'].to_numpy(),
+        'Idle_Hours': series['Idle_Hours'].to_numpy()
+    })[inside]
+
+    periods = frame.groupby('Period')[['Engine_Hours', 'Idle_Hours']].sum()
+    periods['Machines'] = frame.groupby('Period')['Machine'].nunique()
+    machine_slots = frame.drop_duplicates(['Period', 'Machine', 'Slot']).groupby('Period').size()
+    available = machine_slots * scheduled_hours_per_day * (slot / DAY)
+    periods['Utilization_Pct'] = (100 * periods['Engine_Hours'] / available).clip(upper=100).round(1)
+    periods['Idle_Ratio_Pct'] = (100 * periods['Idle_Hours'] / periods['Engine_Hours'].where(periods['Engine_Hours'] > 0)).round(1)
+    periods.insert(0, 'Start', starts[periods.index])
+    return periods
+
+def fleet_utilization(series, period=DAY, scheduled_hours_per_day=SCHEDULED_HOURS_PER_DAY):
+    """Fleet utilization and idle ratio per day (or other `period`) of an hourly series"""
+
+    if len(series) == 0:
+        return pd.DataFrame(columns=['Date', 'Engine_Hours', 'Idle_Hours', 'Machines', 'Utilization_Pct', 'Idle_Ratio_Pct'])
+    starts = pd.date_range(series['Hour'].min().floor(period), series['Hour'].max(), freq=period)
+    periods = utilization_by_period(series, starts, period, scheduled_hours_per_day)
+    return periods.rename(columns={'Start': 'Date'}).reset_index(drop=True)
+
+def machine_utilization(series, scheduled_hours_per_day=SCHEDULED_HOURS_PER_DAY):
+    """Per-machine engine hours, idle hours, reporting days, utilization and idle ratio, busiest first"""
+
+    days = series['Hour'].dt.floor('D')
+    machines = series.groupby('Machine').agg(Engine_Hours=('Engine_Hours', 'sum'), Idle_Hours=('Idle_Hours', 'sum'))
+    machines['Days'] = days.groupby(series['Machine']).nunique()
+    machines['Utilization_Pct'] = (100 * machines['Engine_Hours'] / (machines['Days'] * scheduled_hours_per_day)).clip(upper=100).round(1)
+    machines['Idle_Ratio_Pct'] = (100 * machines['Idle_Hours'] / machines['Engine_Hours'].where(machines['Engine_Hours'] > 0)).round(1)
+    return machines.sort_values('Utilization_Pct', ascending=False).reset_index()
+
+def reporting_periods(dates):
+    """(period starts, period length) of KPI rows labelled by `dates`
+
+    Rows of a day or longer are labelled by their last day (weeks by the
+    closing Sunday); shift rows are labelled by their start.
+    """
+
+    dates = pd.DatetimeIndex(dates)
+    length = period_length(dates)
+    return (dates + DAY - length if length >= DAY else dates), length
+
+def _apply_to_productivity(data_dir, series, scheduled_hours_per_day, log):
+    """Write fleet utilization into Equipment_Utilization_Pct of the productivity periods the series covers
+
+    Periods without telematics keep their reported value. Returns the number
+    of periods updated.
+    """
+
+    path = resolve_table_path(data_dir, 'productivity')
+    productivity = read_table(path)
+    starts, length = reporting_periods(productivity['Date'])
+    periods = utilization_by_period(series, starts, length, scheduled_hours_per_day)
+    outside = series['Engine_Hours'].sum() - periods['Engine_Hours'].sum()
+    if outside > 0.01:
+        print(f"⚠️ {data_dir}: {outside:,.1f} engine hours fall outside the productivity table's periods", file=log)
+    if len(periods) == 0:
+        return 0
+
+    column = productivity.columns.get_loc('Equipment_Utilization_Pct')
+    productivity.iloc[periods.index, column] = periods['Utilization_Pct'].fillna(0).to_numpy()
+    if path.endswith('.parquet'):
+        productivity.to_parquet(path, index=False)
+    else:
+        productivity.to_csv(path, index=False, date_format='%Y-%m-%d')
+    return len(periods)
+
+def ingest_telematics(paths, data_dir='data', chunksize=PING_CHUNKSIZE, workers=None, tz=None,
+                      scheduled_hours_per_day=SCHEDULED_HOURS_PER_DAY, prewarm=True, log=sys.stderr):
+    """Fold new or changed ping logs into a project's hourly telematics series (see ledger.ingest_files)
+
+    The series in telematics_hourly.csv is updated and fleet utilization is
+    written into Equipment_Utilization_Pct of every productivity period it
+    covers. Returns the sorted list of touched days.
+    """
+
+    def apply(delta):
+        path = series_path(data_dir)
+        combined = _keyed(read_series(path)).add(delta, fill_value=0)
+        combined = combined[combined['Pings'] > 0].astype({'Pings': np.int64}).sort_index().reset_index()
+        overlapping = combined['Engine_Hours'] > 1.0001
+        if overlapping.any():
+            print(f"⚠️ {data_dir}: {int(overlapping.sum())} machine hours have more than an hour of engine time; "
+                  f"pings of one machine over the same hours come from more than one file", file=log)
+        _write_series(combined, path)
+        periods = _apply_to_productivity(data_dir, combined, scheduled_hours_per_day, log)
+        print(f"📈 Equipment utilization of {periods} productivity periods now comes from telematics", file=log)
+        return sorted(delta.index.get_level_values('Hour').floor('D').unique())
+
+    jobs = [(path, chunksize, tz) for path in paths]
+    return ingest_files(jobs, data_dir, LEDGER_DIR, _aggregate_job, apply, _read_partial, _write_partial, noun='pings',
+                        unit='days', decimals=4, workers=workers, prewarm=prewarm, log=log)
@@ -0,0 +1,163 @@
+"""
+Labor timesheet ingestion
+Streams daily timesheets (worker, crew, cost code, hours) and installed
+quantities into weekly labor hours, quantities and hours per unit by crew and
+activity. Crews and cost codes are read as pandas categoricals, so millions of
+rows are held and grouped as small integer codes. The weekly totals feed the
+labor columns of the productivity table and name the crews behind labor
+efficiency risks
+"""
+
+import os
+import sys
+import pandas as pd
+from chunked_analytics import iter_table_chunks, resolve_table_path
+from ledger import ingest_files
+from project_store import read_table
+from rollups import infer_resolution
+from transactions import week_ending
+
+# Columns each kind of file must have; other columns (e.g. Worker) are ignored
+TIMESHEET_COLUMNS = ['Date', 'Crew', 'Code', 'Hours']
+QUANTITY_COLUMNS = ['Date', 'Crew', 'Code', 'Quantity']
+
+# Weekly hours, installed quantity and hours per unit per crew and cost code
+CREW_PRODUCTIVITY_FILE = 'crew_productivity.csv'
+CREW_COLUMNS = ['Date', 'Crew', 'Code', 'Labor_Hours', 'Quantity', 'Hours_Per_Unit']
+
+# Ledger of ingested timesheet and quantity files and their weekly totals
+LEDGER_DIR = 'timesheet_ledger'
+
+TIMESHEET_CHUNKSIZE = 1000000
+
+# File kind -> (columns read, crew productivity column the last one adds to)
+FILE_KINDS = {
+    'timesheet': (TIMESHEET_COLUMNS, 'Labor_Hours'),
+    'quantity': (QUANTITY_COLUMNS, 'Quantity')
+}
+
+def aggregate_file(path, kind, chunksize=TIMESHEET_CHUNKSIZE):
+    """Weekly totals per (Date, Crew, Code) of one timesheet or quantity file, and its (rows, rejected) counts
+
+    Rows with an unparseable date or value, or without a crew or code, are
+    counted as rejected and skipped.
+    """
+
+    columns, column = FILE_KINDS[kind]
+    value = columns[-1]
+    parts = []
+    rows = rejected = 0
+    for chunk in iter_table_chunks(path, columns=columns, chunksize=chunksize, dtype={'Crew': 'category', 'Code': 'category'}):
+        missing = [name for name in columns if name not in chunk.columns]
+        if missing:
+            raise ValueError(f"{path}: missing columns {', '.join(missing)}")
+        weeks = week_ending(chunk['Date']).rename('Date')
+        crews = chunk['Crew'].astype('category')
+        codes = chunk['Code'].astype('category')
+        amounts = pd.to_numeric(chunk[value], errors='coerce')
+        valid = weeks.notna() & amounts.notna() & crews.notna() & codes.notna()
+        rows += int(valid.sum())
+        rejected += int(len(chunk) - valid.sum())
+        # Grouping on the categoricals groups on their integer codes
+        parts.append(amounts[valid].groupby([weeks[valid], crews[valid], codes[valid]], observed=True, sort=False).sum())
+
+    if not parts:
+        return _empty_totals(), (rows, rejected)
+    totals = pd.concat(parts).groupby(level=['Date', 'Crew', 'Code'], sort=False).sum()
+    index = pd.MultiIndex.from_arrays([
+        totals.index.get_level_values('Date'),
+        totals.index.get_level_values('Crew').astype(str),
+        totals.index.get_level_values('Code').astype(str)
+    ], names=['Date', 'Crew', 'Code'])
+    frame = pd.DataFrame({'Labor_Hours': 0.0, 'Quantity': 0.0}, index=index)
+    frame[column] = totals.to_numpy(dtype=float)
+    return frame.sort_index(), (rows, rejected)
+
+def _aggregate_job(job):
+    path, kind, chunksize = job
+    totals, (rows, rejected) = aggregate_file(path, kind, chunksize)
+    warning = f"skipped {rejected} rows with a bad date or value, or without a crew or cost code" if rejected else None
+    return totals, rows, warning
+
+def _empty_totals():
+    index = pd.MultiIndex.from_arrays([pd.DatetimeIndex([]), pd.Index([], dtype=str), pd.Index([], dtype=str)], names=['Date', 'Crew', 'Code'])
+    return pd.DataFrame({'Labor_Hours': [], 'Quantity': []}, index=index)
+
+def crew_productivity_path(data_dir):
+    return os.path.join(data_dir, CREW_PRODUCTIVITY_FILE)
+
+def read_crew_productivity(path):
+    """Crew productivity table (CREW_COLUMNS) with Crew and Code as categoricals; empty when missing"""
+
+    if not os.path.exists(path):
+        return _empty_totals().assign(Hours_Per_Unit=0.0).reset_index().astype({'Crew': 'category', 'Code': 'category'})
+    return pd.read_csv(path, dtype={'Crew': 'category', 'Code': 'category'}, parse_dates=['Date'])[CREW_COLUMNS]
+
+def _read_totals(path):
+    if not os.path.exists(path):
+        return _empty_totals()
+    df = pd.read_csv(path, dtype={'Crew': str, 'Code': str}, parse_dates=['Date'])
+    return df.set_index(['Date', 'Crew', 'Code'])[['Labor_Hours', 'Quantity']]
+
+def _write_totals(totals, path):
+    totals.round(3).reset_index().to_csv(path, index=False, date_format='%Y-%m-%d')
+
+def _write_crew_productivity(totals, path):
+    df = totals.sort_index().reset_index()
+    df['Hours_Per_Unit'] = df['Labor_Hours'] / df['Quantity'].where(df['Quantity'] > 0)
+    df.round({'Labor_Hours': 2, 'Quantity': 3, 'Hours_Per_Unit': 3})[CREW_COLUMNS].to_csv(path, index=False, date_format='%Y-%m-%d')
+
+def _apply_to_productivity(data_dir, totals, log):
+    """Write weekly labor hours, installed quantity and hours per unit into the productivity table
+
+    Only weeks with timesheet hours are updated, and only for a weekly
+    productivity table. Returns the number of weeks updated.
+    """
+
+    path = resolve_table_path(data_dir, 'productivity')
+    productivity = read_table(path)
+    if len(productivity) and infer_resolution(productivity['Date']) != 'weekly':
+        print(f"⚠️ {data_dir}: the productivity table is not weekly; its labor columns were left as reported", file=log)
+        return 0
+
+    weekly = totals.groupby(level='Date')[['Labor_Hours', 'Quantity']].sum()
+    weekly = weekly[weekly['Labor_Hours'] > 0]
+    missing = weekly.index.difference(productivity['Date'])
+    if len(missing):
+        print(f"⚠️ {data_dir}: {len(missing)} weeks of timesheets have no productivity row", file=log)
+
+    rows = productivity['Date'].isin(weekly.index)
+    hours = productivity.loc[rows, 'Date'].map(weekly['Labor_Hours'])
+    units = productivity.loc[rows, 'Date'].map(weekly['Quantity'])
+    productivity.loc[rows, 'Labor_Hours'] = hours.round(1)
+    productivity.loc[rows, 'Work_Units'] = units.round(1)
+    productivity.loc[rows, 'Labor_Hours_Per_Unit'] = (hours / units.where(units > 0)).round(2).fillna(productivity.loc[rows, 'Labor_Hours_Per_Unit'])
+
+    if path.endswith('.parquet'):
+        productivity.to_parquet(path, index=False)
+    else:
+        productivity.to_csv(path, index=False, date_format='%Y-%m-%d')
+    return int(rows.sum())
+
+def ingest_timesheets(timesheet_paths, quantity_paths=(), data_dir='data', chunksize=TIMESHEET_CHUNKSIZE, workers=None,
+                      prewarm=True, log=sys.stderr):
+    """Fold new or changed timesheet and installed quantity files into a project's crew productivity table (see ledger.ingest_files)
+
+    Weekly totals per crew and cost code are kept in crew_productivity.csv,
+    and the weekly productivity table's Labor_Hours, Work_Units (total
+    installed quantity) and Labor_Hours_Per_Unit are replaced for the weeks
+    with timesheets. Returns the sorted list of touched weeks.
+    """
+
+    def apply(delta):
+        path = crew_productivity_path(data_dir)
+        crews = _read_totals(path).add(delta, fill_value=0)
+        crews = crews[(crews.round(3) != 0).any(axis=1)]
+        _write_crew_productivity(crews, path)
+        weeks = _apply_to_productivity(data_dir, crews, log)
+        print(f"📈 Labor hours per unit of {weeks} productivity weeks now comes from timesheets", file=log)
+        return sorted(delta.index.get_level_values('Date').unique())
+
+    jobs = [(path, 'timesheet', chunksize) for path in timesheet_paths] + [(path, 'quantity', chunksize) for path in quantity_paths]
+    return ingest_files(jobs, data_dir, LEDGER_DIR, _aggregate_job, apply, _read_totals, _write_totals, noun='timesheet and quantity rows',
+                        unit='weeks', decimals=3, workers=workers, prewarm=prewarm, log=log)
@@ -0,0 +1,375 @@
+"""
+Lightweight tracing for load, analytics, chart and export stages
+Spans record wall time, CPU time, rows processed and (optionally) peak memory
+and are handed to pluggable sinks. Tracing is off unless enabled in code or via
+the CONDASH_TRACE environment variable; disabled spans cost one flag check.
+"""
+
+import functools
+import json
+import os
+import threading
+import time
+import tracemalloc
+from collections import deque
+
+# Environment switches read at import time; the Prometheus exporter is only
+# started by the main process (serve_from_env), never by pool workers
+TRACE_ENV = 'CONDASH_TRACE'                       # '1' enables the in-process ring buffer
+TRACE_FILE_ENV = 'CONDASH_TRACE_FILE'             # JSON-lines file to append spans to
+TRACE_MEMORY_ENV = 'CONDASH_TRACE_MEMORY'         # '1' records peak memory (tracemalloc)
+PROMETHEUS_PORT_ENV = 'CONDASH_TRACE_PROMETHEUS_PORT'
+
+RING_BUFFER_SIZE = 1000
+METRIC_PREFIX = 'condash_span'
+
+class RingBufferSink:
+    """Keeps the most recent spans in memory"""
+
+    def __init__(self, capacity=RING_BUFFER_SIZE):
+        self._spans = deque(maxlen=capacity)
+        self._lock = threading.Lock()
+
+    def emit(self, record):
+        with self._lock:
+            self._spans.append(record)
+
+    def spans(self, limit=None):
+        """Recorded spans, oldest first"""
+        with self._lock:
+            spans = list(self._spans)
+        return spans[-limit:] if limit else spans
+
+    def clear(self):
+        with self._lock:
+            self._spans.clear()
+
+class JSONLinesSink:
+    """Appends one JSON object per span to a file"""
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def emit(self, record):
+        line = json.dumps(record, default=str) + '\n'
+        with self._lock:
+            with open(self.path, 'a', encoding='utf-8') as stream:
+                stream.write(line)
+
+class PrometheusSink:
+    """Aggregates spans per name into Prometheus text-format metrics"""
+
+    def __init__(self):
+        self._totals = {}
+        self._lock = threading.Lock()
+
+    def emit(self, record):
+        with self._lock:
+            totals = self._totals.setdefault(record['name'], {
+                'count': 0, 'errors': 0, 'wall_seconds': 0.0, 'cpu_seconds': 0.0, 'rows': 0, 'peak_memory_bytes': 0
+            })
+            totals['count'] += 1
+            totals['errors'] += 1 if record['error'] else 0
+            totals['wall_seconds'] += record['wall_ms'] / 1000
+            totals['cpu_seconds'] += record['cpu_ms'] / 1000
+            totals['rows'] += record['rows'] or 0
+            totals['peak_memory_bytes'] = max(totals['peak_memory_bytes'], record['peak_memory_bytes'] or 0)
+
+    def render(self):
+        """Metrics in the Prometheus text exposition format"""
+
+        metrics = [
+            ('count', 'counter', 'Spans completed'),
+            ('errors', 'counter', 'Spans that raised an exception'),
+            ('wall_seconds', 'counter', 'Wall-clock time spent in spans'),
+            ('cpu_seconds', 'counter', 'Process CPU time spent in spans'),
+            ('rows', 'counter', 'Rows processed by spans'),
+            ('peak_memory_bytes', 'gauge', 'Largest peak memory of a single span')
+        ]
+        with self._lock:
+            totals = {name: dict(values) for name, values in self._totals.items()}
+
+        lines = []
+        for key, kind, help_text in metrics:
+            metric = f'{METRIC_PREFIX}_{key}' + ('_total' if kind == 'counter' else '')
+            lines.append(f'# HELP {metric} {help_text}')
+            lines.append(f'# TYPE {metric} {kind}')
+            for name in sorted(totals):
+                label = name.replace('\\', '\\\\').replace('"', '\\"')
+                lines.append(f'{metric}{{span="{label}"}} {totals[name][key]}')
+        return '\n'.join(lines) + '\n'
+
+class Span:
+    """One timed stage; use through span() or @traced"""
+
+    __slots__ = ('name', 'attrs', 'rows', 'parent', 'error', '_start', '_wall', '_cpu', '_memory_start', '_memory_peak')
+
+    def __init__(self, name, rows=None, attrs=None):
+        self.name = name
+        self.rows = rows
+        self.attrs = attrs or {}
+        self.parent = None
+        self.error = None
+        self._memory_start = None
+        self._memory_peak = 0
+
+    def set_rows(self, rows):
+        self.rows = rows
+
+    def set(self, **attrs):
+        self.attrs.update(attrs)
+
+    def __enter__(self):
+        stack = _stack()
+        if stack:
+            self.parent = stack[-1].name
+        if _tracer.memory and tracemalloc.is_tracing():
+            current, peak = tracemalloc.get_traced_memory()
+            if stack and stack[-1]._memory_start is not None:
+                stack[-1]._memory_peak = max(stack[-1]._memory_peak, peak)
+            tracemalloc.reset_peak()
+            self._memory_start = current
+            self._memory_peak = current
+        stack.append(self)
+        self._start = time.time()
+        self._wall = time.perf_counter()
+        self._cpu = time.process_time()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        wall_ms = (time.perf_counter() - self._wall) * 1000
+        cpu_ms = (time.process_time() - self._cpu) * 1000
+        stack = _stack()
+        stack.pop()
+
+        peak_memory = None
+        if self._memory_start is not None and tracemalloc.is_tracing():
+            self._memory_peak = max(self._memory_peak, tracemalloc.get_traced_memory()[1])
+            peak_memory = self._memory_peak - self._memory_start
+            if stack and stack[-1]._memory_start is not None:
+                stack[-1]._memory_peak = max(stack[-1]._memory_peak, self._memory_peak)
+            tracemalloc.reset_peak()
+
+        if exc_type is not None:
+            self.error = exc_type.__name__
+
+        _tracer.emit({
+            'name': self.name,
+            'parent': self.parent,
+            'start': self._start,
+            'wall_ms': round(wall_ms, 3),
+            'cpu_ms': round(cpu_ms, 3),
+            'rows': self.rows,
+            'peak_memory_bytes': peak_memory,
+            'error': self.error,
+            'attrs': self.attrs
+        })
+        return False
+
+class _NullSpan:
+    """Shared stand-in returned while tracing is disabled"""
+
+    __slots__ = ()
+
+    def set_rows(self, rows):
+        pass
+
+    def set(self, **attrs):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+_NULL_SPAN = _NullSpan()
+
+class _Tracer:
+    def __init__(self):
+        self.enabled = False
+        self.memory = False
+        self.started_tracemalloc = False
+        self.server = None
+        self.sinks = []
+        self._local = threading.local()
+
+    def emit(self, record):
+        for sink in self.sinks:
+            try:
+                sink.emit(record)
+            except Exception:
+                # A broken sink must never break the traced code
+                pass
+
+_tracer = _Tracer()
+
+def _stack():
+    stack = getattr(_tracer._local, 'stack', None)
+    if stack is None:
+        stack = _tracer._local.stack = []
+    return stack
+
+def enable(sinks=None, memory=False):
+    """Turn tracing on with the given sinks (a ring buffer by default)
+
+    With `memory` tracemalloc is started to record each span's peak memory,
+    which slows allocation-heavy code noticeably.
+    """
+
+    _tracer.sinks = list(sinks) if sinks is not None else [RingBufferSink()]
+    _tracer.memory = memory
+    if memory and not tracemalloc.is_tracing():
+        tracemalloc.start()
+        _tracer.started_tracemalloc = True
+    _tracer.enabled = True
+
+def disable():
+    """Turn tracing off; sinks are kept so their spans can still be read
+
+    tracemalloc is only stopped when enable() started it.
+    """
+    _tracer.enabled = False
+    if _tracer.started_tracemalloc and tracemalloc.is_tracing():
+        tracemalloc.stop()
+    _tracer.started_tracemalloc = False
+    _tracer.memory = False
+
+def is_enabled():
+    return _tracer.enabled
+
+def add_sink(sink):
+    _tracer.sinks.append(sink)
+    return sink
+
+def get_sink(sink_type):
+    """First registered sink of the given class, or None"""
+    for sink in _tracer.sinks:
+        if isinstance(sink, sink_type):
+            return sink
+    return None
+
+def latest_spans(limit=None):
+    """Spans held by the ring buffer sink, oldest first"""
+    sink = get_sink(RingBufferSink)
+    return sink.spans(limit) if sink else []
+
+def span(name, rows=None, **attrs):
+    """Context manager timing a block of code
+
+        with span('load_data') as s:
+            df = pd.read_csv(path)
+            s.set_rows(len(df))
+    """
+
+    if not _tracer.enabled:
+        return _NULL_SPAN
+    return Span(name, rows, attrs)
+
+def count_rows(*values):
+    """Total rows of the DataFrames among `values` (tuples and lists are searched too)"""
+
+    rows = 0
+    found = False
+    for value in values:
+        if isinstance(value, (tuple, list)):
+            nested = count_rows(*value)
+            if nested is not None:
+                rows += nested
+                found = True
+        elif hasattr(value, 'columns') and hasattr(value, '__len__'):
+            rows += len(value)
+            found = True
+    return rows if found else None
+
+def traced(name=None, rows=None):
+    """Decorator wrapping every call in a span
+
+    `rows` is an optional callable receiving the call's arguments and returning
+    the rows processed; by default the rows of DataFrame arguments (or, failing
+    that, of DataFrames in the result) are counted.
+    """
+
+    def decorator(func):
+        span_name = name or func.__qualname__
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not _tracer.enabled:
+                return func(*args, **kwargs)
+            with Span(span_name) as current:
+                current.rows = rows(*args, **kwargs) if rows else count_rows(*args, *kwargs.values())
+                result = func(*args, **kwargs)
+                if current.rows is None:
+                    current.rows = count_rows(result)
+                return result
+
+        return wrapper
+
+    return decorator
+
+def serve_prometheus(port, sink=None, host='0.0.0.0'):
+    """Serve the metrics of a PrometheusSink at http://host:port/metrics from a daemon thread"""
+
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    sink = sink or get_sink(PrometheusSink) or add_sink(PrometheusSink())
+
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split('?')[0] not in ('/', '/metrics'):
+                self.send_error(404)
+                return
+            body = sink.render().encode('utf-8')
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), MetricsHandler)
+    threading.Thread(target=server.serve_forever, name='condash-metrics', daemon=True).start()
+    return server
+
+def configure_from_env(environ=None):
+    """Enable tracing according to the CONDASH_TRACE* environment variables
+
+    A Prometheus port adds a PrometheusSink; serve_from_env() exposes it.
+    """
+
+    environ = os.environ if environ is None else environ
+    trace_file = environ.get(TRACE_FILE_ENV)
+    port = environ.get(PROMETHEUS_PORT_ENV)
+    if environ.get(TRACE_ENV, '') in ('', '0') and not trace_file and not port:
+        return False
+
+    sinks = [RingBufferSink()]
+    if trace_file:
+        sinks.append(JSONLinesSink(trace_file))
+    if port:
+        sinks.append(PrometheusSink())
+    enable(sinks, memory=environ.get(TRACE_MEMORY_ENV, '') not in ('', '0'))
+    return True
+
+def serve_from_env(environ=None):
+    """Start the Prometheus exporter once when CONDASH_TRACE_PROMETHEUS_PORT is set; returns the server or None
+
+    Called by the main process (the CLI and the dashboard) only, so worker
+    processes that import this module never try to bind the port.
+    """
+
+    environ = os.environ if environ is None else environ
+    port = environ.get(PROMETHEUS_PORT_ENV)
+    if _tracer.server is not None or not port or not _tracer.enabled:
+        return _tracer.server
+    try:
+        _tracer.server = serve_prometheus(int(port), get_sink(PrometheusSink))
+    except OSError as e:
+        print(f"⚠️ Could not serve trace metrics on port {port}: {e}")
+    return _tracer.server
+
+configure_from_env()
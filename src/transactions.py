@@ -0,0 +1,260 @@
+"""
+Transaction-level cost ingestion
+Streams raw AP, payroll and equipment-charge transactions in chunks and folds
+them into per-week, per-cost-code totals, so memory grows with weeks x codes
+rather than with the number of transactions. A ledger of the files already
+ingested means a late or corrected file only updates the weeks it touches
+"""
+
+import os
+import sys
+import numpy as np
+import pandas as pd
+from chunked_analytics import DEFAULT_CHUNKSIZE, iter_table_chunks, resolve_table_path
+from cost_hierarchy import COST_CODE_ACTUALS_FILE, COST_CODES_FILE
+from evm import DEFAULT_BUDGET_AT_COMPLETION
+from ledger import ingest_files
+from project_store import read_table
+
+# Columns every transaction file must have; Source (AP, Payroll, Equipment, ...) is optional
+TRANSACTION_COLUMNS = ['Date', 'Code', 'Amount']
+
+# Transactions are bucketed into weeks labelled by their closing Sunday, like the KPI tables
+WEEK_FREQ = 'W-SUN'
+
+# Ledger of ingested files and their (week, code) totals
+LEDGER_DIR = 'transaction_ledger'
+
+# Partial (week, code) rows held before they are combined
+COMPACT_ROWS = 500000
+
+# Weekly totals of weeks the cost table has no row for yet, kept in the ledger
+PENDING_FILE = 'pending_weeks.csv'
+
+def week_ending(dates):
+    """Week label (closing Sunday) of each transaction date; NaT for unparseable dates"""
+
+    # Transactions share few distinct dates, so each one is parsed and bucketed once
+    positions, unique_dates = pd.factorize(pd.Series(dates), use_na_sentinel=True)
+    parsed = pd.Series(pd.to_datetime(unique_dates, errors='coerce', format='mixed'))
+    weeks = parsed.dt.to_period(WEEK_FREQ).dt.end_time.dt.normalize().to_numpy()
+    labels = np.append(weeks, np.datetime64('NaT'))[positions]
+    return pd.Series(labels, index=getattr(dates, 'index', None))
+
+class WeeklyCostAggregates:
+    """Mergeable per-week, per-cost-code sums of transaction amounts
+
+    Each chunk is reduced to its (week, code) totals right away; partial
+    totals are combined once they exceed `compact_rows`, so memory is bounded
+    by the distinct weeks x codes and not by the transaction count.
+    """
+
+    def __init__(self, compact_rows=COMPACT_ROWS):
+        self.compact_rows = compact_rows
+        self._parts = []
+        self._pending = 0
+        self.transactions = 0
+        self.rejected = 0
+
+    def update(self, chunk, known_codes=None):
+        """Fold one chunk of transactions into the running totals
+
+        Rows with an unparseable date or amount, or a code not in
+        `known_codes` (when given), are counted in `rejected` and skipped.
+        """
+
+        weeks = week_ending(chunk['Date'])
+        codes = chunk['Code'].astype(str).str.strip()
+        amounts = pd.to_numeric(chunk['Amount'], errors='coerce')
+        valid = weeks.notna() & amounts.notna() & chunk['Code'].notna()
+        if known_codes is not None:
+            valid &= codes.isin(known_codes)
+
+        self.transactions += int(valid.sum())
+        self.rejected += int(len(chunk) - valid.sum())
+        part = amounts[valid].groupby([weeks[valid].rename('Date'), codes[valid].rename('Code')], sort=False).sum()
+        self._parts.append(part)
+        self._pending += len(part)
+        if self._pending > self.compact_rows:
+            self._compact()
+
+    def _compact(self):
+        totals = pd.concat(self._parts).groupby(level=['Date', 'Code'], sort=False).sum() if self._parts else pd.Series(dtype=float)
+        self._parts = [totals]
+        # Compacting again only pays off once as many new rows have arrived
+        self._pending = len(totals)
+        self.compact_rows = max(self.compact_rows, 2 * len(totals))
+
+    def merge(self, other):
+        """Combine totals from another aggregate, e.g. one computed by a different worker"""
+
+        self._parts.extend(other._parts)
+        self._pending += other._pending
+        self.transactions += other.transactions
+        self.rejected += other.rejected
+        if self._pending > self.compact_rows:
+            self._compact()
+        return self
+
+    def totals(self):
+        """Amount per (Date, Code) as a Series sorted by week and code"""
+
+        self._compact()
+        totals = self._parts[0]
+        if len(totals) == 0:
+            return _empty_totals()
+        return totals.sort_index().rename('Actual')
+
+def _empty_totals():
+    index = pd.MultiIndex.from_arrays([pd.DatetimeIndex([]), pd.Index([], dtype=str)], names=['Date', 'Code'])
+    return pd.Series([], index=index, dtype=float, name='Actual')
+
+def aggregate_transactions(path, chunksize=DEFAULT_CHUNKSIZE, known_codes=None):
+    """Stream one transaction file (CSV or Parquet) into WeeklyCostAggregates"""
+
+    aggregates = WeeklyCostAggregates()
+    for chunk in iter_table_chunks(path, columns=TRANSACTION_COLUMNS, chunksize=chunksize, dtype={'Code': str}):
+        missing = [column for column in TRANSACTION_COLUMNS if column not in chunk.columns]
+        if missing:
+            raise ValueError(f"{path}: missing columns {', '.join(missing)}")
+        aggregates.update(chunk, known_codes)
+    return aggregates
+
+def _aggregate_job(job):
+    path, chunksize, known_codes = job
+    aggregates = aggregate_transactions(path, chunksize, known_codes)
+    warning = f"skipped {aggregates.rejected} transactions with a bad date, amount or unknown cost code" if aggregates.rejected else None
+    return aggregates.totals(), aggregates.transactions, warning
+
+def _read_totals(path):
+    """(Date, Code) -> Actual Series from a CSV with those columns"""
+
+    if not os.path.exists(path):
+        return _empty_totals()
+    df = pd.read_csv(path, dtype={'Code': str}, parse_dates=['Date'])
+    return df.set_index(['Date', 'Code'])['Actual'].astype(float)
+
+def _write_totals(totals, path):
+    df = totals.round(2).reset_index()
+    df.to_csv(path, index=False, date_format='%Y-%m-%d')
+
+def _known_codes(data_dir):
+    path = os.path.join(data_dir, COST_CODES_FILE)
+    if not os.path.exists(path):
+        return None
+    return set(pd.read_csv(path, usecols=['Code'], dtype={'Code': str})['Code'])
+
+def _apply_to_code_tables(data_dir, delta):
+    """Add (week, code) differences to cost_code_actuals.csv and the codes' Actual in cost_codes.csv"""
+
+    actuals_path = os.path.join(data_dir, COST_CODE_ACTUALS_FILE)
+    actuals = _read_totals(actuals_path).add(delta, fill_value=0)
+    _write_totals(actuals[actuals.round(2) != 0].sort_index(), actuals_path)
+
+    codes_path = os.path.join(data_dir, COST_CODES_FILE)
+    if os.path.exists(codes_path):
+        codes = pd.read_csv(codes_path, dtype={'Code': str, 'Parent': str})
+        by_code = delta.groupby(level='Code').sum()
+        codes['Actual'] = (codes['Actual'].astype(float) + codes['Code'].map(by_code).fillna(0)).round(2)
+        codes.to_csv(codes_path, index=False)
+
+def _read_pending(path):
+    if not os.path.exists(path):
+        return pd.Series([], index=pd.DatetimeIndex([], name='Date'), dtype=float, name='Actual')
+    return pd.read_csv(path, parse_dates=['Date']).set_index('Date')['Actual'].astype(float)
+
+def _apply_to_cost_table(data_dir, weekly_delta, bac, log):
+    """Add weekly actual differences to the cost table and refresh its running columns from the first touched week
+
+    Weeks the cost table has no row for are held in the ledger's
+    pending_weeks.csv (they are already in cost_code_actuals.csv) and added
+    by a later ingest once the table has their row. Weeks before the first
+    touched week are left as they are, and so is the reported CPI of weeks
+    without earned value. Returns the updated cost table.
+    """
+
+    path = resolve_table_path(data_dir, 'cost')
+    cost = read_table(path)
+    pending_path = os.path.join(data_dir, LEDGER_DIR, PENDING_FILE)
+    weekly_delta = weekly_delta.add(_read_pending(pending_path), fill_value=0)
+    has_row = weekly_delta.index.isin(cost['Date'])
+    held = weekly_delta[~has_row & (weekly_delta.round(2) != 0)]
+    if len(held):
+        print(f"⚠️ {data_dir}: {len(held)} weeks of transactions have no cost row yet; "
+              f"they are held until the cost table reaches them", file=log)
+        held.round(2).rename_axis('Date').rename('Actual').reset_index().to_csv(pending_path, index=False, date_format='%Y-%m-%d')
+    elif os.path.exists(pending_path):
+        os.remove(pending_path)
+    weekly_delta = weekly_delta[has_row]
+    if not len(weekly_delta):
+        return cost
+
+    cost['Weekly_Actual'] = (cost['Weekly_Actual'] + cost['Date'].map(weekly_delta).fillna(0)).round(2)
+    first = int(np.flatnonzero(cost['Date'].isin(weekly_delta.index))[0])
+    tail = cost.iloc[first:]
+    budget_before = cost['Cumulative_Budget'].iloc[first - 1] if first else 0.0
+    spent_before = cost['Cumulative_Spent'].iloc[first - 1] if first else 0.0
+    cumulative_budget = budget_before + tail['Weekly_Budget'].cumsum()
+    cumulative_spent = spent_before + tail['Weekly_Actual'].cumsum()
+
+    # CPI from the schedule's earned value, as the template importer computes it
+    try:
+        schedule = read_table(resolve_table_path(data_dir, 'schedule'))
+        earned_value = tail['Date'].map(schedule.set_index('Date')['Earned_Value'])
+    except FileNotFoundError:
+        earned_value = pd.Series(np.nan, index=tail.index)
+    cpi = earned_value / cumulative_spent.where(cumulative_spent > 0)
+    known = cpi.notna()
+    forecast = bac / cpi.where(cpi > 0)
+    cost.loc[tail.index, 'Cumulative_Budget'] = cumulative_budget.round(2)
+    cost.loc[tail.index, 'Cumulative_Spent'] = cumulative_spent.round(2)
+    cost.loc[tail.index[known], 'CPI'] = cpi[known].round(3)
+    cost.loc[tail.index[known], 'Forecasted_Cost'] = forecast[known].fillna(bac).round(2)
+    cost.loc[tail.index, 'Cost_Variance'] = (cumulative_budget - cumulative_spent).round(2)
+
+    if path.endswith('.parquet'):
+        cost.to_parquet(path, index=False)
+    else:
+        cost.to_csv(path, index=False, date_format='%Y-%m-%d')
+    return cost
+
+def _apply_pending(data_dir, bac, log):
+    """Add held weeks that now have a cost row to the cost table; returns those weeks"""
+
+    pending = _read_pending(os.path.join(data_dir, LEDGER_DIR, PENDING_FILE))
+    if not len(pending):
+        return []
+    cost = read_table(resolve_table_path(data_dir, 'cost'))
+    ready = sorted(pending.index[pending.index.isin(cost['Date'])])
+    if ready:
+        _apply_to_cost_table(data_dir, pending.iloc[0:0], bac, log)
+        print(f"✅ Added {len(ready)} held weeks of transactions to the cost table of {data_dir}", file=log)
+    return ready
+
+def ingest_transactions(paths, data_dir='data', chunksize=DEFAULT_CHUNKSIZE, workers=None,
+                        bac=DEFAULT_BUDGET_AT_COMPLETION, prewarm=True, log=sys.stderr):
+    """Fold new or changed transaction files into a project's weekly cost tables (see ledger.ingest_files)
+
+    Weekly_Actual of the touched weeks in the cost table, cost_code_actuals.csv
+    and the Actual column of cost_codes.csv are updated, and the running cost
+    columns are refreshed from the first touched week. Weeks past the cost
+    table are held and added by the first ingest run, with or without new
+    files, after their row exists. Returns the sorted list of touched weeks.
+    """
+
+    def apply(delta):
+        _apply_to_code_tables(data_dir, delta)
+        _apply_to_cost_table(data_dir, delta.groupby(level='Date').sum(), bac, log)
+        return sorted(delta.index.get_level_values('Date').unique())
+
+    known_codes = _known_codes(data_dir)
+    jobs = [(path, chunksize, known_codes) for path in paths]
+    touched = ingest_files(jobs, data_dir, LEDGER_DIR, _aggregate_job, apply, _read_totals, _write_totals, noun='transactions',
+                           unit='weeks', decimals=2, workers=workers, prewarm=prewarm, log=log)
+
+    # Held weeks whose cost row appeared since (e.g. from an import) are added even when no file changed
+    released = _apply_pending(data_dir, bac, log)
+    if prewarm and released:
+        from prewarm import prewarm as prewarm_first_paint
+        prewarm_first_paint([data_dir], workers=1, log=log)
+    return sorted(set(touched) | set(released))
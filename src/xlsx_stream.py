@@ -0,0 +1,247 @@
+"""
+Streaming XLSX writer
+Writes worksheets row chunk by row chunk straight into the zip package as raw
+XML, so memory stays bounded by one chunk whatever the table size. Sheets that
+reach Excel's row limit continue on numbered overflow sheets
+"""
+
+import os
+import zipfile
+from xml.sax.saxutils import escape
+import numpy as np
+import pandas as pd
+
+# Excel's row limit per worksheet (including the header row)
+MAX_SHEET_ROWS = 1048576
+MAX_SHEET_NAME = 31
+DEFAULT_CHUNKSIZE = 100000
+
+_EXCEL_EPOCH = np.datetime64('1899-12-30', 'D')
+
+# Cell styles in styles.xml: 0 default, 1 date, 2 bold header
+_DATE_STYLE = 1
+_HEADER_STYLE = 2
+
+_MAIN_NS = 'http://schemas.openxmlformats.org/spreadsheetml/2006/main'
+_REL_NS = 'http://schemas.openxmlformats.org/officeDocument/2006/relationships'
+
+_STYLES_XML = (
+    f'<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n<styleSheet xmlns="{_MAIN_NS}">'
+    '<numFmts count="1"><numFmt numFmtId="164" formatCode="yyyy-mm-dd"/></numFmts>'
+    '<fonts count="2"><font><sz val="11"/><name val="Calibri"/></font><font><b/><sz val="11"/><name val="Calibri"/></font></fonts>'
+    '<fills count="2"><fill><patternFill patternType="none"/></fill><fill><patternFill patternType="gray125"/></fill></fills>'
+    '<borders count="1"><border><left/><right/><top/><bottom/><diagonal/></border></borders>'
+    '<cellStyleXfs count="1"><xf numFmtId="0" fontId="0" fillId="0" borderId="0"/></cellStyleXfs>'
+    '<cellXfs count="3"><xf numFmtId="0" fontId="0" fillId="0" borderId="0" xfId="0"/>'
+    '<xf numFmtId="164" fontId="0" fillId="0" borderId="0" xfId="0" applyNumberFormat="1"/>'
+    '<xf numFmtId="0" fontId="1" fillId="0" borderId="0" xfId="0" applyFont="1"/></cellXfs>'
+    '<cellStyles count="1"><cellStyle name="Normal" xfId="0" builtinId="0"/></cellStyles>'
+    '</styleSheet>'
+)
+
+def _column_cells(series):
+    """XML of every cell of a column, as an object array of strings"""
+
+    values = series.to_numpy()
+    if pd.api.types.is_bool_dtype(series):
+        return np.where(values, '<c t="b"><v>1</v></c>', '<c t="b"><v>0</v></c>').astype(object)
+
+    if pd.api.types.is_datetime64_any_dtype(series):
+        days = (series.dt.tz_localize(None) if series.dt.tz is not None else series).to_numpy().astype('datetime64[D]')
+        serials = (days - _EXCEL_EPOCH).astype(np.int64).astype(str).astype(object)
+        cells = f'<c s="{_DATE_STYLE}"><v>' + serials + '</v></c>'
+        return np.where(pd.isna(values), '<c/>', cells)
+
+    if pd.api.types.is_numeric_dtype(series):
+        integers = isinstance(values, np.ndarray) and values.dtype.kind in 'iu'
+        numbers = values if integers else series.to_numpy(dtype=float, na_value=np.nan)
+        text = numbers.astype(str).astype(object)
+        cells = '<c><v>' + text + '</v></c>'
+        if numbers.dtype.kind == 'f':
+            cells = np.where(np.isfinite(numbers), cells, '<c/>')
+        return cells
+
+    missing = pd.isna(values)
+    text = pd.Series(values, dtype=object).where(~missing, '').astype(str).map(escape).to_numpy()
+    cells = '<c t="inlineStr"><is><t xml:space="preserve">' + text + '</t></is></c>'
+    return np.where(missing, '<c/>', cells)
+
+def rows_xml(df):
+    """<row> elements of a DataFrame chunk, built column-wise"""
+
+    if len(df) == 0:
+        return ''
+    rows = np.full(len(df), '<row>', dtype=object)
+    for column in df.columns:
+        rows = rows + _column_cells(df[column])
+    return '</row>'.join(rows) + '</row>'
+
+def _header_xml(columns):
+    cells = ''.join(f'<c t="inlineStr" s="{_HEADER_STYLE}"><is><t>{escape(str(column))}</t></is></c>' for column in columns)
+    return f'<row>{cells}</row>'
+
+def overflow_sheet_name(name, part):
+    """Name of the `part`-th sheet of a table (1 is the table's own name)"""
+
+    if part == 1:
+        return name[:MAX_SHEET_NAME]
+    suffix = f' ({part})'
+    return name[:MAX_SHEET_NAME - len(suffix)] + suffix
+
+class XlsxStreamWriter:
+    """Write a workbook one sheet at a time from DataFrame chunks
+
+    Usage:
+        with XlsxStreamWriter('big.xlsx') as writer:
+            writer.write_sheet('Schedule Data', pd.read_csv('schedule.csv', chunksize=100000))
+    """
+
+    def __init__(self, path, max_rows=MAX_SHEET_ROWS):
+        self.path = path
+        self.max_rows = max_rows
+        self.sheets = []
+        self._package = zipfile.ZipFile(path, 'w', zipfile.ZIP_DEFLATED, compresslevel=1)
+        self._stream = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+    def _open_sheet(self, name, columns):
+        self.sheets.append(name)
+        stream = self._package.open(f'xl/worksheets/sheet{len(self.sheets)}.xml', 'w', force_zip64=True)
+        self._stream = stream
+        stream.write(f'<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n<worksheet xmlns="{_MAIN_NS}"><sheetData>'.encode('utf-8'))
+        stream.write(_header_xml(columns).encode('utf-8'))
+        return stream
+
+    def _close_sheet(self, stream):
+        stream.write(b'</sheetData></worksheet>')
+        stream.close()
+        self._stream = None
+
+    def write_sheet(self, name, frames):
+        """Stream a DataFrame, or an iterable of DataFrame chunks, into sheet `name`
+
+        Rows beyond the sheet row limit continue on sheets named
+        'name (2)', 'name (3)', ... with the header repeated. Returns the
+        names of the sheets written.
+        """
+
+        if isinstance(frames, pd.DataFrame):
+            frames = [frames]
+        first = len(self.sheets)
+        part = 1
+        stream = None
+        room = 0
+        columns = None
+        for chunk in frames:
+            if stream is None:
+                columns = list(chunk.columns)
+                stream = self._open_sheet(overflow_sheet_name(name, part), columns)
+                room = self.max_rows - 1
+            start = 0
+            while start < len(chunk):
+                if room == 0:
+                    self._close_sheet(stream)
+                    part += 1
+                    stream = self._open_sheet(overflow_sheet_name(name, part), columns)
+                    room = self.max_rows - 1
+                piece = chunk.iloc[start:start + room]
+                stream.write(rows_xml(piece).encode('utf-8'))
+                start += len(piece)
+                room -= len(piece)
+        if stream is None:
+            stream = self._open_sheet(overflow_sheet_name(name, part), [])
+        self._close_sheet(stream)
+        return self.sheets[first:]
+
+    def abort(self):
+        """Close the package without its workbook parts and delete the partial file"""
+
+        if self._package is None:
+            return
+        if self._stream is not None:
+            self._stream.close()
+            self._stream = None
+        self._package.close()
+        self._package = None
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+    def close(self):
+        """Write the workbook parts that list the sheets and close the package"""
+
+        if self._package is None:
+            return
+        if self._stream is not None:
+            self._close_sheet(self._stream)
+        sheet_overrides = ''.join(
+            f'<Override PartName="/xl/worksheets/sheet{i}.xml" '
+            'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+            for i in range(1, len(self.sheets) + 1)
+        )
+        self._package.writestr('[Content_Types].xml', (
+            '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+            '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+            '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+            '<Default Extension="xml" ContentType="application/xml"/>'
+            '<Override PartName="/xl/workbook.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+            '<Override PartName="/xl/styles.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.styles+xml"/>'
+            f'{sheet_overrides}</Types>'
+        ))
+        self._package.writestr('_rels/.rels', (
+            '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+            '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+            '<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" Target="xl/workbook.xml"/>'
+            '</Relationships>'
+        ))
+        sheets = ''.join(
+            f'<sheet name="{escape(name, {chr(34): "&quot;"})}" sheetId="{i}" r:id="rId{i}"/>'
+            for i, name in enumerate(self.sheets, start=1)
+        )
+        self._package.writestr('xl/workbook.xml', (
+            f'<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n<workbook xmlns="{_MAIN_NS}" xmlns:r="{_REL_NS}">'
+            f'<sheets>{sheets}</sheets></workbook>'
+        ))
+        relationships = ''.join(
+            f'<Relationship Id="rId{i}" Type="{_REL_NS}/worksheet" Target="worksheets/sheet{i}.xml"/>'
+            for i in range(1, len(self.sheets) + 1)
+        )
+        styles_id = len(self.sheets) + 1
+        self._package.writestr('xl/_rels/workbook.xml.rels', (
+            '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+            '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+            f'{relationships}<Relationship Id="rId{styles_id}" Type="{_REL_NS}/styles" Target="styles.xml"/>'
+            '</Relationships>'
+        ))
+        self._package.writestr('xl/styles.xml', _STYLES_XML)
+        self._package.close()
+        self._package = None
+
+def write_csv_workbook(sheets, path, chunksize=DEFAULT_CHUNKSIZE, max_rows=MAX_SHEET_ROWS):
+    """Stream CSV files into one workbook; `sheets` is a list of (sheet name, CSV path)
+
+    Returns a mapping of sheet name to the sheets written for it (more than one
+    when a CSV exceeds the row limit).
+    """
+
+    written = {}
+    with XlsxStreamWriter(path, max_rows) as writer:
+        for name, csv_path in sheets:
+            written[name] = writer.write_sheet(name, pd.read_csv(csv_path, chunksize=chunksize))
+    return written
+
+def csv_sheets(data_dir, files):
+    """(sheet name, CSV path) pairs for {sheet name: file name}, failing early on missing files"""
+
+    sheets = [(name, os.path.join(data_dir, file_name)) for name, file_name in files.items()]
+    missing = [path for _, path in sheets if not os.path.exists(path)]
+    if missing:
+        raise FileNotFoundError(f"Missing CSV files: {', '.join(missing)}")
+    return sheets
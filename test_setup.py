@@ -4,6 +4,14 @@ Test script to verify the construction dashboard setup
 
 import sys
 import os
+import subprocess
+
+# Headless report/export modules and the cumulative import time they may spend
+IMPORT_TIME_BUDGET_MS = 1500
+HEADLESS_MODULES = ['analytics', 'chunked_analytics', 'excel_generator']
+
+# Packages only the dashboard and chart exports need
+HEAVY_PACKAGES = ['streamlit', 'plotly', 'matplotlib', 'scipy', 'seaborn', 'openpyxl']
 
 def test_python_version():
     """Test if Python version is sufficient"""
@@ -101,6 +109,210 @@ def test_data_generation():
         print(f"❌ Data generation failed: {str(e)}")
         return False
 
+def test_streaming_xlsx():
+    """Test that streamed workbooks read back, including blank cells"""
+    print("\nTesting streaming XLSX export...")
+    
+    try:
+        import tempfile
+        from datetime import datetime
+        import numpy as np
+        import pandas as pd
+        from openpyxl import load_workbook
+        sys.path.append('src')
+        from xlsx_stream import XlsxStreamWriter
+        
+        df = pd.DataFrame({
+            'Task': ['Excavation', None, 'Framing & <Roof>', np.nan],
+            'Cost': [1200.5, np.nan, 300.0, 42.0],
+            'Date': pd.to_datetime(['2024-01-07', None, '2024-01-21', '2024-01-28'])
+        })
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'roundtrip.xlsx')
+            with XlsxStreamWriter(path) as writer:
+                writer.write_sheet('Data', df)
+            rows = list(load_workbook(path, read_only=True)['Data'].iter_rows(values_only=True))
+            
+            expected = [
+                ('Task', 'Cost', 'Date'),
+                ('Excavation', 1200.5, datetime(2024, 1, 7)),
+                (None, None, None),
+                ('Framing & <Roof>', 300, datetime(2024, 1, 21)),
+                (None, 42, datetime(2024, 1, 28))
+            ]
+            if rows != expected:
+                print(f"❌ Round trip changed the data: {rows}")
+                return False
+            print("✅ Streamed workbook reads back with blank text cells")
+            
+            broken = os.path.join(tmp, 'broken.xlsx')
+            try:
+                with XlsxStreamWriter(broken) as writer:
+                    writer.write_sheet('Data', (df if i == 0 else 1 / 0 for i in range(2)))
+            except ZeroDivisionError:
+                pass
+            if os.path.exists(broken):
+                print("❌ A failed export left a partial workbook behind")
+                return False
+            print("✅ A failed export removes its partial workbook")
+        
+        return True
+        
+    except Exception as e:
+        print(f"❌ Streaming XLSX export failed: {str(e)}")
+        return False
+
+def test_telematics_ping_order():
+    """Test that pings split across chunks add up, and that late pings are skipped instead of double counted"""
+    print("\nTesting telematics ping order...")
+    
+    try:
+        import numpy as np
+        import pandas as pd
+        sys.path.append('src')
+        from telematics import UtilizationAggregates
+        
+        rng = np.random.RandomState(0)
+        pings = pd.DataFrame({
+            'Machine': np.tile(['EX-1', 'EX-2', 'LD-1'], 2000),
+            'Timestamp': np.repeat(pd.date_range('2024-03-04 06:00', periods=2000, freq='30s').astype(str), 3),
+            'Engine_On': 1,
+            'Idle': rng.randint(0, 2, 6000)
+        })
+        
+        def engine_hours(chunks):
+            aggregates = UtilizationAggregates()
+            for chunk in chunks:
+                aggregates.update(chunk)
+            return aggregates.finish().series()['Engine_Hours'].sum(), aggregates
+        
+        expected, _ = engine_hours([pings])
+        in_order, _ = engine_hours(np.array_split(pings.sample(frac=1, random_state=1).sort_values('Timestamp'), 7))
+        if not np.isclose(in_order, expected):
+            print(f"❌ Time-ordered chunks give {in_order:.3f} engine hours instead of {expected:.3f}")
+            return False
+        print("✅ Time-ordered chunks add up to the single-chunk engine hours")
+        
+        shuffled, aggregates = engine_hours(np.array_split(pings.sample(frac=1, random_state=2), 7))
+        if shuffled > expected + 1e-9 or aggregates.out_of_order == 0:
+            print(f"❌ Out-of-order chunks credited {shuffled:.3f} engine hours (true {expected:.3f})")
+            return False
+        print(f"✅ Out-of-order chunks skip {aggregates.out_of_order} late pings instead of double counting")
+        return True
+        
+    except Exception as e:
+        print(f"❌ Telematics ping order check failed: {str(e)}")
+        return False
+
+def _baseline_risk_trends(schedule_df, cost_df, productivity_df, safety_df, quality_df):
+    """identify_risk_trends as it was before windows became time spans (weekly rows)"""
+    
+    if len(schedule_df) < 3:
+        return ["Insufficient data for trend analysis"]
+    
+    risks = []
+    recent_spi = schedule_df.tail(3)['SPI']
+    if recent_spi.mean() < 0.95 and (recent_spi.iloc[-1] < recent_spi.iloc[0]):
+        risks.append("Schedule Performance Index trending downward")
+    recent_cpi = cost_df.tail(3)['CPI']
+    if recent_cpi.mean() < 0.95 and (recent_cpi.iloc[-1] < recent_cpi.iloc[0]):
+        risks.append("Cost Performance Index trending downward")
+    if safety_df.tail(4)['Near_Miss_Count'].mean() > 3:
+        risks.append("Higher than average near-miss incidents")
+    if quality_df.tail(3)['Inspection_Pass_Rate_Pct'].mean() < 80:
+        risks.append("Inspection pass rate below 80%")
+    if quality_df.tail(3)['Rework_Cost'].mean() > 10000:
+        risks.append("High rework costs detected")
+    recent_efficiency = productivity_df.tail(3)['Labor_Hours_Per_Unit']
+    if len(recent_efficiency) > 1 and recent_efficiency.iloc[-1] > recent_efficiency.mean() * 1.2:
+        risks.append("Labor efficiency declining")
+    
+    return risks or ["No significant risk trends detected"]
+
+def test_weekly_risk_trends():
+    """Test that weekly risk trends match the row-count rules they replaced"""
+    print("\nTesting weekly risk trends...")
+    
+    try:
+        import numpy as np
+        import pandas as pd
+        sys.path.append('src')
+        from analytics import ConstructionAnalytics
+        
+        mismatches = 0
+        periods = 0
+        for seed in range(5):
+            rng = np.random.RandomState(seed)
+            weeks = 30
+            dates = pd.date_range('2024-01-07', periods=weeks, freq='W')
+            conducted = rng.poisson(8, weeks)
+            passed = rng.binomial(conducted, 0.8)
+            tables = (
+                pd.DataFrame({'Date': dates, 'SPI': rng.normal(0.95, 0.05, weeks)}),
+                pd.DataFrame({'Date': dates, 'CPI': rng.normal(0.95, 0.05, weeks)}),
+                pd.DataFrame({'Date': dates, 'Labor_Hours_Per_Unit': rng.gamma(8, 5, weeks)}),
+                pd.DataFrame({'Date': dates, 'Near_Miss_Count': rng.poisson(3, weeks)}),
+                pd.DataFrame({'Date': dates, 'Inspections_Conducted': conducted, 'Inspections_Passed': passed,
+                              'Inspection_Pass_Rate_Pct': np.round(passed * 100 / np.maximum(conducted, 1), 1),
+                              'Rework_Cost': rng.normal(9000, 3000, weeks)})
+            )
+            for end in range(1, weeks + 1):
+                prefix = [table.iloc[:end] for table in tables]
+                periods += 1
+                if ConstructionAnalytics(*prefix).identify_risk_trends() != _baseline_risk_trends(*prefix):
+                    mismatches += 1
+        
+        if mismatches:
+            print(f"❌ {mismatches} of {periods} weekly periods flag different risks")
+            return False
+        print(f"✅ {periods} weekly periods flag the same risks as the row-count rules")
+        return True
+        
+    except Exception as e:
+        print(f"❌ Weekly risk trend check failed: {str(e)}")
+        return False
+
+def test_import_time():
+    """Test that headless modules import quickly and without dashboard packages"""
+    print("\nTesting import time of headless modules...")
+    
+    all_good = True
+    
+    for module in HEADLESS_MODULES:
+        result = subprocess.run(
+            [sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+            cwd='src', capture_output=True, text=True
+        )
+        if result.returncode != 0:
+            print(f"❌ {module} failed to import")
+            all_good = False
+            continue
+        
+        cumulative_us = 0
+        heavy = set()
+        for line in result.stderr.splitlines():
+            if not line.startswith('import time:') or '|' not in line:
+                continue
+            parts = line.split('|')
+            name = parts[2].strip()
+            if name == module:
+                cumulative_us = int(parts[1].strip())
+            top_level = name.split('.')[0]
+            if top_level in HEAVY_PACKAGES:
+                heavy.add(top_level)
+        
+        elapsed_ms = cumulative_us / 1000
+        if heavy:
+            print(f"❌ {module} imports {', '.join(sorted(heavy))}")
+            all_good = False
+        elif elapsed_ms > IMPORT_TIME_BUDGET_MS:
+            print(f"❌ {module} took {elapsed_ms:.0f} ms to import (budget {IMPORT_TIME_BUDGET_MS} ms)")
+            all_good = False
+        else:
+            print(f"✅ {module} imported in {elapsed_ms:.0f} ms")
+    
+    return all_good
+
 def main():
     """Run all tests"""
     print("🏗️ Construction Dashboard Setup Test")
@@ -111,6 +323,10 @@ def main():
         ("Project Structure", test_project_structure),
         ("Data Generation", test_data_generation),
         ("Required Packages", test_required_packages),
+        ("Streaming XLSX", test_streaming_xlsx),
+        ("Weekly Risk Trends", test_weekly_risk_trends),
+        ("Telematics Ping Order", test_telematics_ping_order),
+        ("Import Time", test_import_time),
     ]
     
     results = []